@@ -1,6 +1,8 @@
 import streamlit as st
 from PIL import Image
 
+from utils.warmup import start_warmup
+
 st.set_page_config(
     page_title='Home',
     page_icon='🎲'
@@ -14,6 +16,11 @@ st.sidebar.markdown('# Cury Company')
 st.sidebar.markdown('## Fastest Delivery in Town')
 st.sidebar.markdown("""___""")
 
+# Aquecimento em segundo plano (uma vez por processo): dataset e seleções comuns das três páginas
+warmup = start_warmup( 'dataset/train.csv', 'dataset/batches' )
+if warmup is not None and warmup.running:
+    st.sidebar.progress( warmup.fraction, text='Preparando os dados: {}/{}'.format( warmup.done + len( warmup.errors ), warmup.total ) )
+
 st.write( ' # Cury Company Growth Dashboard' )
 
 st.markdown(
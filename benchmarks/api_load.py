@@ -0,0 +1,224 @@
+# =========================================
+# Imports
+# =========================================
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from datetime import timedelta
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from utils.warmup import DEFAULT_DATE, TRAFFIC_OPTIONS, VIEWS, WEATHER_OPTIONS
+
+API_URL = 'http://127.0.0.1:8599'
+
+# Datas sorteadas nas seleções: até 40 dias antes da data padrão
+DATE_RANGE_DAYS = 40
+
+# =========================================
+# Funções
+# =========================================
+
+def random_paths( n, seed=42 ):
+    """
+    Esta função tem a responsabilidade de sortear as seleções pedidas à API.
+    Um conjunto pequeno de seleções, repetidas ao longo da rodada, imita outros dashboards consultando
+    as mesmas visões; a primeira é a seleção padrão.
+    Input: - n: quantidade de seleções distintas
+           - seed: semente do sorteio
+    Output: lista de caminhos (/metrics/<view>?...)
+    """
+
+    rng = random.Random( seed )
+    caminhos = ['/metrics/{}'.format( view ) for view in VIEWS]
+    while len( caminhos ) < n:
+        query = {'date': ( DEFAULT_DATE - timedelta( days=rng.randrange( DATE_RANGE_DAYS ) ) ).date().isoformat(),
+                 'traffic': ','.join( rng.sample( TRAFFIC_OPTIONS, rng.randint( 1, len( TRAFFIC_OPTIONS ) ) ) ),
+                 'weather': ','.join( rng.sample( WEATHER_OPTIONS, rng.randint( 1, len( WEATHER_OPTIONS ) ) ) )}
+        caminhos.append( '/metrics/{}?{}'.format( rng.choice( list( VIEWS ) ), urlencode( query ) ) )
+
+    return caminhos[:n]
+
+async def request( reader, writer, host, path, etag=None ):
+    """
+    Esta função tem a responsabilidade de fazer um GET em uma conexão keep-alive já aberta.
+    Input: - reader, writer: conexão (asyncio.open_connection)
+           - host: cabeçalho Host
+           - path: caminho com a query string
+           - etag: ETag para o If-None-Match (None = sem revalidação)
+    Output: (status, etag da resposta, tamanho do corpo)
+    """
+
+    linhas = ['GET {} HTTP/1.1'.format( path ), 'Host: {}'.format( host )]
+    if etag:
+        linhas.append( 'If-None-Match: {}'.format( etag ) )
+    writer.write( ( '\r\n'.join( linhas ) + '\r\n\r\n' ).encode( 'latin-1' ) )
+    await writer.drain()
+
+    status = int( ( await reader.readline() ).split()[1] )
+    headers = {}
+    while True:
+        linha = await reader.readline()
+        if linha in ( b'\r\n', b'' ):
+            break
+        nome, _, valor = linha.decode( 'latin-1' ).partition( ':' )
+        headers[nome.strip().lower()] = valor.strip()
+    corpo = await reader.readexactly( int( headers.get( 'content-length', 0 ) ) )
+
+    return status, headers.get( 'etag' ), len( corpo )
+
+async def get_json( url, path ):
+    """GET de uma rota de controle (health, stats) em uma conexão própria."""
+
+    partes = urlsplit( url )
+    reader, writer = await asyncio.open_connection( partes.hostname, partes.port )
+    try:
+        writer.write( 'GET {} HTTP/1.1\r\nHost: {}\r\nConnection: close\r\n\r\n'.format( path, partes.netloc ).encode() )
+        await writer.drain()
+        resposta = await reader.read()
+    finally:
+        writer.close()
+
+    return json.loads( resposta.split( b'\r\n\r\n', 1 )[1] )
+
+async def run_level( url, paths, clients, duration, revalidate=0.5, seed=42 ):
+    """
+    Esta função tem a responsabilidade de simular clientes simultâneos por um tempo fixo.
+    Critérios:
+    1. Cada cliente mantém uma conexão keep-alive e pede seleções sorteadas, sem pausa
+    2. Uma fração dos pedidos manda a ETag já recebida (If-None-Match), como um dashboard revalidando
+    Input: - url: endereço da API
+           - paths: seleções (random_paths)
+           - clients: clientes simultâneos
+           - duration: segundos de rodada
+           - revalidate: fração dos pedidos com If-None-Match
+           - seed: semente dos pedidos
+    Output: dict com clients, requests, errors, not_modified, throughput, p50/p95/p99/max (s) e MB recebidos
+    """
+
+    partes = urlsplit( url )
+    latencias = []
+    contagem = {'errors': 0, 'not_modified': 0, 'bytes': 0}
+    etags = {}
+    fim = time.perf_counter() + duration
+
+    async def cliente( n ):
+        rng = random.Random( seed * 1000 + n )
+        reader, writer = await asyncio.open_connection( partes.hostname, partes.port )
+        try:
+            while time.perf_counter() < fim:
+                path = rng.choice( paths )
+                etag = etags.get( path ) if rng.random() < revalidate else None
+                inicio = time.perf_counter()
+                status, etag, tamanho = await request( reader, writer, partes.netloc, path, etag )
+                latencias.append( time.perf_counter() - inicio )
+                contagem['bytes'] += tamanho
+                if status == 304:
+                    contagem['not_modified'] += 1
+                elif status == 200:
+                    etags[path] = etag
+                else:
+                    contagem['errors'] += 1
+        finally:
+            writer.close()
+
+    inicio = time.perf_counter()
+    await asyncio.gather( *[cliente( n ) for n in range( clients )] )
+    total = time.perf_counter() - inicio
+
+    latencias = np.array( latencias ) if latencias else np.array( [np.nan] )
+    p50, p95, p99 = np.percentile( latencias, [50, 95, 99] )
+
+    return {'clients': clients,
+            'requests': int( np.isfinite( latencias ).sum() ),
+            'errors': contagem['errors'],
+            'not_modified': contagem['not_modified'],
+            'throughput_rps': round( np.isfinite( latencias ).sum() / total, 2 ),
+            'p50_s': round( p50, 4 ), 'p95_s': round( p95, 4 ), 'p99_s': round( p99, 4 ),
+            'max_s': round( np.max( latencias ), 4 ),
+            'received_mb': round( contagem['bytes'] / 1024 ** 2, 1 )}
+
+async def wait_ready( url, timeout=300 ):
+    """Espera a API responder o /health (a carga do dataset acontece antes do servidor abrir a porta)."""
+
+    limite = time.perf_counter() + timeout
+    while True:
+        try:
+            return await get_json( url, '/health' )
+        except OSError:
+            if time.perf_counter() > limite:
+                raise RuntimeError( 'A API não respondeu em {}s'.format( timeout ) )
+            await asyncio.sleep( 0.5 )
+
+async def run( url, levels, duration=20, distinct=50, revalidate=0.5, seed=42 ):
+    """
+    Esta função tem a responsabilidade de rodar a simulação em níveis crescentes de concorrência.
+    A primeira rodada de cada seleção (cálculo das páginas) é feita antes das medidas, pedindo cada seleção uma vez.
+    Input: - url: endereço da API
+           - levels: clientes simultâneos de cada nível
+           - duration: segundos por nível
+           - distinct: seleções distintas
+           - revalidate: fração dos pedidos com If-None-Match
+           - seed: semente
+    Output: df com uma linha por nível e o uso do cache de respostas no fim
+    """
+
+    await wait_ready( url )
+    paths = random_paths( distinct, seed )
+
+    inicio = time.perf_counter()
+    partes = urlsplit( url )
+    reader, writer = await asyncio.open_connection( partes.hostname, partes.port )
+    for path in paths:
+        await request( reader, writer, partes.netloc, path )
+    writer.close()
+    print( 'Primeira rodada de {} seleções: {:.2f}s'.format( len( paths ), time.perf_counter() - inicio ),
+           file=sys.stderr )
+
+    resultados = []
+    for clients in levels:
+        resultado = await run_level( url, paths, clients, duration, revalidate, seed )
+        print( '{:>4} clientes: {:>8.1f} req/s  p50 {:.4f}s  p95 {:.4f}s  p99 {:.4f}s  304 {}  erros {}'.format(
+               clients, resultado['throughput_rps'], resultado['p50_s'], resultado['p95_s'],
+               resultado['p99_s'], resultado['not_modified'], resultado['errors'] ), file=sys.stderr )
+        resultados.append( resultado )
+
+    df_aux = pd.DataFrame( resultados )
+    df_aux['responses_hit_rate'] = ( await get_json( url, '/stats' ) )['responses']['hit_rate']
+
+    return df_aux
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Mede a API de métricas (utils.api) com clientes HTTP simultâneos.' )
+    parser.add_argument( '--url', default=None, help='API já em execução (sem ela, a API é iniciada em {})'.format( API_URL ) )
+    parser.add_argument( '--clients', type=int, nargs='+', default=[1, 8, 32, 128] )
+    parser.add_argument( '--duration', type=float, default=20, help='segundos por nível de concorrência' )
+    parser.add_argument( '--distinct', type=int, default=50, help='seleções distintas pedidas' )
+    parser.add_argument( '--revalidate', type=float, default=0.5, help='fração dos pedidos com If-None-Match' )
+    parser.add_argument( '--seed', type=int, default=42 )
+    parser.add_argument( '--out', default=None, help='json de saída' )
+    args = parser.parse_args()
+
+    servidor = None
+    url = args.url
+    if url is None:
+        url = API_URL
+        servidor = subprocess.Popen( [sys.executable, '-m', 'utils.api', '--port', str( urlsplit( url ).port )] )
+    try:
+        df_aux = asyncio.run( run( url, args.clients, args.duration, args.distinct, args.revalidate, args.seed ) )
+    finally:
+        if servidor is not None:
+            servidor.terminate()
+            servidor.wait()
+
+    print( df_aux.to_string( index=False ) )
+
+    if args.out:
+        with open( args.out, 'w' ) as arquivo:
+            json.dump( df_aux.to_dict( orient='records' ), arquivo, indent=2 )
@@ -0,0 +1,80 @@
+# =========================================
+# Imports
+# =========================================
+import argparse
+import os
+import time
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks.synthetic import write_csv
+from utils.data import clean_code, read_dataset
+
+DATA_DIR = os.path.join( os.path.dirname( __file__ ), 'data' )
+
+# =========================================
+# Funções
+# =========================================
+
+def legacy_ingest( path ):
+    """Leitura antiga das páginas: pd.read_csv sem tipos + clean_code."""
+    
+    return clean_code( pd.read_csv( path ) )
+
+def measure( func, path ):
+    """
+    Esta função tem a responsabilidade de medir tempo e pico de memória de uma leitura.
+    Input: - func: função de leitura
+           - path: csv
+    Output: (df, segundos, pico em MB)
+    """
+    
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    df = func( path )
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return df, segundos, pico / 1024 ** 2
+
+def same_result( df_old, df_new ):
+    """
+    Esta função tem a responsabilidade de conferir que as duas leituras geram os mesmos dados.
+    O clean_code mantém o índice original e o multiple_deliveries como texto,
+    e não calcula as colunas derivadas (Distance).
+    """
+    
+    df_new = df_new.loc[:, [col for col in df_new.columns if col in df_old.columns]]
+    df_old = df_old.reset_index( drop=True ).loc[:, df_new.columns]
+    df_old['multiple_deliveries'] = df_old['multiple_deliveries'].astype( 'int64' )
+    pd.testing.assert_frame_equal( df_old, df_new )
+
+def run( sizes, seed=42 ):
+    resultados = []
+    for n_rows in sizes:
+        path = os.path.join( DATA_DIR, 'train_{}.csv'.format( n_rows ) )
+        if not os.path.exists( path ):
+            print( 'Gerando {} linhas em {}'.format( n_rows, path ) )
+            write_csv( path, n_rows, seed=seed )
+        
+        df_old, t_old, mem_old = measure( legacy_ingest, path )
+        df_new, t_new, mem_new = measure( read_dataset, path )
+        same_result( df_old, df_new )
+        del df_old, df_new
+        
+        resultados.append( {'rows': n_rows,
+                            'clean_code_s': round( t_old, 3 ), 'read_dataset_s': round( t_new, 3 ),
+                            'speedup': round( t_old / t_new, 2 ),
+                            'clean_code_peak_mb': round( mem_old, 1 ), 'read_dataset_peak_mb': round( mem_new, 1 )} )
+    
+    return pd.DataFrame( resultados )
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Compara clean_code com a leitura tipada (read_dataset).' )
+    parser.add_argument( '--rows', type=int, nargs='+', default=[1_000_000, 10_000_000] )
+    parser.add_argument( '--seed', type=int, default=42 )
+    args = parser.parse_args()
+    
+    print( run( args.rows, seed=args.seed ).to_string( index=False ) )
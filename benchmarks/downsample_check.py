@@ -0,0 +1,104 @@
+# =========================================
+# Imports
+# =========================================
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from utils.cube import build_cube
+from utils.data import DATASET_PATH, read_dataset
+from utils.downsample import POINT_BUDGET, resample_counts, week_start
+from utils.visao_empresa import order_by_week, order_share_by_week
+
+# Anos de histórico simulados: semanas suficientes para passar do orçamento de pontos
+HISTORY_YEARS = 12
+
+# Anos de histórico em que os pedidos por dia passam do orçamento, mas as semanas cabem nele
+WEEKLY_YEARS = 3
+
+# =========================================
+# Funções
+# =========================================
+
+def long_history( df1, years=HISTORY_YEARS, seed=42 ):
+    """
+    Esta função tem a responsabilidade de espalhar os pedidos do dataset por um histórico de vários anos.
+    As datas são sorteadas a partir da primeira data do dataset; o resto das colunas fica igual.
+    Input: - df1: dataset limpo
+           - years: anos de histórico
+           - seed: semente do sorteio
+    Output: df com as mesmas linhas e outras datas
+    """
+
+    rng = np.random.default_rng( seed )
+    df_aux = df1.copy()
+    dias = rng.integers( 0, years * 365, len( df_aux ) )
+    df_aux['Order_Date'] = df1['Order_Date'].min() + pd.to_timedelta( dias, unit='D' )
+
+    return df_aux
+
+def check_weekly( df1, budget=POINT_BUDGET ):
+    """
+    Esta função tem a responsabilidade de conferir os gráficos semanais da Visão Empresa em um histórico longo.
+    Critérios:
+    1. Em resolução completa, cada semana de cada ano é um ponto (semanas de anos diferentes não se juntam)
+    2. O histórico tem mais semanas que o orçamento, e o LTTB reduz a linha a exatamente budget pontos
+    3. A primeira e a última semana continuam na linha reduzida
+    Input: - df1: dataset limpo com vários anos
+           - budget: pontos máximos
+    Output: df com uma linha por gráfico (weeks, full_points, points, ok)
+    """
+
+    semanas = week_start( df1['Order_Date'] ).nunique()
+    df_cube = build_cube( df1 )
+    graficos = {'order_by_week': lambda full: order_by_week( df_cube, full_resolution=full ),
+                'order_share_by_week': lambda full: order_share_by_week( df1, full_resolution=full )}
+
+    linhas = []
+    for nome, grafico in graficos.items():
+        completo = np.asarray( grafico( True ).data[0].x )
+        reduzido = np.asarray( grafico( False ).data[0].x )
+        ok = ( semanas > budget and len( completo ) == semanas and len( reduzido ) == budget
+               and reduzido[0] == completo[0] and reduzido[-1] == completo[-1] )
+        linhas.append( {'figure': nome, 'weeks': semanas, 'full_points': len( completo ),
+                        'points': len( reduzido ), 'ok': bool( ok )} )
+
+    return pd.DataFrame( linhas )
+
+def check_resample( df1, budget=POINT_BUDGET ):
+    """
+    Esta função tem a responsabilidade de conferir os pedidos por dia reduzidos a semanas (order_metric).
+    As semanas do resample_counts precisam ser as mesmas dos gráficos semanais (week_start): mesmos
+    domingos e mesmas contagens.
+    Input: - df1: dataset limpo com um histórico em que os dias passam do orçamento e as semanas cabem nele
+           - budget: pontos máximos
+    Output: df com uma linha (weeks, full_points, points, ok)
+    """
+
+    df_dia = df1.groupby( 'Order_Date' ).size().rename( 'ID' ).reset_index()
+    df_aux, resolucao = resample_counts( df_dia, 'Order_Date', 'ID', budget )
+    semanas = df1.groupby( week_start( df1['Order_Date'] ) ).size()
+
+    reduzido = df_aux.set_index( 'Order_Date' )['ID']
+    reduzido = reduzido[reduzido > 0]
+    ok = resolucao == 'semana' and reduzido.index.equals( semanas.index ) and ( reduzido == semanas ).all()
+
+    return pd.DataFrame( [{'figure': 'order_metric (semana)', 'weeks': len( semanas ), 'full_points': len( df_dia ),
+                           'points': len( df_aux ), 'ok': bool( ok )}] )
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Confere se o LTTB reduz os gráficos semanais de um histórico longo.' )
+    parser.add_argument( 'path', nargs='?', default=DATASET_PATH )
+    parser.add_argument( '--years', type=int, default=HISTORY_YEARS )
+    parser.add_argument( '--seed', type=int, default=42 )
+    args = parser.parse_args()
+
+    df1 = read_dataset( args.path )
+    df_aux = pd.concat( [check_weekly( long_history( df1, args.years, args.seed ) ),
+                         check_resample( long_history( df1, WEEKLY_YEARS, args.seed ) )], ignore_index=True )
+    print( df_aux.to_string( index=False ) )
+
+    if not df_aux['ok'].all():
+        sys.exit( 1 )
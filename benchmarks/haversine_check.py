@@ -0,0 +1,63 @@
+# =========================================
+# Imports
+# =========================================
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+from haversine import haversine
+
+from utils.data import DATASET_PATH, compact_dataset, read_dataset
+from utils.geo import HAVERSINE_TOLERANCE_KM, delivery_distance
+
+# =========================================
+# Funções
+# =========================================
+
+def reference_distance( df1 ):
+    """
+    Esta função tem a responsabilidade de calcular a distância de cada pedido com o haversine.haversine, linha a linha.
+    Input: df1 com as colunas de latitude e longitude em float64
+    Output: array com a distância de cada pedido em km
+    """
+
+    pontos = df1[['Restaurant_latitude', 'Restaurant_longitude',
+                  'Delivery_location_latitude', 'Delivery_location_longitude']].to_numpy( dtype='float64' )
+
+    return np.array( [haversine( ( lat1, lon1 ), ( lat2, lon2 ) ) for lat1, lon1, lat2, lon2 in pontos] )
+
+def check_haversine( df1, tolerance=HAVERSINE_TOLERANCE_KM ):
+    """
+    Esta função tem a responsabilidade de conferir as distâncias contra o haversine.haversine nas coordenadas do dataset.
+    Critérios:
+    1. haversine_np (delivery_distance) sobre as coordenadas lidas do csv
+    2. A coluna Distance do dataset lido e a do dataset compacto (a que fica no store)
+    Input: - df1: dataset limpo (read_dataset)
+           - tolerance: diferença máxima em km
+    Output: df com uma linha por conferência (rows, max_abs_km, ok)
+    """
+
+    referencia = reference_distance( df1 )
+    distancias = {'haversine_np': delivery_distance( df1 ),
+                  'Distance': df1['Distance'].to_numpy(),
+                  'Distance (compact_dataset)': compact_dataset( df1 )['Distance'].to_numpy( dtype='float64' )}
+
+    linhas = []
+    for nome, distancia in distancias.items():
+        diferenca = float( np.max( np.abs( distancia - referencia ) ) )
+        linhas.append( {'check': nome, 'rows': len( referencia ), 'max_abs_km': diferenca,
+                        'tolerance_km': tolerance, 'ok': diferenca <= tolerance} )
+
+    return pd.DataFrame( linhas )
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Confere as distâncias vetorizadas contra o pacote haversine.' )
+    parser.add_argument( 'path', nargs='?', default=DATASET_PATH )
+    args = parser.parse_args()
+
+    df_aux = check_haversine( read_dataset( args.path ) )
+    print( df_aux.to_string( index=False ) )
+
+    if not df_aux['ok'].all():
+        sys.exit( 1 )
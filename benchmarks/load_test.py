@@ -0,0 +1,270 @@
+# =========================================
+# Imports
+# =========================================
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from streamlit.proto.Slider_pb2 import Slider
+from streamlit.proto.WidgetStates_pb2 import WidgetStates
+from streamlit.runtime import Runtime
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.runtime.scriptrunner import RerunData, ScriptRunnerEvent
+from streamlit.testing.local_script_runner import LocalScriptRunner
+
+from utils.profiling import current_rss_mb
+from utils.stream import peak_rss_mb
+
+MAIN_SCRIPT = 'Home.py'
+PAGES = ['visao_empresa', 'visao_entregadores', 'visao_restaurantes']
+
+# Eventos que encerram uma execução do script
+STOP_EVENTS = ( ScriptRunnerEvent.SCRIPT_STOPPED_WITH_SUCCESS,
+                ScriptRunnerEvent.SCRIPT_STOPPED_WITH_COMPILE_ERROR,
+                ScriptRunnerEvent.SCRIPT_STOPPED_FOR_RERUN )
+
+MICROS_PER_DAY = 24 * 3600 * 10 ** 6
+
+# =========================================
+# Funções
+# =========================================
+
+class _Runtime:
+    """
+    Runtime mínimo para executar as páginas sem servidor: arquivos de mídia (imagens)
+    e caches do st.cache_data em memória. O st.cache_resource é compartilhado entre as sessões,
+    como no servidor.
+    """
+
+    media_file_mgr = MediaFileManager( MemoryMediaFileStorage( '/media' ) )
+    cache_storage_manager = MemoryCacheStorageManager()
+
+def rerun( page, widget_states=None, session_state=None, timeout=120 ):
+    """
+    Esta função tem a responsabilidade de executar uma página uma vez, como uma sessão do servidor.
+    Critérios:
+    1. Cada execução usa um ScriptRunner novo (o servidor também cria um por rerun)
+    2. O SessionState da execução anterior da sessão continua na nova (widgets e st.session_state)
+    3. A página é escolhida pelo nome, a partir do Home.py, como na navegação do app
+    4. O fim da execução é percebido pelo evento do ScriptRunner (sem espera por polling)
+    Input: - page: nome da página (PAGES)
+           - widget_states: WidgetStates com os valores dos widgets (None = padrões)
+           - session_state: SessionState da execução anterior (None = sessão nova)
+           - timeout: segundos até desistir da execução
+    Output: (segundos, mensagens enviadas ao navegador, quantidade de exceções na página, SessionState)
+    """
+
+    terminou = threading.Event()
+    runner = LocalScriptRunner( MAIN_SCRIPT, prev_session_state=session_state )
+    runner.on_event.connect( lambda sender, event, **kwargs: event in STOP_EVENTS and terminou.set(), weak=False )
+
+    inicio = time.perf_counter()
+    runner.request_rerun( RerunData( widget_states=widget_states, page_name=page ) )
+    runner.start()
+    if not terminou.wait( timeout ):
+        runner.request_stop()
+        runner.join()
+        raise RuntimeError( 'A página {} não terminou em {}s'.format( page, timeout ) )
+    segundos = time.perf_counter() - inicio
+    runner.join()
+
+    msgs = runner.forward_msgs()
+    excecoes = sum( 1 for msg in msgs
+                    if msg.HasField( 'delta' ) and msg.delta.HasField( 'new_element' )
+                    and msg.delta.new_element.WhichOneof( 'type' ) == 'exception' )
+
+    return segundos, msgs, excecoes, runner.session_state
+
+def page_widgets( msgs ):
+    """
+    Esta função tem a responsabilidade de encontrar os widgets sorteados em uma execução.
+    São os filtros da barra lateral e os radios da página (seção da Visão Empresa e tipo de mapa).
+    Input: msgs: mensagens de uma execução da página
+    Output: dict com 'date' (proto do slider de data), 'multiselect' e 'radio' (listas de protos)
+    """
+
+    widgets = {'date': None, 'multiselect': [], 'radio': []}
+    for msg in msgs:
+        if not ( msg.HasField( 'delta' ) and msg.delta.HasField( 'new_element' ) ):
+            continue
+        elemento = msg.delta.new_element
+        tipo = elemento.WhichOneof( 'type' )
+        if tipo == 'slider' and elemento.slider.data_type == Slider.DATETIME:
+            widgets['date'] = elemento.slider
+        elif tipo in ( 'multiselect', 'radio' ):
+            widgets[tipo].append( getattr( elemento, tipo ) )
+
+    return widgets
+
+def random_states( widgets, rng ):
+    """
+    Esta função tem a responsabilidade de sortear uma interação: data limite, opções dos filtros e radios.
+    Critérios:
+    1. A data é sorteada por dia entre o mínimo e o máximo do slider
+    2. Cada multiselect fica com um subconjunto não vazio das opções
+    3. Cada radio fica com uma das opções (a seção da Visão Empresa passa pelas três)
+    Input: - widgets: widgets da página (page_widgets)
+           - rng: random.Random da sessão
+    Output: WidgetStates
+    """
+
+    states = WidgetStates()
+
+    slider = widgets['date']
+    if slider is not None:
+        dias = int( ( slider.max - slider.min ) // MICROS_PER_DAY )
+        state = states.widgets.add()
+        state.id = slider.id
+        state.double_array_value.data.append( slider.min + rng.randint( 0, dias ) * MICROS_PER_DAY )
+
+    for multiselect in widgets['multiselect']:
+        opcoes = range( len( multiselect.options ) )
+        state = states.widgets.add()
+        state.id = multiselect.id
+        state.int_array_value.data.extend( sorted( rng.sample( opcoes, rng.randint( 1, len( opcoes ) ) ) ) )
+
+    for radio in widgets['radio']:
+        state = states.widgets.add()
+        state.id = radio.id
+        state.int_value = rng.randrange( len( radio.options ) )
+
+    return states
+
+def discover( pages ):
+    """
+    Esta função tem a responsabilidade de executar cada página uma vez com os valores padrão.
+    Essa primeira execução também carrega o dataset compartilhado e dispara o aquecimento
+    (utils.warmup), então a carga inicial fica fora das medidas.
+    Input: pages: nomes das páginas
+    Output: dict página -> widgets da página
+    """
+
+    widgets = {}
+    for page in pages:
+        segundos, msgs, excecoes, _ = rerun( page )
+        if excecoes:
+            raise RuntimeError( 'A página {} terminou com exceção'.format( page ) )
+        widgets[page] = page_widgets( msgs )
+        print( 'Aquecimento {}: {:.2f}s'.format( page, segundos ), file=sys.stderr )
+
+    return widgets
+
+def run_level( widgets, sessions, duration, think_time=0.0, seed=42 ):
+    """
+    Esta função tem a responsabilidade de simular sessões simultâneas por um tempo fixo.
+    Critérios:
+    1. Cada sessão é uma thread que escolhe uma página, sorteia os widgets e executa a página de novo
+    2. A sessão guarda o SessionState e os widgets da última execução de cada página entre os seus reruns
+       (widgets que só aparecem em uma seção, como o tipo de mapa, passam a ser sorteados quando a seção abre)
+    3. A memória residente é amostrada durante a rodada, para o pico de cada nível
+    Input: - widgets: widgets de cada página (discover)
+           - sessions: quantidade de sessões simultâneas
+           - duration: segundos de rodada
+           - think_time: pausa de cada sessão entre interações (segundos)
+           - seed: semente das interações
+    Output: dict com sessions, reruns, errors, throughput, p50/p95/p99/max (s) e pico de RSS (MB)
+    """
+
+    latencias = []
+    erros = []
+    fim = time.perf_counter() + duration
+    parar = threading.Event()
+    pico = [current_rss_mb()]
+
+    def amostrar_memoria():
+        while pico[0] is not None and not parar.wait( 0.05 ):
+            pico[0] = max( pico[0], current_rss_mb() )
+
+    def sessao( n ):
+        rng = random.Random( seed * 1000 + n )
+        vistos = dict( widgets )
+        session_state = None
+        while time.perf_counter() < fim:
+            page = rng.choice( list( vistos ) )
+            try:
+                segundos, msgs, excecoes, session_state = rerun( page, random_states( vistos[page], rng ), session_state )
+            except RuntimeError:
+                erros.append( page )
+                continue
+            vistos[page] = page_widgets( msgs )
+            latencias.append( segundos )
+            if excecoes:
+                erros.append( page )
+            if think_time:
+                time.sleep( think_time )
+
+    amostrador = threading.Thread( target=amostrar_memoria, daemon=True )
+    amostrador.start()
+    inicio = time.perf_counter()
+    threads = [threading.Thread( target=sessao, args=( n, ) ) for n in range( sessions )]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = time.perf_counter() - inicio
+    parar.set()
+    amostrador.join()
+
+    latencias = np.array( latencias ) if latencias else np.array( [np.nan] )
+    p50, p95, p99 = np.percentile( latencias, [50, 95, 99] )
+
+    return {'sessions': sessions,
+            'reruns': int( np.isfinite( latencias ).sum() ),
+            'errors': len( erros ),
+            'throughput_rps': round( np.isfinite( latencias ).sum() / total, 2 ),
+            'p50_s': round( p50, 3 ), 'p95_s': round( p95, 3 ), 'p99_s': round( p99, 3 ),
+            'max_s': round( np.max( latencias ), 3 ),
+            'rss_peak_mb': None if pico[0] is None else round( pico[0], 1 )}
+
+def run( levels, duration=30, think_time=0.0, pages=PAGES, seed=42 ):
+    """
+    Esta função tem a responsabilidade de rodar a simulação em níveis crescentes de concorrência.
+    Input: - levels: quantidades de sessões simultâneas
+           - duration: segundos por nível
+           - think_time: pausa entre interações de cada sessão
+           - pages: páginas sorteadas pelas sessões
+           - seed: semente das interações
+    Output: df com uma linha por nível
+    """
+
+    Runtime._instance = _Runtime()
+    widgets = discover( pages )
+
+    resultados = []
+    for sessions in levels:
+        resultado = run_level( widgets, sessions, duration, think_time=think_time, seed=seed )
+        print( '{:>4} sessões: {:>7.2f} reruns/s  p50 {:.3f}s  p95 {:.3f}s  p99 {:.3f}s  RSS {}MB'.format(
+               sessions, resultado['throughput_rps'], resultado['p50_s'], resultado['p95_s'],
+               resultado['p99_s'], resultado['rss_peak_mb'] ), file=sys.stderr )
+        resultados.append( resultado )
+
+    df_aux = pd.DataFrame( resultados )
+    pico = peak_rss_mb()
+    df_aux['process_peak_mb'] = None if pico is None else round( pico, 1 )
+
+    return df_aux
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Simula sessões simultâneas nas páginas do dashboard, sem navegador.' )
+    parser.add_argument( '--sessions', type=int, nargs='+', default=[1, 2, 4, 8, 16] )
+    parser.add_argument( '--duration', type=float, default=30, help='segundos por nível de concorrência' )
+    parser.add_argument( '--think-time', type=float, default=0.0, help='pausa entre interações de cada sessão' )
+    parser.add_argument( '--pages', nargs='+', default=PAGES, choices=PAGES )
+    parser.add_argument( '--seed', type=int, default=42 )
+    parser.add_argument( '--out', default=None, help='json de saída' )
+    args = parser.parse_args()
+
+    df_aux = run( args.sessions, duration=args.duration, think_time=args.think_time, pages=args.pages, seed=args.seed )
+    print( df_aux.to_string( index=False ) )
+
+    if args.out:
+        with open( args.out, 'w' ) as arquivo:
+            json.dump( df_aux.to_dict( orient='records' ), arquivo, indent=2 )
@@ -0,0 +1,107 @@
+# =========================================
+# Imports
+# =========================================
+import argparse
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+
+from utils.data import DATASET_PATH, read_dataset
+from utils.sketches import PERCENTILES, QUANTILE_ACCURACY, QUANTILE_DIMS, QuantileCube, QuantileMapping
+
+# Opções sorteadas nas seleções (as mesmas das barras laterais)
+TRAFFIC_OPTIONS = ['Low', 'Medium', 'High', 'Jam']
+WEATHER_OPTIONS = ['conditions Cloudy', 'conditions Fog', 'conditions Sandstorms',
+                   'conditions Stormy', 'conditions Sunny', 'conditions Windy']
+
+# =========================================
+# Funções
+# =========================================
+
+def random_selections( df1, n, seed=42 ):
+    """
+    Esta função tem a responsabilidade de sortear seleções da barra lateral.
+    A primeira é a seleção sem filtro (todas as datas, todo o trânsito e todo o clima).
+    Input: - df1: dataset limpo
+           - n: quantidade de seleções
+           - seed: semente do sorteio
+    Output: lista de (date_limit, traffic_options, weather_options)
+    """
+
+    rng = np.random.default_rng( seed )
+    datas = np.sort( df1['Order_Date'].unique() )
+
+    selecoes = [( pd.Timestamp( datas[-1] ) + pd.Timedelta( days=1 ), TRAFFIC_OPTIONS, WEATHER_OPTIONS )]
+    for _ in range( n - 1 ):
+        date_limit = pd.Timestamp( datas[rng.integers( len( datas ) // 2, len( datas ) )] )
+        traffic = list( rng.choice( TRAFFIC_OPTIONS, rng.integers( 1, len( TRAFFIC_OPTIONS ) + 1 ), replace=False ) )
+        weather = list( rng.choice( WEATHER_OPTIONS, rng.integers( 1, len( WEATHER_OPTIONS ) + 1 ), replace=False ) )
+        selecoes.append( ( date_limit, traffic, weather ) )
+
+    return selecoes
+
+def check_accuracy( df1, selections, accuracy=QUANTILE_ACCURACY ):
+    """
+    Esta função tem a responsabilidade de comparar os percentis dos sketches com os exatos.
+    Critérios:
+    1. O exato é o np.quantile com method='lower' (um valor observado, como o do sketch)
+    2. O erro relativo de cada percentil tem que ficar dentro da precisão dos sketches
+    3. Os percentis por cidade (quantiles_by) entram na comparação
+    Input: - df1: dataset limpo
+           - selections: lista de (date_limit, traffic_options, weather_options)
+           - accuracy: precisão relativa dos sketches
+    Output: df com uma linha por seleção, grupo e percentil (exact, sketch, rel_error)
+    """
+
+    quantis = QuantileCube.build( df1, mapping=QuantileMapping( accuracy ) )
+    linhas = []
+    for date_limit, traffic, weather in selections:
+        linhas_selecao = ( ( df1['Order_Date'] < date_limit ) & df1['Road_traffic_density'].isin( traffic )
+                           & df1['Weatherconditions'].isin( weather ) )
+        df_aux = df1.loc[linhas_selecao]
+        if df_aux.empty:
+            continue
+        selecao = quantis.select( date_limit, traffic, weather )
+        nome = '{} {}/{}'.format( date_limit.date(), len( traffic ), len( weather ) )
+
+        grupos = [( 'todos', df_aux['Time_taken(min)'], selecao.quantiles() )]
+        por_cidade = selecao.quantiles_by( 'City' ).set_index( 'City' )
+        for cidade, df_cidade in df_aux.groupby( 'City', observed=True )['Time_taken(min)']:
+            grupos.append( ( cidade, df_cidade, por_cidade.loc[cidade, list( PERCENTILES )].to_numpy() ) )
+
+        for grupo, valores, sketch in grupos:
+            exatos = np.quantile( valores.to_numpy(), list( PERCENTILES.values() ), method='lower' )
+            for percentil, exato, aproximado in zip( PERCENTILES, exatos, sketch ):
+                linhas.append( {'selection': nome, 'group': grupo, 'percentile': percentil,
+                                'exact': float( exato ), 'sketch': round( float( aproximado ), 3 ),
+                                'rel_error': abs( aproximado - exato ) / exato} )
+
+    return pd.DataFrame( linhas )
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Confere os percentis dos sketches de quantis contra os exatos.' )
+    parser.add_argument( 'path', nargs='?', default=DATASET_PATH )
+    parser.add_argument( '--selections', type=int, default=20 )
+    parser.add_argument( '--accuracy', type=float, default=QUANTILE_ACCURACY )
+    parser.add_argument( '--seed', type=int, default=42 )
+    parser.add_argument( '--out', default=None, help='json de saída' )
+    args = parser.parse_args()
+
+    df1 = read_dataset( args.path )
+    df_aux = check_accuracy( df1, random_selections( df1, args.selections, args.seed ), args.accuracy )
+
+    resumo = df_aux.groupby( 'percentile' )['rel_error'].agg( ['mean', 'max'] )
+    print( resumo.to_string() )
+    fora = df_aux[df_aux['rel_error'] > args.accuracy]
+    print( '{} comparações, {} fora da precisão de {:.1%} ({} dimensões por célula)'.format(
+           len( df_aux ), len( fora ), args.accuracy, len( QUANTILE_DIMS ) ) )
+
+    if args.out:
+        with open( args.out, 'w' ) as arquivo:
+            json.dump( df_aux.to_dict( orient='records' ), arquivo, indent=2 )
+
+    if not fora.empty:
+        print( fora.to_string( index=False ), file=sys.stderr )
+        sys.exit( 1 )
@@ -0,0 +1,295 @@
+# =========================================
+# Imports
+# =========================================
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import write_csv
+from utils.columnar import load_columnar, read_partitioned, write_partitioned
+from utils.cube import multi_rollup
+from utils.data import clean_code, read_dataset
+from utils.geo import GRID_LEVELS, bin_locations
+from utils.parallel import read_dataset_parallel
+from utils.sketches import PERCENTILES, QuantileCube, SketchCube
+from utils.store import DeliveryStore
+from utils.visao_empresa import ( country_maps, order_by_week, order_metric, order_share_by_week,
+                                  traffic_order_city, traffic_order_share, week_share_sketches )
+from utils.visao_entregadores import RATING_GROUPINGS, faster_deliver, rating_by_traffic_weather
+from utils.visao_restaurantes import ( PAGE_GROUPINGS, avg_std_time_city, avg_std_time_per_city_traf,
+                                       bar_time_city, distance, festival_avg_std )
+
+DATA_DIR = os.path.join( os.path.dirname( __file__ ), 'data' )
+RESULTS_DIR = os.path.join( os.path.dirname( __file__ ), 'results' )
+
+# Filtros padrão das páginas (barra lateral sem alterações)
+DATE_LIMIT = datetime( 2022, 4, 13 )
+# Última semana dos dados sintéticos (leitura com filtro nas partições)
+LAST_WEEK = ( datetime( 2022, 3, 30 ), datetime( 2022, 4, 6 ) )
+TRAFFIC_OPTIONS = ['Low', 'Medium', 'High', 'Jam']
+WEATHER_OPTIONS = ['conditions Cloudy', 'conditions Fog', 'conditions Sandstorms',
+                   'conditions Stormy', 'conditions Sunny', 'conditions Windy']
+
+# Etapas com sketch e a etapa exata que elas substituem: o sketch tem que ser mais rápido e usar menos memória
+SKETCH_CHECKS = [( 'distinct.sketches', 'distinct.exact' ), ( 'quantile.sketches', 'quantile.exact' )]
+
+# Variação (em %) da mediana a partir da qual o --compare marca a etapa
+REGRESSION_PCT = 10.0
+
+# =========================================
+# Funções
+# =========================================
+
+def measure( func, repeat=3 ):
+    """
+    Esta função tem a responsabilidade de medir uma etapa: tempo de cada repetição e pico de memória.
+    O pico (tracemalloc) é medido em uma execução à parte, para não pesar no tempo.
+    Input: - func: função sem argumentos
+           - repeat: quantidade de execuções cronometradas
+    Output: (resultado da última execução, dict com median_s, min_s, peak_mb)
+    """
+
+    tempos = []
+    for _ in range( repeat ):
+        inicio = time.perf_counter()
+        resultado = func()
+        tempos.append( time.perf_counter() - inicio )
+
+    tracemalloc.start()
+    func()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return resultado, {'median_s': round( statistics.median( tempos ), 6 ),
+                       'min_s': round( min( tempos ), 6 ),
+                       'peak_mb': round( pico / 1024 ** 2, 2 )}
+
+def legacy_select( df1, date_limit, traffic_options, weather_options ):
+    """Filtros antigos das páginas: uma máscara booleana por filtro."""
+
+    df1 = df1.loc[df1['Order_Date'] < date_limit, :]
+    df1 = df1.loc[df1['Road_traffic_density'].isin( traffic_options ), :]
+    df1 = df1.loc[df1['Weatherconditions'].isin( weather_options ), :]
+
+    return df1
+
+def steps( path, state, workers=None ):
+    """
+    Esta função tem a responsabilidade de listar as etapas medidas, na ordem em que as páginas as executam.
+    As etapas que preparam dados para as seguintes guardam o resultado em state.
+    Input: - path: csv da rodada
+           - state: dict compartilhado entre as etapas
+           - workers: processos da leitura paralela (None = todos os núcleos)
+    Output: lista de (nome, função sem argumentos)
+    """
+
+    def ingest():
+        state['df'] = read_dataset( path )
+        return state['df']
+
+    def store():
+        state['store'] = DeliveryStore( state['df'], path, 0 )
+        state['legacy'] = state['store'].df.copy()
+        return state['store']
+
+    def select():
+        state['df1'], state['cube'] = state['store'].select( DATE_LIMIT, TRAFFIC_OPTIONS, WEATHER_OPTIONS )
+        return state['df1']
+
+    def rollups():
+        state['ratings'] = multi_rollup( state['cube'], RATING_GROUPINGS, ['Delivery_person_Ratings'] )
+        state['times'] = multi_rollup( state['cube'], PAGE_GROUPINGS, ['Time_taken(min)', 'Distance'] )
+        return state['times']
+
+    parquet_dir = os.path.splitext( path )[0] + '_parquet'
+
+    df1 = lambda: state['df1']
+    cube = lambda: state['cube']
+
+    return [
+        ( 'ingest.clean_code', lambda: clean_code( pd.read_csv( path ) ) ),
+        ( 'ingest.read_dataset', ingest ),
+        ( 'ingest.read_dataset_parallel', lambda: read_dataset_parallel( path, workers=workers, min_bytes=0 ) ),
+        ( 'parquet.write', lambda: write_partitioned( state['df'], parquet_dir, source=path ) ),
+        ( 'parquet.read_all', lambda: read_partitioned( parquet_dir ) ),
+        ( 'parquet.read_last_week', lambda: read_partitioned( parquet_dir, *LAST_WEEK,
+                                                              columns=['Order_Date', 'City', 'Time_taken(min)'] ) ),
+        ( 'parquet.load_store_all', lambda: load_columnar( path, parquet_dir, days=None ) ),
+        ( 'parquet.load_store_week', lambda: load_columnar( path, parquet_dir, days=7 ) ),
+        ( 'store.build', store ),
+        ( 'filter.legacy_masks', lambda: legacy_select( state['legacy'], DATE_LIMIT, TRAFFIC_OPTIONS, WEATHER_OPTIONS ) ),
+        ( 'filter.store_select', select ),
+        ( 'cube.multi_rollup', rollups ),
+        ( 'sketch.build', lambda: SketchCube.build( state['store'].df ) ),
+        ( 'distinct.exact', lambda: df1()['Delivery_person_ID'].nunique() ),
+        ( 'distinct.sketches', lambda: state['store'].select_sketches( DATE_LIMIT, TRAFFIC_OPTIONS, WEATHER_OPTIONS ).count() ),
+        ( 'quantile.build', lambda: QuantileCube.build( state['store'].df ) ),
+        ( 'quantile.exact', lambda: df1()['Time_taken(min)'].quantile( list( PERCENTILES.values() ) ) ),
+        ( 'quantile.sketches', lambda: state['store'].select_quantiles( DATE_LIMIT, TRAFFIC_OPTIONS, WEATHER_OPTIONS ).quantiles() ),
+        ( 'empresa.order_metric', lambda: order_metric( cube() ) ),
+        ( 'empresa.traffic_order_share', lambda: traffic_order_share( cube() ) ),
+        ( 'empresa.traffic_order_city', lambda: traffic_order_city( cube() ) ),
+        ( 'empresa.order_by_week', lambda: order_by_week( cube() ) ),
+        ( 'empresa.order_share_by_week', lambda: order_share_by_week( df1() ) ),
+        ( 'empresa.week_share_sketches', lambda: week_share_sketches(
+              cube(), state['store'].select_sketches( DATE_LIMIT, TRAFFIC_OPTIONS, WEATHER_OPTIONS ) ) ),
+        ( 'empresa.country_maps', lambda: country_maps( df1() ).get_root().render() ),
+        ( 'empresa.bin_locations', lambda: bin_locations( df1()['Delivery_location_latitude'],
+                                                          df1()['Delivery_location_longitude'],
+                                                          GRID_LEVELS[6] ) ),
+        ( 'entregadores.rating_by_traffic_weather', lambda: rating_by_traffic_weather( state['ratings'], 'Weatherconditions' ) ),
+        ( 'entregadores.faster_deliver', lambda: faster_deliver( df1(), k=10 ) ),
+        ( 'restaurantes.distance_avg', lambda: distance( state['times'], 'avg' ) ),
+        ( 'restaurantes.distance_fig', lambda: distance( state['times'], 'fig' ) ),
+        ( 'restaurantes.festival_avg_std', lambda: festival_avg_std( state['times'], 'Yes', 'Time_mean' ) ),
+        ( 'restaurantes.bar_time_city', lambda: bar_time_city( state['times'] ) ),
+        ( 'restaurantes.avg_std_time_city', lambda: avg_std_time_city( state['times'] ) ),
+        ( 'restaurantes.avg_std_time_per_city_traf', lambda: avg_std_time_per_city_traf( state['times'] ) ),
+    ]
+
+def check_sketches( resultados, state, n_rows ):
+    """
+    Esta função tem a responsabilidade de conferir se os sketches valem a pena frente ao cálculo exato.
+    Critérios:
+    1. Em SKETCH_CHECKS, a mediana e o pico de memória da etapa com sketch ficam abaixo da etapa exata
+    2. As estruturas que o store guarda a mais (SketchCube e QuantileCube) ficam abaixo do dataset compacto que ele já guarda
+    Input: - resultados: medidas da rodada (dicts de run)
+           - state: estado das etapas (store montado)
+           - n_rows: tamanho da rodada
+    Output: lista de dicts (rows, check, sketch, exact, ok)
+    """
+
+    medidas = {r['step']: r for r in resultados if r['rows'] == n_rows}
+    conferencias = []
+    for sketch, exato in SKETCH_CHECKS:
+        for campo in ( 'median_s', 'peak_mb' ):
+            conferencias.append( {'rows': n_rows, 'check': '{} {}'.format( sketch, campo ),
+                                  'sketch': medidas[sketch][campo], 'exact': medidas[exato][campo]} )
+
+    dataset_mb = round( state['store'].df.memory_usage( deep=True ).sum() / 1024 ** 2, 2 )
+    estruturas = {'distinct': state['store'].select_sketches( DATE_LIMIT, TRAFFIC_OPTIONS, WEATHER_OPTIONS ),
+                  'quantile': state['store'].select_quantiles( DATE_LIMIT, TRAFFIC_OPTIONS, WEATHER_OPTIONS )}
+    for nome, estrutura in estruturas.items():
+        conferencias.append( {'rows': n_rows, 'check': '{}.structure_mb'.format( nome ),
+                              'sketch': round( estrutura.nbytes / 1024 ** 2, 2 ), 'exact': dataset_mb} )
+
+    for conferencia in conferencias:
+        conferencia['ok'] = bool( conferencia['sketch'] < conferencia['exact'] )
+        print( '{:>10}  {:<45} {:>10} {:>10}  {}'.format( n_rows, conferencia['check'], conferencia['sketch'],
+                                                         conferencia['exact'], 'ok' if conferencia['ok'] else 'ACIMA DO EXATO' ),
+               file=sys.stderr )
+
+    return conferencias
+
+def run( sizes, seed=42, repeat=3, skip_legacy_above=None, workers=None ):
+    """
+    Esta função tem a responsabilidade de rodar todas as etapas em cada tamanho de dataset.
+    Input: - sizes: quantidades de linhas (csv sintéticos em benchmarks/data)
+           - seed: semente do gerador
+           - repeat: execuções cronometradas por etapa
+           - skip_legacy_above: não mede o clean_code acima dessa quantidade de linhas
+           - workers: processos da leitura paralela (None = todos os núcleos)
+    Output: (lista de dicts (rows, step, median_s, min_s, peak_mb), lista de conferências de check_sketches)
+    """
+
+    resultados = []
+    conferencias = []
+    for n_rows in sizes:
+        path = os.path.join( DATA_DIR, 'train_{}.csv'.format( n_rows ) )
+        if not os.path.exists( path ):
+            print( 'Gerando {} linhas em {}'.format( n_rows, path ), file=sys.stderr )
+            write_csv( path, n_rows, seed=seed )
+
+        state = {}
+        for nome, func in steps( path, state, workers=workers ):
+            if nome == 'ingest.clean_code' and skip_legacy_above and n_rows > skip_legacy_above:
+                continue
+            # Etapas que só preparam estado (leitura e store) rodam uma vez
+            vezes = 1 if nome.startswith( 'ingest.' ) or nome in ( 'store.build', 'parquet.write' ) else repeat
+            _, medida = measure( func, repeat=vezes )
+            resultados.append( {'rows': n_rows, 'step': nome, **medida} )
+            print( '{:>10}  {:<45} {:>10.4f}s {:>9.1f}MB'.format( n_rows, nome, medida['median_s'], medida['peak_mb'] ),
+                   file=sys.stderr )
+
+        conferencias += check_sketches( resultados, state, n_rows )
+
+    return resultados, conferencias
+
+def metadata():
+    """
+    Esta função tem a responsabilidade de descrever o ambiente da rodada (commit, versões e máquina).
+    Output: dict
+    """
+
+    try:
+        commit = subprocess.run( ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                 cwd=os.path.dirname( os.path.abspath( __file__ ) ) ).stdout.strip()
+    except OSError:
+        commit = None
+
+    return {'timestamp': datetime.now().isoformat( timespec='seconds' ),
+            'commit': commit or None,
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()}
+
+def compare( old, new, threshold=REGRESSION_PCT ):
+    """
+    Esta função tem a responsabilidade de comparar duas rodadas, etapa por etapa.
+    Input: - old, new: conteúdo de dois json do run_benchmarks
+           - threshold: variação (em %) da mediana para marcar regressão
+    Output: df com as medianas, a variação de tempo e de memória e a marcação
+    """
+
+    df_old = pd.DataFrame( old['results'] ).set_index( ['rows', 'step'] )
+    df_new = pd.DataFrame( new['results'] ).set_index( ['rows', 'step'] )
+    df_aux = df_old.join( df_new, how='inner', lsuffix='_old', rsuffix='_new' )
+
+    df_aux['time_pct'] = np.round( ( df_aux['median_s_new'] / df_aux['median_s_old'] - 1 ) * 100, 1 )
+    df_aux['peak_pct'] = np.round( ( df_aux['peak_mb_new'] / df_aux['peak_mb_old'] - 1 ) * 100, 1 )
+    df_aux['flag'] = np.where( df_aux['time_pct'] > threshold, 'regressão',
+                               np.where( df_aux['time_pct'] < -threshold, 'melhora', '' ) )
+
+    return df_aux.loc[:, ['median_s_old', 'median_s_new', 'time_pct', 'peak_mb_old', 'peak_mb_new',
+                          'peak_pct', 'flag']].reset_index()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Mede leitura, filtros, agregações e gráficos das páginas.' )
+    parser.add_argument( '--rows', type=int, nargs='+', default=[100_000, 1_000_000, 10_000_000] )
+    parser.add_argument( '--seed', type=int, default=42 )
+    parser.add_argument( '--repeat', type=int, default=3 )
+    parser.add_argument( '--skip-legacy-above', type=int, default=None,
+                         help='não mede o clean_code acima dessa quantidade de linhas' )
+    parser.add_argument( '--workers', type=int, default=None, help='processos da leitura paralela (padrão: todos os núcleos)' )
+    parser.add_argument( '--out', default=None, help='json de saída (padrão: benchmarks/results/<data>.json)' )
+    parser.add_argument( '--compare', default=None, help='json de uma rodada anterior para comparar' )
+    args = parser.parse_args()
+
+    resultados, conferencias = run( args.rows, seed=args.seed, repeat=args.repeat,
+                                    skip_legacy_above=args.skip_legacy_above, workers=args.workers )
+    saida = {'meta': metadata(), 'results': resultados, 'sketch_checks': conferencias}
+
+    out = args.out or os.path.join( RESULTS_DIR, '{}.json'.format( datetime.now().strftime( '%Y%m%d-%H%M%S' ) ) )
+    os.makedirs( os.path.dirname( os.path.abspath( out ) ), exist_ok=True )
+    with open( out, 'w' ) as arquivo:
+        json.dump( saida, arquivo, indent=2 )
+    print( 'Resultados em {}'.format( out ), file=sys.stderr )
+
+    if args.compare:
+        with open( args.compare ) as arquivo:
+            anterior = json.load( arquivo )
+        print( compare( anterior, saida ).to_string( index=False ) )
+    else:
+        print( pd.DataFrame( saida['results'] ).to_string( index=False ) )
@@ -0,0 +1,72 @@
+# =========================================
+# Imports
+# =========================================
+import argparse
+import sys
+import warnings
+from datetime import datetime
+
+import pandas as pd
+
+from utils import visao_empresa, visao_entregadores
+from utils.data import DATASET_PATH
+from utils.sql import load_backend
+from utils.store import BATCH_DIR, load_store
+from utils.warmup import DEFAULT_DATE, TRAFFIC_OPTIONS, VIEWS, WEATHER_OPTIONS, view_weather
+
+# Seleções da barra lateral: (nome, data limite, trânsito, clima)
+SELECTIONS = [
+    ( 'padrão', DEFAULT_DATE, TRAFFIC_OPTIONS, WEATHER_OPTIONS ),
+    ( 'só Jam, primeiro dia', datetime( 2022, 2, 12 ), ['Jam'], ['conditions Fog'] ),
+    ( 'mínimo do slider', datetime( 2022, 2, 11 ), TRAFFIC_OPTIONS, WEATHER_OPTIONS ),
+    ( 'sem trânsito', DEFAULT_DATE, [], WEATHER_OPTIONS ),
+    ( 'antes do dataset', datetime( 1999, 1, 1 ), ['Jam'], WEATHER_OPTIONS ),
+]
+
+# Funções de resultados conferidas: as das páginas (VIEWS) e as entradas próprias do cache
+BUILDERS = {**VIEWS,
+            'visao_empresa.densidade': visao_empresa.density_results,
+            'visao_entregadores.rapidos': visao_entregadores.faster_results}
+
+# =========================================
+# Funções
+# =========================================
+
+def check_selections( source, selections=SELECTIONS, builders=BUILDERS ):
+    """
+    Esta função tem a responsabilidade de conferir que cada seção monta os seus resultados em qualquer seleção.
+    Critérios:
+    1. Seleções com linhas, mas sem algumas categorias (cidade, trânsito), não quebram os gráficos
+    2. Seleções vazias (nenhum trânsito, data antes do dataset) também não
+    Input: - source: store em memória ou banco (SqlBackend)
+           - selections: seleções da barra lateral
+           - builders: dict nome -> função de resultados
+    Output: df com uma linha por seção e seleção (rows, ok, error)
+    """
+
+    linhas = []
+    for nome, date_limit, traffic, weather in selections:
+        df1, _ = source.select( date_limit, list( traffic ), weather )
+        for view, builder in builders.items():
+            try:
+                with warnings.catch_warnings():
+                    warnings.simplefilter( 'ignore', RuntimeWarning )
+                    builder( source, date_limit, traffic, view_weather( view, weather ) )
+                erro = ''
+            except Exception as excecao:
+                erro = repr( excecao )
+            linhas.append( {'selection': nome, 'rows': len( df1 ), 'view': view, 'ok': not erro, 'error': erro} )
+
+    return pd.DataFrame( linhas )
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Confere as seções das páginas em seleções parciais e vazias.' )
+    parser.add_argument( 'path', nargs='?', default=DATASET_PATH )
+    args = parser.parse_args()
+
+    source = load_backend( args.path, batch_dir=BATCH_DIR ) or load_store( args.path, BATCH_DIR, spinner=False )
+    df_aux = check_selections( source )
+    print( df_aux.to_string( index=False ) )
+
+    if not df_aux['ok'].all():
+        sys.exit( 1 )
@@ -0,0 +1,135 @@
+# =========================================
+# Imports
+# =========================================
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+COLUNAS = ['ID', 'Delivery_person_ID', 'Delivery_person_Age', 'Delivery_person_Ratings',
+           'Restaurant_latitude', 'Restaurant_longitude', 'Delivery_location_latitude',
+           'Delivery_location_longitude', 'Order_Date', 'Time_Orderd', 'Time_Order_picked',
+           'Weatherconditions', 'Road_traffic_density', 'Vehicle_condition', 'Type_of_order',
+           'Type_of_vehicle', 'multiple_deliveries', 'Festival', 'City', 'Time_taken(min)']
+
+# Proporções aproximadas do train.csv original
+CIDADES = (['Metropolitian ', 'Urban ', 'Semi-Urban ', 'NaN '], [0.745, 0.222, 0.004, 0.029])
+TRAFEGO = (['Low ', 'Jam ', 'Medium ', 'High ', 'NaN '], [0.340, 0.312, 0.240, 0.098, 0.010])
+CLIMA = (['conditions Fog', 'conditions Stormy', 'conditions Cloudy', 'conditions Sandstorms',
+          'conditions Windy', 'conditions Sunny', 'conditions NaN'],
+         [0.169, 0.167, 0.166, 0.165, 0.164, 0.156, 0.013])
+FESTIVAL = (['No ', 'Yes ', 'NaN '], [0.975, 0.020, 0.005])
+PEDIDO = (['Snack ', 'Meal ', 'Drinks ', 'Buffet '], [0.252, 0.250, 0.249, 0.249])
+VEICULO = (['motorcycle ', 'scooter ', 'electric_scooter ', 'bicycle '], [0.584, 0.334, 0.081, 0.001])
+MULTIPLAS = (['0', '1', '2', '3', 'NaN '], [0.310, 0.618, 0.043, 0.007, 0.022])
+CENTROS = ['INDO', 'BANG', 'COIMB', 'CHEN', 'HYD', 'RANCHI', 'MYS', 'DEH', 'KOC', 'PUNE',
+           'LUDH', 'KNP', 'MUM', 'KOL', 'JAP', 'SUR', 'GOA', 'AURG', 'AGR', 'VAD', 'ALH', 'BHP']
+
+DATA_INICIAL = np.datetime64('2022-02-11')
+N_DIAS = 55
+
+# =========================================
+# Funções
+# =========================================
+
+def _escolha( rng, opcoes, n ):
+    valores, pesos = opcoes
+    pesos = np.asarray( pesos ) / np.sum( pesos )
+    
+    return np.asarray( valores, dtype=object )[rng.choice( len( valores ), size=n, p=pesos )]
+
+def generate_orders( n_rows, seed=42, start=0 ):
+    """
+    Esta função tem a responsabilidade de gerar pedidos sintéticos no formato do train.csv.
+    Mantém as sentinelas 'NaN ', o formato '(min) NN' e os espaços ao final dos textos.
+    Input: - n_rows: quantidade de linhas
+           - seed: semente (o mesmo seed e start geram sempre as mesmas linhas)
+           - start: deslocamento dos IDs, para gerar blocos de um mesmo arquivo
+    Output: df com todas as colunas como texto, igual ao pd.read_csv do original
+    """
+    
+    rng = np.random.default_rng( [seed, start] )
+    
+    # 1. Entregadores: poucos milhares por cidade-centro, reaproveitados entre pedidos
+    n_entregadores = max( 50, n_rows // 30 )
+    entregador = rng.integers( 0, n_entregadores, n_rows )
+    centro = np.asarray( CENTROS, dtype=object )[entregador % len( CENTROS )]
+    res = ( entregador // len( CENTROS ) ) % 20 + 1
+    delivery_person_id = centro + pd.Series( res ).map( '{:02d}'.format ).to_numpy( dtype=object ) + \
+                         'RES' + pd.Series( entregador % 3 + 1 ).map( 'DEL{:02d} '.format ).to_numpy( dtype=object )
+    
+    idade = rng.integers( 20, 40, n_rows ).astype( str ).astype( object )
+    nota = np.round( rng.normal( 4.63, 0.33, n_rows ).clip( 1, 5 ), 1 ).astype( str ).astype( object )
+    sem_idade = rng.random( n_rows ) < 0.04
+    idade[sem_idade] = 'NaN '
+    nota[sem_idade] = 'NaN '
+    
+    # 2. Coordenadas: restaurante e entrega próximos (até ~0.15 grau)
+    lat_rest = np.round( rng.uniform( 9, 31, n_rows ), 6 )
+    lon_rest = np.round( rng.uniform( 72, 89, n_rows ), 6 )
+    lat_ent = np.round( lat_rest + rng.uniform( -0.15, 0.15, n_rows ), 6 )
+    lon_ent = np.round( lon_rest + rng.uniform( -0.15, 0.15, n_rows ), 6 )
+    
+    # 3. Datas e horários
+    dias = DATA_INICIAL + rng.integers( 0, N_DIAS, n_rows ).astype( 'timedelta64[D]' )
+    order_date = pd.to_datetime( dias ).strftime( '%d-%m-%Y' ).to_numpy( dtype=object )
+    minutos = rng.integers( 8 * 60, 23 * 60, n_rows )
+    time_orderd = pd.to_datetime( minutos, unit='m' ).strftime( '%H:%M:%S' ).to_numpy( dtype=object )
+    time_picked = pd.to_datetime( minutos + 10, unit='m' ).strftime( '%H:%M:%S' ).to_numpy( dtype=object )
+    time_orderd[rng.random( n_rows ) < 0.04] = 'NaN '
+    
+    # 4. Tempo de entrega no formato '(min) NN'
+    tempo = rng.integers( 10, 55, n_rows )
+    time_taken = '(min) ' + tempo.astype( str ).astype( object )
+    
+    ids = pd.Series( np.arange( start, start + n_rows ) ).map( '0x{:x} '.format ).to_numpy( dtype=object )
+    
+    df = pd.DataFrame( {'ID': ids,
+                        'Delivery_person_ID': delivery_person_id,
+                        'Delivery_person_Age': idade,
+                        'Delivery_person_Ratings': nota,
+                        'Restaurant_latitude': lat_rest,
+                        'Restaurant_longitude': lon_rest,
+                        'Delivery_location_latitude': lat_ent,
+                        'Delivery_location_longitude': lon_ent,
+                        'Order_Date': order_date,
+                        'Time_Orderd': time_orderd,
+                        'Time_Order_picked': time_picked,
+                        'Weatherconditions': _escolha( rng, CLIMA, n_rows ),
+                        'Road_traffic_density': _escolha( rng, TRAFEGO, n_rows ),
+                        'Vehicle_condition': rng.integers( 0, 4, n_rows ),
+                        'Type_of_order': _escolha( rng, PEDIDO, n_rows ),
+                        'Type_of_vehicle': _escolha( rng, VEICULO, n_rows ),
+                        'multiple_deliveries': _escolha( rng, MULTIPLAS, n_rows ),
+                        'Festival': _escolha( rng, FESTIVAL, n_rows ),
+                        'City': _escolha( rng, CIDADES, n_rows ),
+                        'Time_taken(min)': time_taken}, columns=COLUNAS )
+    
+    return df
+
+def write_csv( path, n_rows, seed=42, chunk_rows=500_000 ):
+    """
+    Esta função tem a responsabilidade de escrever um csv sintético em blocos (memória constante).
+    Input: - path: arquivo de saída
+           - n_rows: quantidade de linhas
+           - seed: semente do gerador
+           - chunk_rows: linhas geradas por bloco
+    Output: path
+    """
+    
+    os.makedirs( os.path.dirname( os.path.abspath( path ) ), exist_ok=True )
+    for start in range( 0, n_rows, chunk_rows ):
+        df = generate_orders( min( chunk_rows, n_rows - start ), seed=seed, start=start )
+        df.to_csv( path, mode='w' if start == 0 else 'a', header=start == 0, index=False )
+    
+    return path
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Gera um train.csv sintético.' )
+    parser.add_argument( 'path' )
+    parser.add_argument( '--rows', type=int, default=100_000 )
+    parser.add_argument( '--seed', type=int, default=42 )
+    args = parser.parse_args()
+    
+    write_csv( args.path, args.rows, seed=args.seed )
@@ -1,156 +1,33 @@
 # =========================================
 # Imports
 # =========================================
-import pandas as pd
 import streamlit as st
 from datetime import datetime
-import plotly.express as px
-import plotly.graph_objects as go
 from PIL import Image
-from haversine import haversine
-import numpy as np
 
-st.set_page_config( page_title='Visão Restaurantes', page_icon='🍽', layout= 'wide')
-
-# =========================================
-# Funções
-# =========================================
-
-def clean_code( df1 ):
-    """
-    Esta função tem a responsabilidade de limpar o dataframe
-    Tipos de limpeza:
-    1. Remoção dos dados NaN
-    2. Limpeza da coluna de tempo (Time_taken(min)) - retirada do (min)
-    3. Conversão de tipos das colunas de dados
-    4. Conversão da coluna de datas
-    5. Remoção de espaço das variáveis de texto 
-    Input: df1
-    Output: df1 limpo
-    """
-    
-    # 1. Retirando as linhas NaN
-    linhas_sem_nan = df1.loc[:, 'multiple_deliveries'] != 'NaN '
-    df1 = df1.loc[linhas_sem_nan, :].copy()
-    
-    linhas_sem_nan = df1.loc[:, 'Delivery_person_Age'] != 'NaN '
-    df1 = df1.loc[linhas_sem_nan, :].copy()
-    
-    linhas_sem_nan = df1.loc[:, 'City'] != 'NaN '
-    df1 = df1.loc[linhas_sem_nan, :]
-    
-    linhas_sem_nan = df1.loc[:, 'Road_traffic_density'] != 'NaN '
-    df1 = df1.loc[linhas_sem_nan, :]
-    
-    linhas_sem_nan = df1.loc[:, 'Festival'] != 'NaN '
-    df1 = df1.loc[linhas_sem_nan, :]
-    
-    # 2. Limpeza coluna Time_taken(min)
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].apply(lambda x: x.split ('(min) ')[1])
-    
-    # 3. Converter type
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].astype(int)
-    df1['Delivery_person_Age'] = df1['Delivery_person_Age'].astype(int)
-    df1['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype(float)
-    
-    # 4. Converter data
-    df1['Order_Date'] = pd.to_datetime(df1['Order_Date'], format='%d-%m-%Y')
-    
-    # 5. Retirando espaços
-    df1.loc[:, 'Road_traffic_density'] = df1.loc[:, 'Road_traffic_density'].str.strip()
-    df1.loc[:, 'Festival'] = df1.loc[:, 'Festival'].str.strip()
-    df1.loc[:, 'City'] = df1.loc[:, 'City'].str.strip()
-
-    return df1
-
-def distance( df1, op ):  
-    """
-    Esta função tem a responsabilidade de calcular a distância média de entregas.
-    Input: - df1: dataframe com os dados necessários para cálculo
-    Output: - Média da distância
-    """
-    
-    cols = ['Restaurant_latitude', 'Delivery_location_latitude', 'Restaurant_longitude', 'Delivery_location_longitude'] 
-    df1['Distance'] = df1.loc[:, cols].apply(lambda x: 
-                                             haversine( (x['Restaurant_latitude'], x['Restaurant_longitude']),
-                                                        (x['Delivery_location_latitude'],x['Delivery_location_longitude']) ), axis=1 )
-    if op == 'avg':
-        avg_distance = np.round(df1['Distance'].mean(), 2)
-        return avg_distance
-
-    elif op == 'fig': 
-        fig = go.Figure( data=[ go.Pie( labels= df1['City'], values=df1['Distance'], pull=[0, 0.1, 0])])
-        return fig
-
-def festival_avg_std( df1, festival, col ):
-    """
-    Esta função tem a responsabilidade de calcular a média e o desvio padrão do tempo de entrega, em Festival e Não Festival.
-    Input: - df1: dataframe com os dados necessários para cálculo
-           - festival: condiciona para entregas que ocorreram:
-                       'Yes': entregas que ocorreram durante festival
-                       'No': entregas que ocorream fora do festival 
-           - col: define a coluna de operação a ser selecionada:
-                  'Time_mean' = coluna com o cáculo do tempo médio
-                  'Time_std' = coluna com o cáculo do tempo desvio padrão
-    Output: df: dataframe com 2 colunas e linhas selecionadas.
-    """
-    
-    df_avg_std_time_festival = ( df1.loc[:, ['Time_taken(min)', 'Festival']]
-                                    .groupby(['Festival'])
-                                    .agg({'Time_taken(min)':['mean', 'std']}) )
-    df_avg_std_time_festival.columns = ['Time_mean', 'Time_std']
-    df_avg_std_time_festival = df_avg_std_time_festival.reset_index()
-    df_avg_std_time_festival = np.round( df_avg_std_time_festival.loc[df_avg_std_time_festival['Festival'] == festival, col], 2)
-
-    return df_avg_std_time_festival
-
-
-def bar_time_city( df1 ):  
-    df_avg_std_time_per_city = ( df1.loc[:, ['Time_taken(min)', 'City']]
-                                    .groupby('City')
-                                    .agg({'Time_taken(min)':['mean', 'std']}) )
-    df_avg_std_time_per_city.columns = ['Time_mean', 'Time_std']
-    df_avg_std_time_per_city = df_avg_std_time_per_city.reset_index()
-        
-    fig = go.Figure()
-    fig.add_trace (go.Bar (name='Control',
-                              x= df_avg_std_time_per_city['City'],
-                              y= df_avg_std_time_per_city ['Time_std'],
-                              error_y=dict(type='data', array=df_avg_std_time_per_city['Time_std'])))
-    fig.update_layout(barmode='group')
+from utils.profiling import profiled, render_panel, start_profile
+from utils.results import cached_results
+from utils.sql import load_backend
+from utils.store import load_store
+from utils.visao_restaurantes import page_results
+from utils.warmup import start_warmup
 
-    return fig
-
-def avg_std_time_city( df1 ):
-    df_avg_std_time_per_city_order = ( df1.loc[:, ['Time_taken(min)', 'City', 'Type_of_order']]
-                                          .groupby(['City', 'Type_of_order'])
-                                          .agg({'Time_taken(min)':['mean', 'std']}) )
-    df_avg_std_time_per_city_order.columns = ['Time_mean', 'Time_std']
-    df_avg_std_time_per_city_order = df_avg_std_time_per_city_order.reset_index()
-    
-    return df_avg_std_time_per_city_order
-
-
-def avg_std_time_per_city_traf ( df1 ):
-    df_avg_std_time_per_city_traf = ( df1.loc[:, ['Time_taken(min)', 'City', 'Road_traffic_density']]
-                                         .groupby(['City', 'Road_traffic_density'])
-                                         .agg({'Time_taken(min)':['mean', 'std']}) )
-    df_avg_std_time_per_city_traf.columns = ['Time_mean', 'Time_std']
-    df_avg_std_time_per_city_traf = df_avg_std_time_per_city_traf.reset_index()
-    
-    fig = px.sunburst( df_avg_std_time_per_city_traf, path=['City', 'Road_traffic_density'], values='Time_mean', 
-                       color='Time_std', color_continuous_scale='rdbu', 
-                       color_continuous_midpoint=np.average(df_avg_std_time_per_city_traf['Time_std']) )
+st.set_page_config( page_title='Visão Restaurantes', page_icon='🍽', layout= 'wide')
 
-    return fig
+# Perfil do rerun: tempos por etapa (painel de desempenho e CURRY_PROFILE_LOG)
+profile = start_profile( 'visao_restaurantes' )
+plotly_chart = profiled( 'st.plotly_chart' )( st.plotly_chart )
+dataframe = profiled( 'st.dataframe' )( st.dataframe )
 
 # ========== Início da Estrutura lógica do código ========== 
 
-# Import Dataset
-df = pd.read_csv('dataset/train.csv')
-    
-# Limpando os dados
-df1 = clean_code( df )
+# Aquecimento em segundo plano (uma vez por processo): dataset e seleções comuns das três páginas
+start_warmup( 'dataset/train.csv', 'dataset/batches' )
+
+# Import Dataset: banco sqlite3 (CURRY_BACKEND=sqlite) ou store em memória, lido e limpo uma única vez
+# por processo, com os lotes novos de dataset/batches
+db = load_backend( 'dataset/train.csv' )
+store = load_store( 'dataset/train.csv', 'dataset/batches' ) if db is None else None
 
 # =========================================
 # Barra Lateral no Streamlit
@@ -175,9 +52,6 @@ date_slider = st.sidebar.slider('Até qual valor?',
                   max_value = datetime(2022, 4, 6), 
                   format='DD-MM-YYYY')
 
-linhas_selecionadas = df1['Order_Date'] < date_slider 
-df1 = df1.loc[linhas_selecionadas, :]
-
 st.sidebar.markdown("""___""")
 
 # Filtro de trânsito
@@ -185,16 +59,14 @@ traffic_options = st.sidebar.multiselect('Quais as condições do trânsito:',
                        ['Low', 'Medium', 'High', 'Jam'], 
                        default=['Low', 'Medium', 'High', 'Jam'])
 
-linhas_selecionadas = df1['Road_traffic_density'].isin(traffic_options) 
-df1 = df1.loc[linhas_selecionadas, :]
-
 # Filtro de clima
 weather_options = st.sidebar.multiselect('Quais as condições de clima:', 
                        ['conditions Cloudy', 'conditions Fog', 'conditions Sandstorms', 'conditions Stormy', 'conditions Sunny', 'conditions Windy'], 
                        default=['conditions Cloudy', 'conditions Fog', 'conditions Sandstorms', 'conditions Stormy', 'conditions Sunny', 'conditions Windy'])
 
-linhas_selecionadas = df1['Weatherconditions'].isin(weather_options) 
-df1 = df1.loc[linhas_selecionadas, :]
+# Resultados da seleção (filtros de data, trânsito e clima no dataset e no cubo), calculados uma vez
+# por processo e compartilhados entre as sessões
+results = cached_results( 'visao_restaurantes', page_results, store or db, date_slider, traffic_options, weather_options )
 
 st.sidebar.markdown("""___""")
 
@@ -206,77 +78,103 @@ st.sidebar.markdown('Powered by Comunidade DS')
 
 st.header('Market Place - Visão Restaurante')
 
-tab1, tab2, tab3 = st.tabs(['Visão Gerencial', '', ''])
-
-with tab1:
+with st.container():    
+    st.title('Médias')
+    col1, col2, col3, col4, col5, col6 = st.columns( 6 )
+    
+    # Total Entregadores Únicos
+    with col1: 
+        total_deliver = results['total_deliver']
+        erro = results['total_deliver_error']
+        col1.metric('Total Entregadores', total_deliver, 
+                    help=None if erro is None else 'Estimativa HyperLogLog (erro padrão de {:.1%})'.format( erro ))
     
-    with st.container():    
-        st.title('Médias')
-        col1, col2, col3, col4, col5, col6 = st.columns( 6 )
+    # Distância Média
+    with col2:
+        avg_distance = results['avg_distance']
+        col2.metric('Distância Média', avg_distance)
+
+    # Tempo médio de entrega durante os festivais
+    with col3:
+        df_avg_std_time_festival = results['festival_time_mean']
+        col3.metric('AVG Entrega Festival', df_avg_std_time_festival)
         
-        # Total Entregadores Únicos
-        with col1: 
-            total_deliver = df1['Delivery_person_ID'].nunique()
-            col1.metric('Total Entregadores', total_deliver)
+    # Tempo desvio padrão durante os festivais
+    with col4:
+        df_avg_std_time_festival = results['festival_time_std']
+        col4.metric('STD Entrega Festival', df_avg_std_time_festival)
+
+    # Tempo médio de entrega fora dos festivais
+    with col5:
+        df_avg_std_time_festival = results['no_festival_time_mean']
+        col5.metric('AVG Não Festival', df_avg_std_time_festival)
+
+    # Tempo desvio padrão de entrega fora dos festivais
+    with col6:
+        df_avg_std_time_festival = results['no_festival_time_std']
+        col6.metric('STD Não Festival', df_avg_std_time_festival)
         
-        # Distância Média
-        with col2:
-            avg_distance = distance( df1, 'avg' )
-            col2.metric('Distância Média', avg_distance)
-
-        # Tempo médio de entrega durante os festivais
-        with col3:
-            df_avg_std_time_festival = festival_avg_std( df1, 'Yes', 'Time_mean' )
-            col3.metric('AVG Entrega Festival', df_avg_std_time_festival)
-            
-        # Tempo desvio padrão durante os festivais
-        with col4:
-            df_avg_std_time_festival = festival_avg_std( df1, 'Yes', 'Time_std' )
-            col4.metric('STD Entrega Festival', df_avg_std_time_festival)
-
-        # Tempo médio de entrega fora dos festivais
-        with col5:
-            df_avg_std_time_festival = festival_avg_std( df1, 'No', 'Time_mean' )
-            col5.metric('AVG Não Festival', df_avg_std_time_festival)
-
-        # Tempo desvio padrão de entrega fora dos festivais
-        with col6:
-            df_avg_std_time_festival = festival_avg_std( df1, 'No', 'Time_std' )
-            col6.metric('STD Não Festival', df_avg_std_time_festival)
-            
-    with st.container():
-        st.markdown('''___''')
-        st.title('Gráficos')
-        col1, col2 = st.columns(2)
-
-        with col1: 
-            # Distribuição do tempo por cidade
-            st.markdown('##### Distribuição do tempo por cidade')
-            fig = bar_time_city( df1 ) 
-            st.plotly_chart( fig, use_container_width= True )
+with st.container():
+    st.markdown('''___''')
+    st.title('Gráficos')
+    col1, col2 = st.columns(2)
+
+    with col1: 
+        # Distribuição do tempo por cidade
+        st.markdown('##### Distribuição do tempo por cidade')
+        fig = results['bar_time_city']
+        plotly_chart( fig, use_container_width= True )
+        
+    with col2:
+        # Tempo médio por cidade e tipo de pedido
+        st.markdown('##### Tempo médio por cidade e tipo de pedido')
+        df_avg_std_time_per_city_order = results['avg_std_time_city']
+        dataframe(df_avg_std_time_per_city_order)
             
-        with col2:
-            # Tempo médio por cidade e tipo de pedido
-            st.markdown('##### Tempo médio por cidade e tipo de pedido')
-            df_avg_std_time_per_city_order = avg_std_time_city( df1 )
-            st.dataframe(df_avg_std_time_per_city_order)
-                
-    with st.container():
-        st.markdown('''___''')
-        st.title('Distribuição do tempo de Entrega')
-        col1, col2 = st.columns(2)
-
-        with col1:
-            # Tempo Médio de Entrega por Cidade
-            st.markdown('##### Tempo Médio de Entrega por Cidade')
-            fig = distance( df1, 'fig' )
-            st.plotly_chart( fig, use_container_width=True )
+with st.container():
+    st.markdown('''___''')
+    st.title('Distribuição do tempo de Entrega')
+    col1, col2 = st.columns(2)
+
+    with col1:
+        # Tempo Médio de Entrega por Cidade
+        st.markdown('##### Tempo Médio de Entrega por Cidade')
+        fig = results['distance_fig']
+        plotly_chart( fig, use_container_width=True )
+
+    with col2:
+        # Tempo médio e desvio padrão de entrega por cidade e tráfego de trânsito
+        st.markdown('##### Tempo médio e desvio padrão de entrega por cidade e tráfego de trânsito')
+        fig = results['avg_std_time_per_city_traf']
+        plotly_chart( fig, use_container_width= True  )
+
+with st.container():
+    st.markdown('''___''')
+    st.title('Percentis do tempo de entrega')
+    col1, col2, col3 = st.columns( 3 )
+    
+    # p50, p90 e p99 da seleção (sketches de quantis, erro relativo de até 1%)
+    percentis = results['time_percentiles']
+    col1.metric('p50 (min)', percentis['p50'])
+    col2.metric('p90 (min)', percentis['p90'])
+    col3.metric('p99 (min)', percentis['p99'])
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        # Percentis por dimensão
+        st.markdown('##### Percentis por dimensão')
+        dimensao = st.selectbox('Agrupar por', list( results['time_percentiles_by'] ))
+        dataframe( results['time_percentiles_by'][dimensao], hide_index=True )
+    
+    with col2:
+        # Distribuição do tempo de entrega
+        st.markdown('##### Distribuição do tempo de entrega')
+        fig = results['time_distribution']
+        plotly_chart( fig, use_container_width=True )
 
-        with col2:
-            # Tempo médio e desvio padrão de entrega por cidade e tráfego de trânsito
-            st.markdown('##### Tempo médio e desvio padrão de entrega por cidade e tráfego de trânsito')
-            fig = avg_std_time_per_city_traf ( df1 )             
-            st.plotly_chart( fig, use_container_width= True  )
+with st.container():
+    st.markdown('''___''')
 
-    with st.container():
-        st.markdown('''___''')
+# Painel de desempenho (opcional) e registro do rerun
+render_panel( profile, store )
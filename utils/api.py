@@ -0,0 +1,335 @@
+# =========================================
+# Imports
+# =========================================
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+from utils.data import DATASET_PATH
+from utils.export import flatten_results
+from utils.results import RESULTS, ResultCache, cached_results, normalize_options, selection_key
+from utils.sql import load_backend
+from utils.store import BATCH_DIR, load_store
+from utils.warmup import DEFAULT_DATE, TRAFFIC_OPTIONS, VIEWS, WEATHER_OPTIONS, view_weather
+
+logger = logging.getLogger( __name__ )
+
+API_HOST = os.environ.get( 'CURRY_API_HOST', '127.0.0.1' )
+API_PORT = int( os.environ.get( 'CURRY_API_PORT', '8502' ) )
+
+# Threads que calculam as respostas (o loop do asyncio só lê e escreve nas conexões)
+API_WORKERS = int( os.environ.get( 'CURRY_API_WORKERS', '4' ) )
+
+# Maior cabeçalho aceito em uma requisição
+MAX_HEADER_BYTES = 16 * 1024
+
+# Maior corpo aceito (a API só tem GET; o corpo é lido e descartado)
+MAX_BODY_BYTES = 16 * 1024
+
+# Corpo JSON e ETag de cada seleção: uma resposta repetida não é serializada de novo
+RESPONSES = ResultCache()
+
+# =========================================
+# Funções
+# =========================================
+
+class ApiError( Exception ):
+    """Requisição inválida: status HTTP e mensagem devolvidos ao cliente."""
+
+    def __init__( self, status, message ):
+        super().__init__( message )
+        self.status = status
+
+def json_body( conteudo ):
+    """Corpo JSON em bytes (utf-8)."""
+
+    return json.dumps( conteudo, ensure_ascii=False, default=str ).encode( 'utf-8' )
+
+def parse_options( query, nome, opcoes ):
+    """
+    Esta função tem a responsabilidade de ler as opções de um filtro da query string.
+    Critérios:
+    1. Aceita o parâmetro repetido (?traffic=Low&traffic=Jam) ou separado por vírgula (?traffic=Low,Jam)
+    2. Parâmetro ausente = todas as opções, como a barra lateral
+    3. Opções que não existem na barra lateral são erro 400
+    Input: - query: dict do parse_qs
+           - nome: parâmetro (traffic ou weather)
+           - opcoes: opções válidas
+    Output: lista de opções
+    """
+
+    if nome not in query:
+        return list( opcoes )
+
+    valores = [valor.strip() for item in query[nome] for valor in item.split( ',' ) if valor.strip()]
+    invalidas = sorted( set( valores ) - set( opcoes ) )
+    if invalidas or not valores:
+        raise ApiError( HTTPStatus.BAD_REQUEST, '{} inválido: {} (opções: {})'.format(
+                        nome, ', '.join( invalidas ) or 'vazio', ', '.join( opcoes ) ) )
+
+    return valores
+
+def parse_selection( query ):
+    """
+    Esta função tem a responsabilidade de montar a seleção da barra lateral a partir da query string.
+    A data é comparada com as datas do dataset (sem fuso): datas vazias (NaT) e com fuso são recusadas.
+    Input: query: dict do parse_qs (date, traffic e weather; todos opcionais)
+    Output: dict com date, traffic e weather
+    """
+
+    date = DEFAULT_DATE
+    if 'date' in query:
+        try:
+            data = pd.Timestamp( query['date'][-1] )
+        except ( ValueError, OverflowError ):
+            data = pd.NaT
+        if pd.isna( data ) or data.tzinfo is not None:
+            raise ApiError( HTTPStatus.BAD_REQUEST, 'date inválida: {} (use AAAA-MM-DD, sem fuso)'.format( query['date'][-1] ) )
+        date = data.to_pydatetime()
+
+    return {'date': date,
+            'traffic': parse_options( query, 'traffic', TRAFFIC_OPTIONS ),
+            'weather': parse_options( query, 'weather', WEATHER_OPTIONS )}
+
+async def read_line( reader ):
+    """Uma linha da requisição, ou None quando a linha passa do limite do StreamReader (MAX_HEADER_BYTES)."""
+
+    try:
+        return await reader.readline()
+    except ( ValueError, asyncio.LimitOverrunError ):
+        return None
+
+def content_length( headers ):
+    """
+    Esta função tem a responsabilidade de validar o Content-Length da requisição.
+    Input: headers: cabeçalhos da requisição (nomes em minúsculas)
+    Output: tamanho do corpo em bytes (0 sem o cabeçalho)
+    """
+
+    valor = headers.get( 'content-length', '0' )
+    if not ( valor.isascii() and valor.isdigit() ):
+        raise ApiError( HTTPStatus.BAD_REQUEST, 'Content-Length inválido: {}'.format( valor ) )
+    if int( valor ) > MAX_BODY_BYTES:
+        raise ApiError( HTTPStatus.REQUEST_ENTITY_TOO_LARGE, 'Corpo grande demais (máximo {} bytes)'.format( MAX_BODY_BYTES ) )
+
+    return int( valor )
+
+def etag_matches( if_none_match, etag ):
+    """True quando o If-None-Match do cliente contém a ETag atual (ou é '*')."""
+
+    etiquetas = [item.strip() for item in if_none_match.split( ',' )]
+
+    return '*' in etiquetas or etag in etiquetas or 'W/' + etag in etiquetas
+
+class MetricsApi:
+    """
+    Métricas das páginas em JSON, por HTTP (asyncio.start_server), para outros dashboards.
+    O dataset é carregado uma vez no processo (ou o banco é aberto, com CURRY_BACKEND=sqlite);
+    os resultados das páginas ficam no cache do processo (utils.results) e o corpo de cada resposta,
+    com a sua ETag, em RESPONSES. Os cálculos rodam em um pool de threads, fora do loop do asyncio.
+    Rotas:
+    - GET /views: páginas e seções, opções dos filtros e data padrão
+    - GET /metrics/<view>?date=2022-04-13&traffic=Low,Jam&weather=conditions Fog: métricas e tabelas
+    - GET /health: versão dos dados
+    - GET /stats: uso dos caches
+    """
+
+    def __init__( self, path=DATASET_PATH, batch_dir=BATCH_DIR, workers=API_WORKERS ):
+        self.path = path
+        self.batch_dir = batch_dir
+        self.db = load_backend( path, batch_dir=batch_dir )
+        self.pool = ThreadPoolExecutor( max_workers=workers, thread_name_prefix='api' )
+
+    def source( self ):
+        """Banco, quando ligado (com os lotes novos inseridos), ou o store do processo com os lotes novos aplicados."""
+
+        db = load_backend( self.path, batch_dir=self.batch_dir ) if self.db is not None else None
+
+        return db or load_store( self.path, self.batch_dir, spinner=False )
+
+    def metrics( self, view, selection ):
+        """
+        Esta função tem a responsabilidade de devolver o corpo e a ETag das métricas de uma página (em uma thread do pool).
+        Critérios:
+        1. A chave é a mesma do cache das páginas: seleção normalizada e versão dos dados
+        2. A ETag é o hash do corpo: muda só quando o resultado muda (um lote novo, por exemplo)
+        Input: - view: página ou seção (VIEWS)
+               - selection: dict com date, traffic e weather
+        Output: (etag, corpo em bytes)
+        """
+
+        source = self.source()
+        version = source.cache_version
+        weather = view_weather( view, selection['weather'] )
+        key = selection_key( 'api.' + view, version, selection['date'], selection['traffic'], weather )
+
+        def render():
+            resultados = cached_results( view, VIEWS[view], source, selection['date'], selection['traffic'], weather )
+            kpis, tabelas = flatten_results( resultados )
+            corpo = json_body( {'view': view, 'version': list( version ),
+                                'selection': {'date': pd.Timestamp( selection['date'] ).isoformat(),
+                                              'traffic': list( normalize_options( selection['traffic'] ) ),
+                                              'weather': None if weather is None else list( normalize_options( weather ) )},
+                                'kpis': kpis,
+                                'tables': {nome: json.loads( df_aux.to_json( orient='records', date_format='iso' ) )
+                                           for nome, df_aux in tabelas.items()}} )
+            return '"{}"'.format( hashlib.sha1( corpo ).hexdigest() ), corpo
+
+        return RESPONSES.get_or_compute( key, render, version=version )
+
+    async def route( self, metodo, alvo, headers ):
+        """
+        Esta função tem a responsabilidade de responder uma requisição.
+        Input: - metodo, alvo: linha da requisição
+               - headers: cabeçalhos (nomes em minúsculas)
+        Output: (status, corpo em bytes, cabeçalhos extras)
+        """
+
+        if metodo not in ( 'GET', 'HEAD' ):
+            raise ApiError( HTTPStatus.METHOD_NOT_ALLOWED, 'Só GET' )
+
+        url = urlsplit( alvo )
+        partes = [parte for parte in url.path.split( '/' ) if parte]
+        loop = asyncio.get_running_loop()
+
+        if partes in ( [], ['views'] ):
+            return HTTPStatus.OK, json_body( {'views': list( VIEWS ), 'traffic': TRAFFIC_OPTIONS,
+                                              'weather': WEATHER_OPTIONS, 'default_date': DEFAULT_DATE.isoformat()} ), {}
+        if partes == ['health']:
+            version = await loop.run_in_executor( self.pool, lambda: self.source().cache_version )
+            return HTTPStatus.OK, json_body( {'status': 'ok', 'version': list( version )} ), {}
+        if partes == ['stats']:
+            return HTTPStatus.OK, json_body( {'results': RESULTS.stats(), 'responses': RESPONSES.stats()} ), {}
+        if len( partes ) != 2 or partes[0] != 'metrics':
+            raise ApiError( HTTPStatus.NOT_FOUND, 'Rota inexistente: {}'.format( url.path ) )
+        if partes[1] not in VIEWS:
+            raise ApiError( HTTPStatus.NOT_FOUND, 'Página inexistente: {} (páginas: {})'.format(
+                            partes[1], ', '.join( VIEWS ) ) )
+
+        selection = parse_selection( parse_qs( url.query ) )
+        etag, corpo = await loop.run_in_executor( self.pool, self.metrics, partes[1], selection )
+        extras = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if etag_matches( headers.get( 'if-none-match', '' ), etag ):
+            return HTTPStatus.NOT_MODIFIED, b'', extras
+
+        return HTTPStatus.OK, corpo, extras
+
+    async def handle( self, reader, writer ):
+        """
+        Esta função tem a responsabilidade de atender uma conexão (HTTP/1.1 com keep-alive).
+        Critérios:
+        1. Requisições da mesma conexão são respondidas em ordem
+        2. Erros de validação viram a resposta com o status do ApiError; outros erros, 500
+        3. Linha de requisição malformada ou grande demais: 400; cabeçalho grande demais: 431;
+           Content-Length inválido: 400; corpo maior que MAX_BODY_BYTES: 413 (sem ler o corpo)
+        4. A conexão fecha com 'Connection: close', HTTP/1.0 ou requisição recusada antes da rota
+           (o resto dela continua no stream)
+        """
+
+        try:
+            while True:
+                linha = await read_line( reader )
+                if linha == b'':
+                    break
+                partes = [] if linha is None else linha.decode( 'latin-1' ).split()
+                if len( partes ) != 3:
+                    await self.respond( writer, HTTPStatus.BAD_REQUEST, json_body( {'error': 'Requisição malformada'} ),
+                                        {}, 'GET', False )
+                    break
+                metodo, alvo, versao = partes
+
+                recusa = None
+                headers = {}
+                tamanho = len( linha )
+                while True:
+                    linha = await read_line( reader )
+                    if linha is None or tamanho + len( linha ) > MAX_HEADER_BYTES:
+                        recusa = ApiError( HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, 'Cabeçalho grande demais' )
+                        break
+                    tamanho += len( linha )
+                    if linha in ( b'\r\n', b'\n', b'' ):
+                        break
+                    nome, _, valor = linha.decode( 'latin-1' ).partition( ':' )
+                    headers[nome.strip().lower()] = valor.strip()
+                if recusa is None:
+                    try:
+                        await reader.readexactly( content_length( headers ) )
+                    except ApiError as erro:
+                        recusa = erro
+
+                manter = ( recusa is None and versao == 'HTTP/1.1'
+                           and headers.get( 'connection', '' ).lower() != 'close' )
+                try:
+                    if recusa is not None:
+                        raise recusa
+                    status, corpo, extras = await self.route( metodo, alvo, headers )
+                except ApiError as erro:
+                    status, corpo, extras = erro.status, json_body( {'error': str( erro )} ), {}
+                except Exception:
+                    logger.exception( 'Erro em %s %s', metodo, alvo )
+                    status, corpo, extras = HTTPStatus.INTERNAL_SERVER_ERROR, json_body( {'error': 'Erro interno'} ), {}
+                logger.debug( '%s %s %d', metodo, alvo, status )
+
+                await self.respond( writer, status, corpo, extras, metodo, manter )
+                if not manter:
+                    break
+        except ( ConnectionError, asyncio.IncompleteReadError ):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def respond( writer, status, corpo, extras, metodo, manter ):
+        """Escreve a resposta: linha de status, cabeçalhos e corpo (sem corpo em HEAD e 304)."""
+
+        status = HTTPStatus( status )
+        linhas = ['HTTP/1.1 {} {}'.format( status.value, status.phrase ),
+                  'Content-Type: application/json; charset=utf-8',
+                  'Content-Length: {}'.format( len( corpo ) ),
+                  'Connection: {}'.format( 'keep-alive' if manter else 'close' )]
+        linhas += ['{}: {}'.format( nome, valor ) for nome, valor in extras.items()]
+        writer.write( ( '\r\n'.join( linhas ) + '\r\n\r\n' ).encode( 'latin-1' ) )
+        if metodo != 'HEAD' and status != HTTPStatus.NOT_MODIFIED:
+            writer.write( corpo )
+        await writer.drain()
+
+    async def serve( self, host=API_HOST, port=API_PORT ):
+        """
+        Esta função tem a responsabilidade de carregar o dataset e atender as conexões até o processo terminar.
+        Input: - host, port: endereço do servidor
+        """
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor( self.pool, self.source )
+
+        servidor = await asyncio.start_server( self.handle, host, port, limit=MAX_HEADER_BYTES )
+        enderecos = ', '.join( 'http://{}:{}'.format( *sock.getsockname()[:2] ) for sock in servidor.sockets )
+        logger.info( 'API de métricas em %s', enderecos )
+        async with servidor:
+            await servidor.serve_forever()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Serve as métricas das páginas em JSON, por HTTP.' )
+    parser.add_argument( 'path', nargs='?', default=DATASET_PATH )
+    parser.add_argument( '--host', default=API_HOST )
+    parser.add_argument( '--port', type=int, default=API_PORT )
+    parser.add_argument( '--workers', type=int, default=API_WORKERS )
+    parser.add_argument( '--verbose', action='store_true', help='registra cada requisição' )
+    args = parser.parse_args()
+
+    logging.basicConfig( level=logging.INFO, format='%(asctime)s %(message)s', stream=sys.stderr )
+    if args.verbose:
+        logger.setLevel( logging.DEBUG )
+    try:
+        asyncio.run( MetricsApi( args.path, workers=args.workers ).serve( args.host, args.port ) )
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,189 @@
+# =========================================
+# Imports
+# =========================================
+import argparse
+import json
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from utils.data import DATASET_PATH, DATE_COLUMN, UNUSED_COLUMNS, read_dataset
+
+PARQUET_DIR = 'dataset/parquet'
+
+# Janela de histórico do store em dias, contados a partir do último dia do dataset (0 = histórico inteiro)
+HISTORY_DAYS = int( os.environ.get( 'CURRY_HISTORY_DAYS', '0' ) ) or None
+
+# Partições no disco: uma pasta por dia e, dentro dela, uma por cidade
+PARTITION_COLUMNS = ['Order_Date', 'City']
+PARTITIONING = ds.partitioning( pa.schema( [( 'Order_Date', pa.date32() ), ( 'City', pa.string() )] ),
+                                flavor='hive' )
+
+# Posição da linha no csv: a leitura volta à ordem original do arquivo
+ROW_COLUMN = '_row'
+
+# Origem da conversão (csv e mtime): partições de outra versão do csv não são usadas
+META_FILE = '_source.json'
+
+# =========================================
+# Funções
+# =========================================
+
+def write_partitioned( df1, root=PARQUET_DIR, source=None ):
+    """
+    Esta função tem a responsabilidade de gravar o dataset limpo em Parquet, particionado por dia e cidade.
+    Critérios:
+    1. A gravação é feita em uma pasta temporária e trocada de uma vez no final
+    2. Cada linha leva a sua posição original (ROW_COLUMN)
+    3. O csv de origem e o seu mtime ficam registrados em META_FILE
+    Input: - df1: dataset limpo (read_dataset)
+           - root: pasta de destino
+           - source: csv de origem (opcional)
+    Output: quantidade de arquivos gravados
+    """
+
+    tmp = root.rstrip( os.sep ) + '.tmp'
+    shutil.rmtree( tmp, ignore_errors=True )
+
+    df_aux = df1.assign( **{ROW_COLUMN: pd.RangeIndex( len( df1 ) ), DATE_COLUMN: df1[DATE_COLUMN].dt.date} )
+    tabela = pa.Table.from_pandas( df_aux, preserve_index=False )
+    ds.write_dataset( tabela, tmp, format='parquet', partitioning=PARTITIONING,
+                      max_rows_per_group=1024 ** 2, existing_data_behavior='overwrite_or_ignore' )
+
+    meta = {'columns': list( df1.columns )}
+    if source is not None:
+        meta.update( {'source': os.path.abspath( source ), 'mtime': os.stat( source ).st_mtime_ns} )
+    with open( os.path.join( tmp, META_FILE ), 'w', encoding='utf-8' ) as arquivo:
+        json.dump( meta, arquivo, indent=2 )
+
+    shutil.rmtree( root, ignore_errors=True )
+    os.replace( tmp, root )
+
+    return sum( len( arquivos ) for _, _, arquivos in os.walk( root ) ) - 1
+
+def read_meta( root=PARQUET_DIR ):
+    """Conteúdo do META_FILE (None quando a pasta não foi convertida)."""
+
+    path = os.path.join( root, META_FILE )
+    if not os.path.exists( path ):
+        return None
+    with open( path, encoding='utf-8' ) as arquivo:
+        return json.load( arquivo )
+
+def is_current( source, root=PARQUET_DIR ):
+    """
+    Esta função tem a responsabilidade de conferir se as partições foram geradas a partir da versão atual do csv.
+    Input: - source: csv de origem
+           - root: pasta das partições
+    Output: True quando o csv e o mtime registrados são os atuais
+    """
+
+    meta = read_meta( root )
+
+    return ( meta is not None and meta.get( 'source' ) == os.path.abspath( source )
+             and meta.get( 'mtime' ) == os.stat( source ).st_mtime_ns )
+
+def read_partitioned( root=PARQUET_DIR, date_start=None, date_limit=None, cities=None, columns=None ):
+    """
+    Esta função tem a responsabilidade de ler das partições só os dias, cidades e colunas pedidos.
+    Critérios:
+    1. Os filtros de data e cidade são aplicados nas pastas (partições fora do filtro não são abertas)
+    2. Só as colunas pedidas são lidas dos arquivos
+    3. As linhas voltam na ordem do csv e com os mesmos tipos do read_dataset
+    Input: - root: pasta das partições
+           - date_start: primeira data (inclusiva, opcional)
+           - date_limit: data limite (exclusiva, como o slider das páginas; opcional)
+           - cities: cidades (opcional)
+           - columns: colunas (None = todas)
+    Output: df1 limpo
+    """
+
+    meta = read_meta( root )
+    colunas = meta['columns'] if columns is None else [col for col in meta['columns'] if col in columns]
+
+    filtro = None
+    condicoes = []
+    if date_start is not None:
+        condicoes.append( ds.field( DATE_COLUMN ) >= pa.scalar( pd.Timestamp( date_start ).date(), pa.date32() ) )
+    if date_limit is not None:
+        # Corte arredondado para cima: mesmo resultado do FilterIndex com horário na data limite
+        condicoes.append( ds.field( DATE_COLUMN ) < pa.scalar( pd.Timestamp( date_limit ).ceil( 'D' ).date(), pa.date32() ) )
+    if cities is not None:
+        condicoes.append( ds.field( 'City' ).isin( list( cities ) ) )
+    for condicao in condicoes:
+        filtro = condicao if filtro is None else filtro & condicao
+
+    dataset = ds.dataset( root, format='parquet', partitioning=PARTITIONING,
+                          exclude_invalid_files=False, ignore_prefixes=['.', '_'] )
+    tabela = dataset.to_table( columns=colunas + [ROW_COLUMN], filter=filtro )
+
+    df1 = tabela.to_pandas()
+    df1 = df1.sort_values( ROW_COLUMN, kind='stable', ignore_index=True ).drop( columns=ROW_COLUMN )
+    if DATE_COLUMN in df1.columns:
+        df1[DATE_COLUMN] = pd.to_datetime( df1[DATE_COLUMN] ).astype( 'datetime64[ns]' )
+
+    return df1
+
+def partition_dates( root=PARQUET_DIR ):
+    """Dias gravados nas partições, lidos dos nomes das pastas (sem abrir nenhum arquivo)."""
+
+    prefixo = DATE_COLUMN + '='
+    datas = [nome[len( prefixo ):] for nome in os.listdir( root ) if nome.startswith( prefixo )]
+
+    return pd.DatetimeIndex( sorted( datas ) )
+
+def history_start( last_date, days=HISTORY_DAYS ):
+    """Primeiro dia da janela de histórico que termina em last_date (None = histórico inteiro)."""
+
+    if not days or pd.isna( last_date ):
+        return None
+
+    return pd.Timestamp( last_date ).normalize() - pd.Timedelta( days=days - 1 )
+
+def recent_history( df1, days=HISTORY_DAYS ):
+    """
+    Esta função tem a responsabilidade de cortar um dataset já lido para a janela de histórico.
+    É o mesmo corte do load_columnar, para quando o store é criado a partir do csv.
+    Input: - df1: dataset limpo
+           - days: dias da janela (None = histórico inteiro)
+    Output: df1 só com os dias da janela
+    """
+
+    inicio = history_start( df1[DATE_COLUMN].max(), days )
+    if inicio is None:
+        return df1
+
+    return df1.loc[df1[DATE_COLUMN] >= inicio].reset_index( drop=True )
+
+def load_columnar( source, root=PARQUET_DIR, days=HISTORY_DAYS ):
+    """
+    Esta função tem a responsabilidade de carregar o dataset do store a partir das partições.
+    Critérios:
+    1. Só as colunas que as páginas usam são lidas (sem as UNUSED_COLUMNS)
+    2. Com uma janela de histórico, só as partições dos últimos days dias são abertas
+    Input: - source: csv de origem
+           - root: pasta das partições
+           - days: dias da janela (None = histórico inteiro)
+    Output: df1 limpo, ou None quando as partições não existem ou são de outra versão do csv
+    """
+
+    if not is_current( source, root ):
+        return None
+
+    colunas = [col for col in read_meta( root )['columns'] if col not in UNUSED_COLUMNS]
+    datas = partition_dates( root )
+    inicio = history_start( datas.max() if len( datas ) else None, days )
+
+    return read_partitioned( root, date_start=inicio, columns=colunas )
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Converte o csv limpo em Parquet particionado por dia e cidade.' )
+    parser.add_argument( 'path', nargs='?', default=DATASET_PATH )
+    parser.add_argument( '--out', default=PARQUET_DIR )
+    args = parser.parse_args()
+
+    arquivos = write_partitioned( read_dataset( args.path ), args.out, source=args.path )
+    print( '{} arquivos em {}'.format( arquivos, args.out ) )
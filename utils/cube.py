@@ -0,0 +1,192 @@
+# =========================================
+# Imports
+# =========================================
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from utils.profiling import profiled
+
+# Dimensões do cubo: todas as combinações de filtros e agrupamentos usados nas páginas
+CUBE_DIMS = ['Order_Date', 'City', 'Road_traffic_density', 'Weatherconditions', 'Festival', 'Type_of_order']
+
+# Colunas numéricas resumidas em cada célula por momentos combináveis:
+# quantidade de valores (n), média (mean) e soma dos quadrados dos desvios (m2)
+CUBE_VALUES = ['Time_taken(min)', 'Delivery_person_Ratings', 'Distance']
+
+# Consultas que precisaram das linhas brutas (nome da consulta -> vezes), por processo
+FALLBACKS = Counter()
+
+# =========================================
+# Funções
+# =========================================
+
+def build_cube( df1 ):
+    """
+    Esta função tem a responsabilidade de pré-agregar o dataset nas dimensões do cubo.
+    Cada linha do cubo é uma combinação de CUBE_DIMS com:
+    - orders: quantidade de pedidos
+    - <coluna>_n, <coluna>_mean, <coluna>_m2: quantidade de valores, média e soma dos
+      quadrados dos desvios (m2 = n * variância populacional)
+    Os momentos são numericamente estáveis e podem ser combinados (combine_moments).
+    Input: df1 limpo
+    Output: df com o cubo (uma linha por combinação existente)
+    """
+    
+    # Momentos em float64, mesmo com o dataset compacto (int16/float32)
+    df_aux = df1.loc[:, CUBE_DIMS + CUBE_VALUES].astype( {col: 'float64' for col in CUBE_VALUES} )
+    grupos = df_aux.groupby( CUBE_DIMS, observed=True, dropna=False, sort=False )[CUBE_VALUES]
+    
+    n = grupos.count()
+    df_cube = pd.concat( [grupos.size().rename( 'orders' ),
+                          n.add_suffix( '_n' ),
+                          grupos.mean().fillna( 0 ).add_suffix( '_mean' ),
+                          ( grupos.var( ddof=0 ).fillna( 0 ) * n ).add_suffix( '_m2' )], axis=1 )
+    
+    return df_cube.reset_index()
+
+def combine_moments( df_cube, by, values=CUBE_VALUES ):
+    """
+    Esta função tem a responsabilidade de combinar os momentos das células por um agrupamento.
+    Usa a fórmula de combinação de Chan et al.:
+    - n = soma dos n
+    - mean = soma de n * mean / n
+    - m2 = soma dos m2 + soma de n * (mean da célula - mean do grupo)²
+    Input: - df_cube: cubo (ou resultado de outro combine_moments)
+           - by: lista de dimensões de agrupamento
+           - values: colunas de CUBE_VALUES a combinar
+    Output: df com by + orders + <coluna>_n, <coluna>_mean, <coluna>_m2
+    """
+    
+    chaves = [df_cube[col] for col in by]
+    cols_n = [value + '_n' for value in values]
+    
+    df_aux = df_cube.groupby( chaves, observed=True, dropna=False )[['orders'] + cols_n].sum()
+    for value in values:
+        n = df_cube[value + '_n']
+        mean = df_cube[value + '_mean']
+        
+        n_grupo = n.groupby( chaves, observed=True, dropna=False ).transform( 'sum' )
+        mean_grupo = ( ( n * mean ).groupby( chaves, observed=True, dropna=False ).transform( 'sum' ) / n_grupo ).fillna( 0 )
+        desvio = n * ( mean - mean_grupo ) ** 2
+        
+        df_aux[value + '_mean'] = mean_grupo.groupby( chaves, observed=True, dropna=False ).first()
+        df_aux[value + '_m2'] = ( df_cube[value + '_m2'] + desvio ).groupby( chaves, observed=True, dropna=False ).sum()
+    
+    return df_aux.reset_index()
+
+def filter_cube( df_cube, date_limit, traffic_options, weather_options=None ):
+    """
+    Esta função tem a responsabilidade de aplicar os filtros da barra lateral no cubo.
+    Mesmas regras dos filtros das páginas, mas sobre as células já agregadas.
+    Input: - df_cube: cubo completo
+           - date_limit: data limite (exclusiva)
+           - traffic_options: densidades de trânsito selecionadas
+           - weather_options: condições de clima selecionadas (None = sem filtro)
+    Output: df com as células selecionadas
+    """
+    
+    linhas_selecionadas = ( df_cube['Order_Date'] < date_limit ) & df_cube['Road_traffic_density'].isin( traffic_options )
+    if weather_options is not None:
+        linhas_selecionadas &= df_cube['Weatherconditions'].isin( weather_options )
+    
+    return df_cube.loc[linhas_selecionadas, :]
+
+def drop_unused_categories( df_aux, by ):
+    """
+    Esta função tem a responsabilidade de tirar das dimensões categóricas as categorias que a seleção não tem.
+    O dataset compacto guarda as dimensões como categorias; os gráficos (plotly) usam a lista de categorias,
+    e uma categoria sem linhas (ex.: removida pelo filtro) quebra o gráfico.
+    Input: - df_aux: resultado de um agrupamento
+           - by: dimensões do agrupamento
+    Output: df_aux com as dimensões só com as categorias presentes
+    """
+    
+    for col in by:
+        if isinstance( df_aux[col].dtype, pd.CategoricalDtype ):
+            df_aux[col] = df_aux[col].cat.remove_unused_categories()
+    
+    return df_aux
+
+@profiled()
+def multi_rollup( df_cube, groupings, values ):
+    """
+    Esta função tem a responsabilidade de calcular, em uma única passada no cubo, as estatísticas
+    de todos os agrupamentos de uma página.
+    Critérios:
+    1. Uma passada no cubo pelo agrupamento mais fino (união das dimensões de todos os agrupamentos)
+    2. Cada agrupamento é combinado a partir desse resultado intermediário (pequeno)
+    O desvio padrão é o amostral (ddof=1), igual ao .agg('std') do pandas.
+    Input: - df_cube: cubo (normalmente já filtrado)
+           - groupings: dict nome -> lista de dimensões
+           - values: colunas de CUBE_VALUES
+    Output: dict nome -> df com as dimensões (só com as categorias presentes) + orders + <coluna>_n,
+            <coluna>_sum, <coluna>_mean e <coluna>_std
+    """
+    
+    dims = []
+    for by in groupings.values():
+        dims += [col for col in by if col not in dims]
+    df_fino = combine_moments( df_cube, dims, values )
+    
+    resultados = {}
+    for nome, by in groupings.items():
+        df_aux = combine_moments( df_fino, by, values )
+        for value in values:
+            n = df_aux[value + '_n']
+            df_aux[value + '_mean'] = df_aux[value + '_mean'].where( n > 0 )
+            df_aux[value + '_sum'] = df_aux[value + '_mean'] * n
+            df_aux[value + '_std'] = np.sqrt( ( df_aux.pop( value + '_m2' ) / ( n - 1 ) ).where( n > 1 ) )
+        resultados[nome] = drop_unused_categories( df_aux, by )
+    
+    return resultados
+
+def rollup( df_cube, by, value=None ):
+    """
+    Esta função tem a responsabilidade de consolidar as células do cubo por um agrupamento.
+    Input: - df_cube: cubo (normalmente já filtrado)
+           - by: lista de dimensões de agrupamento (subconjunto de CUBE_DIMS)
+           - value: coluna de CUBE_VALUES para sum/mean/std (None = só a contagem)
+    Output: df com by + orders (+ sum, mean, std)
+    """
+    
+    if value is None:
+        return drop_unused_categories( df_cube.groupby( by, observed=True )['orders'].sum().reset_index(), by )
+    
+    df_aux = multi_rollup( df_cube, {'rollup': by}, [value] )['rollup']
+    
+    return df_aux.loc[:, by + ['orders', value + '_sum', value + '_mean', value + '_std']].rename( 
+        columns={value + '_sum': 'sum', value + '_mean': 'mean', value + '_std': 'std'} )
+
+def fallback( df1, query ):
+    """
+    Esta função tem a responsabilidade de registrar uma consulta que não cabe no cubo.
+    A consulta segue nas linhas brutas (ex.: nunique, mediana, ranking por entregador).
+    Input: - df1: linhas brutas já filtradas
+           - query: nome da consulta
+    Output: df1 (sem alteração)
+    """
+    
+    FALLBACKS[query] += 1
+    
+    return df1
+
+def fallback_report():
+    """
+    Esta função tem a responsabilidade de listar as consultas que caíram nas linhas brutas.
+    Output: df com query e quantidade de execuções
+    """
+    
+    return pd.DataFrame( FALLBACKS.most_common(), columns=['query', 'runs'] )
+
+def merge_cubes( df_cube, df_cube_new ):
+    """
+    Esta função tem a responsabilidade de juntar dois cubos (ex.: cubo atual + cubo de um lote novo).
+    Os momentos das células iguais são combinados (combine_moments).
+    Input: - df_cube: cubo atual
+           - df_cube_new: cubo com as linhas novas
+    Output: df com o cubo consolidado
+    """
+    
+    return combine_moments( pd.concat( [df_cube, df_cube_new], ignore_index=True ), CUBE_DIMS )
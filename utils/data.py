@@ -0,0 +1,278 @@
+# =========================================
+# Imports
+# =========================================
+import os
+
+import pandas as pd
+import streamlit as st
+
+from utils.geo import delivery_distance
+
+DATASET_PATH = 'dataset/train.csv'
+
+# =========================================
+# Esquema do train.csv
+# =========================================
+
+# Sentinela usada no arquivo para valores ausentes (com espaço ao final)
+NA_SENTINEL = 'NaN '
+
+# Colunas lidas e seus tipos na leitura. Colunas com sentinela são lidas como float
+# (NaN) e convertidas para int depois da remoção das linhas incompletas.
+SCHEMA = {
+    'ID': 'object',
+    'Delivery_person_ID': 'object',
+    'Delivery_person_Age': 'float64',
+    'Delivery_person_Ratings': 'float64',
+    'Restaurant_latitude': 'float64',
+    'Restaurant_longitude': 'float64',
+    'Delivery_location_latitude': 'float64',
+    'Delivery_location_longitude': 'float64',
+    'Order_Date': 'datetime64[ns]',
+    'Weatherconditions': 'object',
+    'Road_traffic_density': 'object',
+    'Vehicle_condition': 'int64',
+    'Type_of_order': 'object',
+    'Type_of_vehicle': 'object',
+    'multiple_deliveries': 'float64',
+    'Festival': 'object',
+    'City': 'object',
+    'Time_taken(min)': 'object',
+}
+
+# Colunas em que a sentinela elimina a linha (mesmas regras do clean_code)
+NA_COLUMNS = ['multiple_deliveries', 'Delivery_person_Age', 'City', 'Road_traffic_density', 'Festival']
+
+# Colunas que só aceitam a sentinela mas mantêm a linha
+NA_KEEP_COLUMNS = ['Delivery_person_Ratings']
+
+# Conversões feitas depois da remoção das linhas NaN
+INT_COLUMNS = ['Delivery_person_Age', 'multiple_deliveries']
+
+STRIP_COLUMNS = ['Road_traffic_density', 'Festival', 'City']
+
+DATE_COLUMN = 'Order_Date'
+DATE_FORMAT = '%d-%m-%Y'
+
+# Prefixo fixo da coluna de tempo: '(min) 24'
+TIME_COLUMN = 'Time_taken(min)'
+TIME_PREFIX = '(min) '
+
+# =========================================
+# Representação compacta em memória
+# =========================================
+
+# Textos com poucos valores distintos: categorias (códigos inteiros + dicionário)
+CATEGORY_COLUMNS = ['Delivery_person_ID', 'Weatherconditions', 'Road_traffic_density',
+                    'Type_of_order', 'Festival', 'City']
+
+# Números com faixa pequena: tipos menores
+DOWNCAST_COLUMNS = {
+    'Delivery_person_Age': 'int8',
+    'Vehicle_condition': 'int8',
+    'Time_taken(min)': 'int16',
+    'Delivery_person_Ratings': 'float32',
+    'Restaurant_latitude': 'float32',
+    'Restaurant_longitude': 'float32',
+    'Delivery_location_latitude': 'float32',
+    'Delivery_location_longitude': 'float32',
+}
+
+# Colunas que nenhuma página usa depois da limpeza
+UNUSED_COLUMNS = ['ID', 'Type_of_vehicle', 'multiple_deliveries']
+
+# =========================================
+# Funções
+# =========================================
+
+def clean_code( df1 ):
+    """
+    Esta função tem a responsabilidade de limpar o dataframe lido sem tipos (pd.read_csv puro).
+    Mantida como referência para os benchmarks; a leitura das páginas usa o read_dataset.
+    Tipos de limpeza:
+    1. Remoção dos dados NaN
+    2. Limpeza da coluna de tempo (Time_taken(min)) - retirada do (min)
+    3. Conversão de tipos das colunas de dados
+    4. Conversão da coluna de datas
+    5. Remoção de espaço das variáveis de texto 
+    Input: df1
+    Output: df1 limpo
+    """
+    
+    # 1. Retirando as linhas NaN
+    linhas_sem_nan = df1.loc[:, 'multiple_deliveries'] != 'NaN '
+    df1 = df1.loc[linhas_sem_nan, :].copy()
+    
+    linhas_sem_nan = df1.loc[:, 'Delivery_person_Age'] != 'NaN '
+    df1 = df1.loc[linhas_sem_nan, :].copy()
+    
+    linhas_sem_nan = df1.loc[:, 'City'] != 'NaN '
+    df1 = df1.loc[linhas_sem_nan, :]
+    
+    linhas_sem_nan = df1.loc[:, 'Road_traffic_density'] != 'NaN '
+    df1 = df1.loc[linhas_sem_nan, :]
+    
+    linhas_sem_nan = df1.loc[:, 'Festival'] != 'NaN '
+    df1 = df1.loc[linhas_sem_nan, :]
+    
+    # 2. Limpeza coluna Time_taken(min)
+    df1['Time_taken(min)'] = df1['Time_taken(min)'].apply(lambda x: x.split ('(min) ')[1])
+    
+    # 3. Converter type
+    df1['Time_taken(min)'] = df1['Time_taken(min)'].astype(int)
+    df1['Delivery_person_Age'] = df1['Delivery_person_Age'].astype(int)
+    df1['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype(float)
+    
+    # 4. Converter data
+    df1['Order_Date'] = pd.to_datetime(df1['Order_Date'], format='%d-%m-%Y')
+    
+    # 5. Retirando espaços
+    df1.loc[:, 'Road_traffic_density'] = df1.loc[:, 'Road_traffic_density'].str.strip()
+    df1.loc[:, 'Festival'] = df1.loc[:, 'Festival'].str.strip()
+    df1.loc[:, 'City'] = df1.loc[:, 'City'].str.strip()
+
+    return df1
+
+def read_options():
+    """
+    Esta função tem a responsabilidade de montar os parâmetros do pd.read_csv a partir do esquema.
+    Output: dict com usecols, dtype, na_values, parse_dates e date_format
+    """
+    
+    dtypes = {col: tipo for col, tipo in SCHEMA.items() if col != DATE_COLUMN}
+    na_values = {col: [NA_SENTINEL] for col in NA_COLUMNS + NA_KEEP_COLUMNS}
+    
+    return dict( usecols=list( SCHEMA ),
+                 dtype=dtypes,
+                 na_values=na_values,
+                 keep_default_na=False,
+                 parse_dates=[DATE_COLUMN],
+                 date_format=DATE_FORMAT )
+
+def clean_typed( df1 ):
+    """
+    Esta função tem a responsabilidade de terminar a limpeza de um dataframe lido com read_options().
+    Tipos de limpeza:
+    1. Remoção das linhas NaN (a sentinela já virou NaN na leitura)
+    2. Conversão vetorizada da coluna Time_taken(min) - retirada do prefixo (min)
+    3. Conversão para int das colunas que tinham sentinela
+    4. Remoção de espaço das variáveis de texto
+    Input: df1 lido com o esquema (arquivo inteiro ou um bloco)
+    Output: df1 limpo, com índice de 0 a n-1
+    """
+    
+    # 1. Retirando as linhas NaN (uma única máscara, uma única cópia)
+    df1 = df1.dropna( subset=NA_COLUMNS ).reset_index( drop=True )
+    
+    # 2. Limpeza coluna Time_taken(min)
+    df1[TIME_COLUMN] = df1[TIME_COLUMN].str.slice( len( TIME_PREFIX ) ).astype( 'int64' )
+    
+    # 3. Converter type
+    df1[INT_COLUMNS] = df1[INT_COLUMNS].astype( 'int64' )
+    
+    # 4. Retirando espaços
+    for col in STRIP_COLUMNS:
+        df1[col] = df1[col].str.strip()
+
+    return df1
+
+def add_derived_columns( df1 ):
+    """
+    Esta função tem a responsabilidade de calcular, uma única vez na carga, as colunas derivadas.
+    1. Distance: distância (km) entre restaurante e local de entrega
+    Input: df1 limpo
+    Output: df1 com as colunas derivadas
+    """
+    
+    df1['Distance'] = delivery_distance( df1 )
+    
+    return df1
+
+def read_dataset( path, **kwargs ):
+    """
+    Esta função tem a responsabilidade de ler o csv já tipado a partir do esquema e limpá-lo.
+    Substitui o pd.read_csv + clean_code: a sentinela, os tipos numéricos e a data são
+    tratados durante a leitura, sem as cópias intermediárias do clean_code.
+    Input: - path: caminho (ou buffer) do csv
+           - kwargs: parâmetros extras do pd.read_csv (ex.: nrows, skiprows)
+    Output: df1 limpo, com as colunas derivadas
+    """
+    
+    df = pd.read_csv( path, **read_options(), **kwargs )
+    
+    return add_derived_columns( clean_typed( df ) )
+
+@st.cache_resource( max_entries=2, show_spinner='Carregando dados...' )
+def _load_clean_dataset( path, mtime ):
+    """
+    Esta função tem a responsabilidade de ler e limpar o dataset uma única vez por processo.
+    O mtime faz parte da chave do cache: quando o arquivo é substituído, o dataset é relido.
+    Input: - path: caminho absoluto do csv
+           - mtime: data de modificação do arquivo (chave do cache)
+    Output: df1 limpo, compartilhado entre páginas e sessões
+    """
+    
+    return read_dataset( path )
+
+def load_dataset( path=DATASET_PATH ):
+    """
+    Esta função tem a responsabilidade de retornar o dataset limpo a partir do cache do processo.
+    O dataframe retornado é compartilhado entre todas as sessões e deve ser tratado como somente leitura:
+    os filtros das páginas (df1.loc[mascara, :]) geram cópias antes de qualquer alteração.
+    Input: path: caminho do csv
+    Output: df1 limpo
+    """
+    
+    path = os.path.abspath( path )
+    mtime = os.stat( path ).st_mtime_ns
+    
+    return _load_clean_dataset( path, mtime )
+
+def compact_dataset( df1 ):
+    """
+    Esta função tem a responsabilidade de reduzir a memória do dataset limpo.
+    1. Remoção das colunas que nenhuma página usa
+    2. Textos de baixa cardinalidade como categorias
+    3. Números convertidos para tipos menores
+    As colunas derivadas (Distance) são calculadas antes, em float64, e continuam em float64: em float32 a
+    distância guardada passaria da HAVERSINE_TOLERANCE_KM (utils.geo).
+    Input: df1 limpo
+    Output: df1 compacto
+    """
+    
+    df1 = df1.drop( columns=UNUSED_COLUMNS, errors='ignore' )
+    tipos = {col: 'category' for col in CATEGORY_COLUMNS}
+    tipos.update( DOWNCAST_COLUMNS )
+    
+    return df1.astype( {col: tipo for col, tipo in tipos.items() if col in df1.columns} )
+
+def concat_compact( df_a, df_b ):
+    """
+    Esta função tem a responsabilidade de juntar dois datasets compactos sem perder as categorias.
+    As categorias das duas partes são unidas antes do concat (senão viram texto de novo).
+    Input: df_a, df_b compactos
+    Output: df compacto com as linhas dos dois
+    """
+    
+    df_a, df_b = df_a.copy( deep=False ), df_b.copy( deep=False )
+    for col in CATEGORY_COLUMNS:
+        categorias = df_a[col].cat.categories.union( df_b[col].cat.categories )
+        df_a[col] = df_a[col].cat.set_categories( categorias )
+        df_b[col] = df_b[col].cat.set_categories( categorias )
+    
+    return pd.concat( [df_a, df_b], ignore_index=True )
+
+def memory_report( df1 ):
+    """
+    Esta função tem a responsabilidade de mostrar a memória usada por coluna.
+    Input: df1
+    Output: df com coluna, tipo, MB e % do total
+    """
+    
+    memoria = df1.memory_usage( index=False, deep=True )
+    df_aux = pd.DataFrame( {'column': memoria.index,
+                            'dtype': df1.dtypes.astype( str ).to_numpy(),
+                            'MB': memoria.to_numpy() / 1024 ** 2} )
+    df_aux['perc'] = df_aux['MB'] / df_aux['MB'].sum()
+    
+    return df_aux.sort_values( 'MB', ascending=False, ignore_index=True )
@@ -0,0 +1,136 @@
+# =========================================
+# Imports
+# =========================================
+import os
+
+import numpy as np
+import pandas as pd
+
+# Pontos máximos por série enviada ao navegador
+POINT_BUDGET = int( os.environ.get( 'CURRY_POINT_BUDGET', '500' ) )
+
+# Semanas dos gráficos semanais: de domingo a sábado, como o '%U' usado antes
+WEEK_RULE = 'W-SAT'
+
+# Resoluções do eixo de datas, da mais fina para a mais grossa (regras do pandas.resample)
+RESOLUTIONS = {'dia': 'D', 'semana': WEEK_RULE, 'mês': 'MS'}
+
+# =========================================
+# Funções
+# =========================================
+
+def choose_resolution( date_start, date_end, budget=POINT_BUDGET ):
+    """
+    Esta função tem a responsabilidade de escolher a resolução do eixo de datas para o período.
+    Critérios:
+    1. A resolução mais fina cuja quantidade de períodos cabe no orçamento de pontos
+    2. Acima de todas, fica a mais grossa (mês)
+    Input: - date_start, date_end: primeira e última data do período
+           - budget: pontos máximos
+    Output: nome da resolução (chave de RESOLUTIONS)
+    """
+
+    for nome, regra in RESOLUTIONS.items():
+        periodos = len( pd.date_range( pd.Timestamp( date_start ).normalize(), date_end, freq=regra ) ) + 1
+        if periodos <= budget:
+            return nome
+
+    return nome
+
+def week_start( dates ):
+    """
+    Esta função tem a responsabilidade de dar a semana de cada data, pelo domingo em que ela começa.
+    Ao contrário do número da semana ('%U'), semanas de anos diferentes não se misturam: um histórico de
+    vários anos vira uma série com uma semana por ponto, que o downsample_line reduz ao orçamento.
+    Input: dates: Series de datas
+    Output: Series de datas (domingo da semana)
+    """
+
+    return dates.dt.to_period( WEEK_RULE ).dt.start_time
+
+def resample_counts( df_aux, date_col, value_col, budget=POINT_BUDGET, full_resolution=False ):
+    """
+    Esta função tem a responsabilidade de somar uma contagem diária na resolução que cabe no orçamento.
+    Na resolução semanal, as semanas são as mesmas do week_start (domingo a sábado, rótulo no domingo).
+    Input: - df_aux: df com uma linha por data
+           - date_col, value_col: colunas da data e da contagem
+           - budget: pontos máximos
+           - full_resolution: True mantém uma linha por data
+    Output: (df com date_col e value_col, nome da resolução)
+    """
+
+    if full_resolution or len( df_aux ) <= budget:
+        return df_aux, 'dia'
+
+    nome = choose_resolution( df_aux[date_col].min(), df_aux[date_col].max(), budget )
+    if nome == 'dia':
+        return df_aux, nome
+
+    df_aux = ( df_aux.resample( RESOLUTIONS[nome], on=date_col )[value_col]
+                     .sum()
+                     .reset_index() )
+    if nome == 'semana':
+        # O resample rotula a semana pelo sábado em que termina
+        df_aux[date_col] = week_start( df_aux[date_col] )
+
+    return df_aux, nome
+
+def lttb( x, y, threshold ):
+    """
+    Esta função tem a responsabilidade de escolher os pontos de uma série que preservam a sua forma
+    (Largest-Triangle-Three-Buckets).
+    Critérios:
+    1. O primeiro e o último ponto sempre ficam
+    2. Os pontos do meio são divididos em threshold - 2 faixas; de cada faixa fica o ponto que forma
+       o maior triângulo com o ponto escolhido na faixa anterior e a média da faixa seguinte
+    Input: - x, y: valores numéricos da série, com x crescente
+           - threshold: pontos desejados
+    Output: array com as posições dos pontos escolhidos
+    """
+
+    x = np.asarray( x, dtype='float64' )
+    y = np.asarray( y, dtype='float64' )
+    n = len( x )
+    if threshold >= n or threshold < 3:
+        return np.arange( n )
+
+    limites = np.linspace( 1, n - 1, threshold - 1 ).astype( int )
+    escolhidos = np.empty( threshold, dtype=int )
+    escolhidos[0] = 0
+    escolhidos[-1] = n - 1
+
+    a = 0
+    for i in range( threshold - 2 ):
+        inicio, fim = limites[i], limites[i + 1]
+        proximo_fim = limites[i + 2] if i + 2 < len( limites ) else n
+        media_x = x[fim:proximo_fim].mean()
+        media_y = y[fim:proximo_fim].mean()
+
+        areas = np.abs( ( x[a] - media_x ) * ( y[inicio:fim] - y[a] )
+                        - ( x[a] - x[inicio:fim] ) * ( media_y - y[a] ) )
+        a = inicio + int( np.argmax( areas ) )
+        escolhidos[i + 1] = a
+
+    return escolhidos
+
+def downsample_line( df_aux, x_col, y_col, budget=POINT_BUDGET, full_resolution=False ):
+    """
+    Esta função tem a responsabilidade de reduzir os pontos de um gráfico de linha ao orçamento, com o LTTB.
+    O eixo x pode ser numérico, data ou texto ordenado (ex.: semana do ano): nesse caso vale a posição.
+    Input: - df_aux: df ordenado pelo eixo x
+           - x_col, y_col: colunas dos eixos
+           - budget: pontos máximos
+           - full_resolution: True devolve todos os pontos
+    Output: df com as linhas escolhidas
+    """
+
+    if full_resolution or len( df_aux ) <= budget:
+        return df_aux
+
+    x = df_aux[x_col]
+    if pd.api.types.is_datetime64_any_dtype( x ):
+        x = x.astype( 'int64' )
+    elif not pd.api.types.is_numeric_dtype( x ):
+        x = np.arange( len( x ) )
+
+    return df_aux.iloc[lttb( x, df_aux[y_col], budget )].reset_index( drop=True )
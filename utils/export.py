@@ -0,0 +1,290 @@
+# =========================================
+# Imports
+# =========================================
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from utils.data import DATASET_PATH
+from utils.sql import load_backend
+from utils.store import BATCH_DIR, load_store
+from utils.warmup import VIEWS, read_selections, view_weather
+
+logger = logging.getLogger( __name__ )
+
+EXPORT_DIR = 'reports'
+FORMATS = ['json', 'parquet']
+
+# Processos da exportação (None = todos os núcleos)
+EXPORT_WORKERS = int( os.environ.get( 'CURRY_EXPORT_WORKERS', '0' ) ) or None
+
+# Atributos dos traços dos gráficos que viram colunas da tabela exportada
+TRACE_ATTRIBUTES = ['ids', 'parents', 'labels', 'values', 'x', 'y']
+
+# Nomes das tabelas de resultados em tupla
+TUPLE_NAMES = {'faster_deliver': ( 'fastest', 'slowest' )}
+
+# Store ou banco de cada processo do pool (carregado uma vez, em _init_worker)
+_source = None
+
+# =========================================
+# Funções
+# =========================================
+
+def figure_table( fig ):
+    """
+    Esta função tem a responsabilidade de extrair os dados de um gráfico do plotly em uma tabela.
+    Critérios:
+    1. Cada atributo de dados dos traços (x, y, labels, values, ...) vira uma coluna
+    2. x e y levam o título do eixo do gráfico, quando existe (o nome da coluna no df da página)
+    3. A barra de erro vira a coluna error_y
+    4. Com mais de um traço, a coluna com o título da legenda (ou trace) identifica o traço da linha,
+       quando os dados ainda não têm essa coluna
+    Input: fig: figura do plotly
+    Output: df
+    """
+
+    nomes = {'x': fig.layout.xaxis.title.text or 'x', 'y': fig.layout.yaxis.title.text or 'y'}
+    partes = []
+    for traco in fig.data:
+        colunas = {}
+        for atributo in TRACE_ATTRIBUTES:
+            valores = getattr( traco, atributo, None )
+            if valores is not None:
+                colunas[nomes.get( atributo, atributo )] = list( valores )
+        erro = getattr( traco, 'error_y', None )
+        if erro is not None and erro.array is not None:
+            colunas['error_y'] = list( erro.array )
+        df_aux = pd.DataFrame( colunas )
+        legenda = fig.layout.legend.title.text or 'trace'
+        if len( fig.data ) > 1 and legenda not in df_aux.columns:
+            df_aux.insert( 0, legenda, traco.name )
+        partes.append( df_aux )
+
+    return pd.concat( partes, ignore_index=True ) if partes else pd.DataFrame()
+
+def kpi_value( valor ):
+    """
+    Valor de uma métrica em tipo do Python: escalares do numpy viram int/float e uma Series
+    de um valor vira o seu valor (vazia = None).
+    """
+
+    if isinstance( valor, pd.Series ):
+        valor = valor.iloc[0] if len( valor ) == 1 else None
+    if isinstance( valor, np.generic ):
+        valor = valor.item()
+    if isinstance( valor, float ) and np.isnan( valor ):
+        valor = None
+
+    return valor
+
+def flatten_results( results ):
+    """
+    Esta função tem a responsabilidade de separar os resultados de uma página em métricas e tabelas.
+    Critérios:
+    1. Escalares e dicts de escalares viram métricas (nome.chave)
+    2. dfs, dicts de dfs e tuplas de dfs viram tabelas
+    3. Gráficos viram a tabela dos seus dados (figure_table)
+    4. HTML (mapas do folium) fica de fora: não é um dado
+    Input: results: dict devolvido pelo page_results da página ou da seção
+    Output: (dict nome -> valor, dict nome -> df)
+    """
+
+    kpis = {}
+    tabelas = {}
+    for nome, valor in results.items():
+        if isinstance( valor, str ):
+            continue
+        if isinstance( valor, pd.DataFrame ):
+            tabelas[nome] = valor
+        elif hasattr( valor, 'data' ) and hasattr( valor, 'layout' ):
+            tabelas[nome] = figure_table( valor )
+        elif isinstance( valor, tuple ):
+            sufixos = TUPLE_NAMES.get( nome, range( len( valor ) ) )
+            for sufixo, df_aux in zip( sufixos, valor ):
+                tabelas['{}.{}'.format( nome, sufixo )] = df_aux
+        elif isinstance( valor, dict ):
+            for chave, item in valor.items():
+                if isinstance( item, pd.DataFrame ):
+                    tabelas['{}.{}'.format( nome, chave )] = item
+                else:
+                    kpis['{}.{}'.format( nome, chave )] = kpi_value( item )
+        else:
+            kpis[nome] = kpi_value( valor )
+
+    return kpis, tabelas
+
+def _init_worker( path, batch_dir ):
+    """Carrega o banco (quando ligado) ou o store uma vez no processo do pool."""
+
+    global _source
+
+    _source = load_backend( path, batch_dir=batch_dir ) or load_store( path, batch_dir, spinner=False )
+
+def _export_view( numero, view, selection ):
+    """
+    Esta função tem a responsabilidade de calcular uma página para uma seleção (em um processo do pool).
+    Input: - numero: posição da seleção
+           - view: nome da página ou da seção (VIEWS)
+           - selection: dict com date, traffic e weather
+    Output: (numero, view, métricas, tabelas)
+    """
+
+    resultados = VIEWS[view]( _source, selection['date'], list( selection['traffic'] ),
+                              view_weather( view, list( selection['weather'] ) ) )
+    kpis, tabelas = flatten_results( resultados )
+
+    return numero, view, kpis, tabelas
+
+def run_export( path=DATASET_PATH, batch_dir=BATCH_DIR, selections=None, views=None, workers=EXPORT_WORKERS ):
+    """
+    Esta função tem a responsabilidade de calcular as páginas para uma lista de seleções.
+    Critérios:
+    1. Cada par seleção x página é calculado em um processo do pool ('spawn', como a leitura paralela)
+    2. Cada processo carrega o dataset uma vez e o usa em todas as seleções que recebe
+    3. Com um processo (workers=1), o cálculo é feito no próprio processo
+    4. Um par com erro não interrompe os outros: o erro volta na lista de erros
+    Input: - path, batch_dir: csv base e pasta de lotes
+           - selections: lista de dicts com date, traffic e weather (None = seleção padrão)
+           - views: páginas e seções (None = todas as VIEWS)
+           - workers: processos (None = todos os núcleos)
+    Output: (lista de dicts com selection, view, kpis e tables, lista de erros)
+    """
+
+    selections = read_selections( None ) if selections is None else selections
+    views = list( VIEWS ) if views is None else views
+    tarefas = [( numero, view, selection ) for numero, selection in enumerate( selections ) for view in views]
+
+    workers = min( workers or os.cpu_count() or 1, os.cpu_count() or 1, len( tarefas ) )
+    resultados = []
+    erros = []
+    if workers <= 1:
+        _init_worker( path, batch_dir )
+        for tarefa in tarefas:
+            try:
+                resultados.append( _export_view( *tarefa ) )
+            except Exception as erro:
+                logger.exception( 'Exportação de %s falhou', tarefa[1] )
+                erros.append( '{} {}: {!r}'.format( tarefa[1], tarefa[2]['date'], erro ) )
+    else:
+        contexto = multiprocessing.get_context( 'spawn' )
+        with ProcessPoolExecutor( max_workers=workers, mp_context=contexto, initializer=_init_worker,
+                                  initargs=( path, batch_dir ) ) as pool:
+            futuros = {pool.submit( _export_view, *tarefa ): tarefa for tarefa in tarefas}
+            for futuro in as_completed( futuros ):
+                numero, view, selection = futuros[futuro]
+                try:
+                    resultados.append( futuro.result() )
+                except Exception as erro:
+                    logger.error( 'Exportação de %s %s falhou: %r', view, selection['date'], erro )
+                    erros.append( '{} {}: {!r}'.format( view, selection['date'], erro ) )
+                else:
+                    logger.info( 'Exportado %d/%d: %s %s', len( resultados ), len( tarefas ), view, selection['date'] )
+
+    # Ordem das seleções e das páginas, independente da ordem em que os processos terminaram
+    ordem = {view: posicao for posicao, view in enumerate( views )}
+    resultados.sort( key=lambda item: ( item[0], ordem[item[1]] ) )
+
+    return [{'selection': numero, 'view': view, 'kpis': kpis, 'tables': tabelas}
+            for numero, view, kpis, tabelas in resultados], erros
+
+def selection_record( numero, selection ):
+    """Seleção em tipos do JSON: data em texto ISO e listas de opções."""
+
+    return {'selection': numero, 'date': pd.Timestamp( selection['date'] ).isoformat(),
+            'traffic': list( selection['traffic'] ), 'weather': list( selection['weather'] )}
+
+def write_json( reports, selections, out ):
+    """
+    Esta função tem a responsabilidade de gravar a exportação em um arquivo JSON.
+    Input: - reports: resultados do run_export
+           - selections: seleções da exportação
+           - out: pasta de destino
+    Output: lista de arquivos gravados
+    """
+
+    conteudo = {'selections': [selection_record( numero, selection ) for numero, selection in enumerate( selections )],
+                'reports': [{'selection': item['selection'], 'view': item['view'], 'kpis': item['kpis'],
+                             'tables': {nome: json.loads( df_aux.to_json( orient='records', date_format='iso' ) )
+                                        for nome, df_aux in item['tables'].items()}}
+                            for item in reports]}
+
+    path = os.path.join( out, 'kpis.json' )
+    with open( path, 'w', encoding='utf-8' ) as arquivo:
+        json.dump( conteudo, arquivo, indent=2, ensure_ascii=False )
+
+    return [path]
+
+def write_parquet( reports, selections, out ):
+    """
+    Esta função tem a responsabilidade de gravar a exportação em arquivos Parquet.
+    Critérios:
+    1. kpis.parquet: uma linha por seleção, página e métrica (valor em texto JSON, os tipos variam)
+    2. selections.parquet: as seleções, com a data e as opções
+    3. Uma tabela por página e nome (view.nome.parquet), com as linhas de todas as seleções e a coluna selection
+    Input: - reports: resultados do run_export
+           - selections: seleções da exportação
+           - out: pasta de destino
+    Output: lista de arquivos gravados
+    """
+
+    arquivos = []
+
+    df_aux = pd.DataFrame( [selection_record( numero, selection ) for numero, selection in enumerate( selections )] )
+    arquivos.append( os.path.join( out, 'selections.parquet' ) )
+    df_aux.to_parquet( arquivos[-1], index=False )
+
+    df_aux = pd.DataFrame( [{'selection': item['selection'], 'view': item['view'], 'kpi': nome,
+                             'value': json.dumps( valor )}
+                            for item in reports for nome, valor in item['kpis'].items()],
+                           columns=['selection', 'view', 'kpi', 'value'] )
+    arquivos.append( os.path.join( out, 'kpis.parquet' ) )
+    df_aux.to_parquet( arquivos[-1], index=False )
+
+    partes = {}
+    for item in reports:
+        for nome, df_tabela in item['tables'].items():
+            df_tabela = df_tabela.reset_index( drop=True )
+            df_tabela.insert( 0, 'selection', item['selection'] )
+            partes.setdefault( '{}.{}'.format( item['view'], nome ), [] ).append( df_tabela )
+
+    for nome, lista in partes.items():
+        arquivos.append( os.path.join( out, nome + '.parquet' ) )
+        pd.concat( lista, ignore_index=True ).to_parquet( arquivos[-1], index=False )
+
+    return arquivos
+
+WRITERS = {'json': write_json, 'parquet': write_parquet}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Exporta as métricas e tabelas das páginas para uma lista de seleções, sem o Streamlit.' )
+    parser.add_argument( 'path', nargs='?', default=DATASET_PATH )
+    parser.add_argument( '--selections', default=None,
+                         help='JSON com as seleções (mesmo formato do CURRY_WARMUP_FILE); sem ele, a seleção padrão' )
+    parser.add_argument( '--views', nargs='+', default=list( VIEWS ), choices=list( VIEWS ) )
+    parser.add_argument( '--format', nargs='+', default=FORMATS, choices=FORMATS )
+    parser.add_argument( '--out', default=EXPORT_DIR )
+    parser.add_argument( '--workers', type=int, default=EXPORT_WORKERS )
+    args = parser.parse_args()
+
+    logging.basicConfig( level=logging.INFO, format='%(asctime)s %(message)s', stream=sys.stderr )
+    inicio = time.perf_counter()
+    selections = read_selections( args.selections, include_default=args.selections is None )
+    reports, erros = run_export( args.path, selections=selections, views=args.views, workers=args.workers )
+
+    os.makedirs( args.out, exist_ok=True )
+    arquivos = [arquivo for formato in args.format for arquivo in WRITERS[formato]( reports, selections, args.out )]
+
+    print( json.dumps( {'selections': len( selections ), 'views': len( args.views ), 'reports': len( reports ),
+                        'files': arquivos, 'errors': erros, 'seconds': round( time.perf_counter() - inicio, 2 )},
+                       indent=2, ensure_ascii=False ) )
+    if erros:
+        sys.exit( 1 )
@@ -0,0 +1,76 @@
+# =========================================
+# Imports
+# =========================================
+import numpy as np
+import pandas as pd
+
+DATE_COLUMN = 'Order_Date'
+
+# Filtros de multiselect da barra lateral, guardados como categorias + bitmaps
+FILTER_COLUMNS = ['Road_traffic_density', 'Weatherconditions']
+
+# =========================================
+# Funções
+# =========================================
+
+def prepare_for_filters( df1 ):
+    """
+    Esta função tem a responsabilidade de preparar o dataset para o FilterIndex.
+    1. Ordena por Order_Date (o corte de data vira uma busca binária)
+    2. Converte as colunas de filtro em categorias
+    Input: df1 limpo
+    Output: df1 ordenado, com índice de 0 a n-1
+    """
+    
+    df1 = df1.sort_values( DATE_COLUMN, kind='stable', ignore_index=True )
+    for col in FILTER_COLUMNS:
+        df1[col] = df1[col].astype( 'category' )
+    
+    return df1
+
+class FilterIndex:
+    """
+    Índice dos filtros da barra lateral sobre um dataset ordenado por Order_Date.
+    - data limite: np.searchsorted no vetor de datas (o resultado é sempre um prefixo)
+    - trânsito e clima: um bitmap compactado (np.packbits) por categoria; as opções
+      selecionadas são combinadas com OR e os filtros entre si com AND, só no prefixo
+    O custo de select() acompanha o tamanho do prefixo selecionado, não o do dataset.
+    """
+    
+    def __init__( self, df1 ):
+        self.dates = df1[DATE_COLUMN].to_numpy()
+        self.bitmaps = {}
+        for col in FILTER_COLUMNS:
+            codes = df1[col].cat.codes.to_numpy()
+            self.bitmaps[col] = {categoria: np.packbits( codes == i )
+                                 for i, categoria in enumerate( df1[col].cat.categories )}
+    
+    def select( self, date_limit, traffic_options, weather_options=None ):
+        """
+        Esta função tem a responsabilidade de resolver os filtros em posições de linha.
+        Input: - date_limit: data limite (exclusiva, igual a Order_Date < date_limit)
+               - traffic_options: densidades de trânsito selecionadas
+               - weather_options: condições de clima selecionadas (None = sem filtro)
+        Output: slice (quando só a data restringe) ou array com as posições selecionadas
+        """
+        
+        fim = int( np.searchsorted( self.dates, pd.Timestamp( date_limit ).to_datetime64(), side='left' ) )
+        n_bytes = ( fim + 7 ) // 8
+        
+        mascara = None
+        for col, options in zip( FILTER_COLUMNS, [traffic_options, weather_options] ):
+            bitmaps = self.bitmaps[col]
+            # Sem filtro ou com todas as categorias marcadas: não restringe
+            if options is None or set( bitmaps ) <= set( options ):
+                continue
+            
+            bits = np.zeros( n_bytes, dtype='uint8' )
+            for opcao in options:
+                if opcao in bitmaps:
+                    bits |= bitmaps[opcao][:n_bytes]
+            mascara = bits if mascara is None else mascara & bits
+        
+        if mascara is None:
+            return slice( 0, fim )
+        
+        return np.flatnonzero( np.unpackbits( mascara, count=fim ) )
@@ -0,0 +1,80 @@
+# =========================================
+# Imports
+# =========================================
+import numpy as np
+import pandas as pd
+
+# Mesmo raio médio usado pelo pacote haversine (unidade: km)
+EARTH_RADIUS_KM = 6371.0088
+
+# Diferença máxima em relação ao haversine.haversine, em km
+HAVERSINE_TOLERANCE_KM = 1e-9
+
+# =========================================
+# Funções
+# =========================================
+
+def haversine_np( lat1, lon1, lat2, lon2 ):
+    """
+    Esta função tem a responsabilidade de calcular a distância do grande círculo entre vetores de pontos.
+    Usa a mesma fórmula e o mesmo raio do pacote haversine, de forma vetorizada (sem apply por linha).
+    A diferença para haversine.haversine fica abaixo de HAVERSINE_TOLERANCE_KM.
+    Input: - lat1, lon1: latitudes e longitudes de origem, em graus (arrays ou Series)
+           - lat2, lon2: latitudes e longitudes de destino, em graus
+    Output: array com as distâncias em km
+    """
+    
+    lat1, lon1, lat2, lon2 = ( np.radians( np.asarray( x, dtype='float64' ) ) for x in ( lat1, lon1, lat2, lon2 ) )
+    
+    d = ( np.sin( ( lat2 - lat1 ) * 0.5 ) ** 2
+          + np.cos( lat1 ) * np.cos( lat2 ) * np.sin( ( lon2 - lon1 ) * 0.5 ) ** 2 )
+    
+    return 2 * EARTH_RADIUS_KM * np.arcsin( np.sqrt( d ) )
+
+def delivery_distance( df1 ):
+    """
+    Esta função tem a responsabilidade de calcular a distância entre restaurante e local de entrega.
+    Input: df1 com as colunas de latitude e longitude
+    Output: array com a distância de cada pedido em km
+    """
+    
+    return haversine_np( df1['Restaurant_latitude'], df1['Restaurant_longitude'],
+                         df1['Delivery_location_latitude'], df1['Delivery_location_longitude'] )
+
+# =========================================
+# Grade de densidade
+# =========================================
+
+# Tamanho da célula (graus) em cada nível de zoom da grade
+GRID_LEVELS = {4: 1.0, 6: 0.25, 8: 0.0625, 10: 0.015625}
+
+# Teto de células enviadas ao mapa, independente da quantidade de pedidos
+MAX_CELLS = 2000
+
+def bin_locations( lat, lon, cell_size, max_cells=MAX_CELLS ):
+    """
+    Esta função tem a responsabilidade de agrupar pontos em uma grade quadrada (contagem por célula).
+    Critérios:
+    1. Cada ponto cai na célula floor((lat + 90) / cell_size), floor((lon + 180) / cell_size)
+    2. Só as max_cells células com mais pedidos são mantidas (payload do mapa constante)
+    Input: - lat, lon: arrays de latitude e longitude em graus
+           - cell_size: tamanho da célula em graus
+           - max_cells: quantidade máxima de células retornadas
+    Output: df com lat e lon do centro da célula e orders (quantidade de pontos)
+    """
+    
+    lat = np.asarray( lat, dtype='float64' )
+    lon = np.asarray( lon, dtype='float64' )
+    
+    n_colunas = int( np.ceil( 360 / cell_size ) ) + 1
+    linha = np.floor( ( lat + 90 ) / cell_size ).astype( 'int64' )
+    coluna = np.floor( ( lon + 180 ) / cell_size ).astype( 'int64' )
+    
+    celulas, contagem = np.unique( linha * n_colunas + coluna, return_counts=True )
+    if len( celulas ) > max_cells:
+        maiores = np.argpartition( contagem, -max_cells )[-max_cells:]
+        celulas, contagem = celulas[maiores], contagem[maiores]
+    
+    return pd.DataFrame( {'lat': ( celulas // n_colunas + 0.5 ) * cell_size - 90,
+                          'lon': ( celulas % n_colunas + 0.5 ) * cell_size - 180,
+                          'orders': contagem} )
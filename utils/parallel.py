@@ -0,0 +1,94 @@
+# =========================================
+# Imports
+# =========================================
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from utils.data import add_derived_columns, clean_typed, read_dataset, read_options
+
+# Processos da leitura paralela no app (1 = leitura serial, o padrão)
+INGEST_WORKERS = int( os.environ.get( 'CURRY_INGEST_WORKERS', '1' ) )
+
+# Abaixo desse tamanho o custo de iniciar os processos supera o ganho: leitura serial
+MIN_PARALLEL_BYTES = 32 * 1024 ** 2
+
+# =========================================
+# Funções
+# =========================================
+
+def byte_ranges( path, parts ):
+    """
+    Esta função tem a responsabilidade de dividir o csv em faixas de bytes que terminam em fim de linha.
+    Critérios:
+    1. O cabeçalho fica fora das faixas
+    2. Cada corte é levado até o próximo '\\n', então nenhuma linha é dividida
+       (o train.csv não tem campos entre aspas com quebra de linha)
+    Input: - path: csv
+           - parts: quantidade desejada de faixas
+    Output: (cabeçalho em bytes, lista de (início, fim))
+    """
+
+    tamanho = os.path.getsize( path )
+    with open( path, 'rb' ) as arquivo:
+        cabecalho = arquivo.readline()
+        inicio = arquivo.tell()
+        passo = max( ( tamanho - inicio ) // parts, 1 )
+
+        cortes = [inicio]
+        for n in range( 1, parts ):
+            arquivo.seek( max( inicio + n * passo, cortes[-1] ) )
+            arquivo.readline()
+            cortes.append( min( arquivo.tell(), tamanho ) )
+        cortes.append( tamanho )
+
+    faixas = [( a, b ) for a, b in zip( cortes[:-1], cortes[1:] ) if b > a]
+
+    return cabecalho, faixas
+
+def _read_range( path, cabecalho, inicio, fim ):
+    """
+    Esta função tem a responsabilidade de ler e limpar uma faixa de bytes do csv (em um processo do pool).
+    O cabeçalho é colocado de volta na frente da faixa, então a leitura usa o mesmo esquema do read_dataset.
+    Input: - path: csv
+           - cabecalho: primeira linha do arquivo (bytes)
+           - inicio, fim: faixa de bytes
+    Output: df1 limpo da faixa, com as colunas derivadas
+    """
+
+    with open( path, 'rb' ) as arquivo:
+        arquivo.seek( inicio )
+        dados = arquivo.read( fim - inicio )
+
+    df = pd.read_csv( io.BytesIO( cabecalho + dados ), **read_options() )
+
+    return add_derived_columns( clean_typed( df ) )
+
+def read_dataset_parallel( path, workers=None, min_bytes=MIN_PARALLEL_BYTES ):
+    """
+    Esta função tem a responsabilidade de ler e limpar o csv em vários processos.
+    Critérios:
+    1. O arquivo é dividido em faixas de linhas inteiras (byte_ranges), uma por processo
+    2. Cada processo lê e limpa a sua faixa com o mesmo esquema do read_dataset
+    3. As faixas são juntadas na ordem do arquivo: o resultado é igual ao do read_dataset
+    Os processos são criados com 'spawn', seguro dentro do servidor do Streamlit (que tem várias threads).
+    Input: - path: csv
+           - workers: quantidade de processos, limitada aos núcleos (None = todos; 1 = leitura serial)
+           - min_bytes: arquivos menores são lidos de forma serial
+    Output: df1 limpo, com índice de 0 a n-1 e as colunas derivadas
+    """
+
+    workers = min( workers or os.cpu_count() or 1, os.cpu_count() or 1 )
+    if workers <= 1 or os.path.getsize( path ) < min_bytes:
+        return read_dataset( path )
+
+    cabecalho, faixas = byte_ranges( path, workers )
+    contexto = multiprocessing.get_context( 'spawn' )
+    with ProcessPoolExecutor( max_workers=len( faixas ), mp_context=contexto ) as pool:
+        partes = list( pool.map( _read_range, [path] * len( faixas ), [cabecalho] * len( faixas ),
+                                 *zip( *faixas ) ) )
+
+    return pd.concat( partes, ignore_index=True )
@@ -0,0 +1,234 @@
+# =========================================
+# Imports
+# =========================================
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+# Memória do processo fora do Linux (opcional): sem o psutil, o RSS fica indisponível nesses sistemas
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Arquivo JSON lines onde cada rerun é registrado (desligado quando a variável não existe)
+PROFILE_LOG = os.environ.get( 'CURRY_PROFILE_LOG' )
+
+# Reruns guardados por sessão para o painel e para o download
+HISTORY_SIZE = 50
+
+# Perfil do rerun em andamento. Cada rerun do Streamlit roda em uma thread própria.
+_active = threading.local()
+_log_lock = threading.Lock()
+
+# =========================================
+# Funções
+# =========================================
+
+def current_rss_mb():
+    """
+    Esta função tem a responsabilidade de medir a memória residente atual do processo (MB).
+    Critérios:
+    1. No Linux, lê o /proc/self/statm (sem dependências)
+    2. Nos outros sistemas (Windows, macOS), usa o psutil quando instalado
+    3. Sem nenhum dos dois, devolve None: o perfil mostra só os tempos
+    Output: float ou None
+    """
+
+    try:
+        with open( '/proc/self/statm' ) as arquivo:
+            paginas = int( arquivo.read().split()[1] )
+        return paginas * os.sysconf( 'SC_PAGE_SIZE' ) / 1024 ** 2
+    except ( OSError, ValueError, AttributeError ):
+        pass
+
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 1024 ** 2
+
+    return None
+
+def _round_mb( valor ):
+    return None if valor is None else round( valor, 1 )
+
+class RerunProfile:
+    """
+    Tempos e memória de um rerun de uma página, por etapa.
+    Etapas com o mesmo nome (ex.: st.plotly_chart) são somadas e contadas.
+    A memória de cada etapa é a variação de RSS do processo (barata, mas inclui as outras sessões);
+    fica None quando o RSS não pode ser medido (current_rss_mb).
+    """
+
+    def __init__( self, page ):
+        self.page = page
+        self.started = time.perf_counter()
+        self.rss_start = current_rss_mb()
+        self.stages = {}
+        self.record = None
+
+    @contextmanager
+    def stage( self, name ):
+        """
+        Esta função tem a responsabilidade de medir uma etapa do rerun.
+        Input: name: nome da etapa
+        """
+
+        rss = current_rss_mb()
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            etapa = self.stages.setdefault( name, {'calls': 0, 'seconds': 0.0,
+                                                   'rss_delta_mb': None if rss is None else 0.0} )
+            etapa['calls'] += 1
+            etapa['seconds'] += time.perf_counter() - inicio
+            if rss is not None:
+                etapa['rss_delta_mb'] += current_rss_mb() - rss
+
+    def finish( self ):
+        """
+        Esta função tem a responsabilidade de fechar o rerun e montar o registro exportado.
+        Output: dict com página, horário, tempo total, RSS e etapas
+        """
+
+        if self.record is None:
+            rss = current_rss_mb()
+            self.record = {'timestamp': datetime.now().isoformat( timespec='seconds' ),
+                           'page': self.page,
+                           'total_s': round( time.perf_counter() - self.started, 6 ),
+                           'rss_mb': _round_mb( rss ),
+                           'rss_delta_mb': None if rss is None else _round_mb( rss - self.rss_start ),
+                           'stages': [{'stage': name, 'calls': etapa['calls'],
+                                       'seconds': round( etapa['seconds'], 6 ),
+                                       'rss_delta_mb': _round_mb( etapa['rss_delta_mb'] )}
+                                      for name, etapa in self.stages.items()]}
+            if getattr( _active, 'profile', None ) is self:
+                _active.profile = None
+
+        return self.record
+
+    def to_frame( self ):
+        """
+        Esta função tem a responsabilidade de mostrar as etapas do rerun em uma tabela.
+        Output: df com etapa, chamadas, ms, % do rerun e variação de RSS
+        """
+
+        record = self.finish()
+        df_aux = pd.DataFrame( record['stages'], columns=['stage', 'calls', 'seconds', 'rss_delta_mb'] )
+        df_aux['ms'] = ( df_aux['seconds'] * 1000 ).round( 1 )
+        df_aux['%'] = ( df_aux['seconds'] / record['total_s'] * 100 ).round( 1 )
+
+        return df_aux.loc[:, ['stage', 'calls', 'ms', '%', 'rss_delta_mb']]
+
+def start_profile( page ):
+    """
+    Esta função tem a responsabilidade de iniciar o perfil do rerun atual.
+    As funções com @profiled chamadas nesta thread passam a ser medidas.
+    Input: page: nome da página
+    Output: RerunProfile
+    """
+
+    _active.profile = RerunProfile( page )
+
+    return _active.profile
+
+def active_profile():
+    """Perfil do rerun em andamento nesta thread (None fora de um rerun medido)."""
+
+    return getattr( _active, 'profile', None )
+
+def profiled( name=None ):
+    """
+    Esta função tem a responsabilidade de medir cada chamada de uma função como uma etapa do rerun.
+    Sem perfil ativo (ex.: benchmarks e linha de comando), a função é chamada direto.
+    Input: name: nome da etapa (padrão: módulo.função)
+    Output: decorador
+    """
+
+    def decorator( func ):
+        etapa = name or '{}.{}'.format( func.__module__.split( '.' )[-1], func.__name__ )
+
+        @functools.wraps( func )
+        def wrapper( *args, **kwargs ):
+            profile = active_profile()
+            if profile is None:
+                return func( *args, **kwargs )
+            with profile.stage( etapa ):
+                return func( *args, **kwargs )
+
+        return wrapper
+
+    return decorator
+
+def write_jsonl( record, path=PROFILE_LOG ):
+    """
+    Esta função tem a responsabilidade de acrescentar um rerun ao arquivo JSON lines.
+    As sessões do processo escrevem no mesmo arquivo, uma linha por rerun.
+    Input: - record: registro do rerun (RerunProfile.finish)
+           - path: arquivo de saída (None = não grava)
+    """
+
+    if not path:
+        return
+
+    linha = json.dumps( record, ensure_ascii=False )
+    with _log_lock:
+        with open( path, 'a', encoding='utf-8' ) as arquivo:
+            arquivo.write( linha + '\n' )
+
+def render_panel( profile, store=None ):
+    """
+    Esta função tem a responsabilidade de fechar o perfil do rerun e mostrar o painel de desempenho.
+    Critérios:
+    1. O rerun é sempre gravado no PROFILE_LOG (quando configurado) e no histórico da sessão
+    2. O painel só aparece quando a caixa da barra lateral está marcada
+    Input: - profile: perfil do rerun (start_profile)
+           - store: DeliveryStore da página, para a memória por coluna (opcional)
+    """
+
+    import streamlit as st
+    from utils.cube import fallback_report
+    from utils.results import RESULTS
+
+    record = profile.finish()
+    write_jsonl( record )
+
+    historico = st.session_state.setdefault( 'perf_history', [] )
+    historico.append( record )
+    del historico[:-HISTORY_SIZE]
+
+    if not st.sidebar.checkbox( 'Painel de desempenho', key='perf_panel' ):
+        return
+
+    with st.sidebar.expander( 'Desempenho do rerun', expanded=True ):
+        if record['rss_mb'] is None:
+            st.markdown( '**{:.0f} ms** no total (RSS indisponível neste sistema)'.format( record['total_s'] * 1000 ) )
+        else:
+            st.markdown( '**{:.0f} ms** no total, RSS {:.0f} MB ({:+.1f} MB)'.format(
+                         record['total_s'] * 1000, record['rss_mb'], record['rss_delta_mb'] ) )
+        st.dataframe( profile.to_frame(), use_container_width=True, hide_index=True )
+
+        df_aux = pd.DataFrame( [r for r in historico if r['page'] == profile.page] )
+        st.markdown( 'Últimos {} reruns desta página: mediana {:.0f} ms, máximo {:.0f} ms'.format(
+                     len( df_aux ), df_aux['total_s'].median() * 1000, df_aux['total_s'].max() * 1000 ) )
+
+        df_fallbacks = fallback_report()
+        if len( df_fallbacks ) > 0:
+            st.markdown( 'Consultas fora do cubo (processo)' )
+            st.dataframe( df_fallbacks, use_container_width=True, hide_index=True )
+
+        st.markdown( 'Cache de resultados (processo)' )
+        st.dataframe( pd.DataFrame( [RESULTS.stats()] ), use_container_width=True, hide_index=True )
+
+        if store is not None:
+            st.markdown( 'Memória do dataset (versão {})'.format( store.version ) )
+            st.dataframe( store.memory_report(), use_container_width=True, hide_index=True )
+
+        st.download_button( 'Baixar reruns da sessão (JSON lines)',
+                            data='\n'.join( json.dumps( r, ensure_ascii=False ) for r in historico ) + '\n',
+                            file_name='perf_{}.jsonl'.format( profile.page ), mime='application/json' )
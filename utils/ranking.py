@@ -0,0 +1,60 @@
+# =========================================
+# Imports
+# =========================================
+import numpy as np
+
+# =========================================
+# Funções
+# =========================================
+
+def _ends( values, k ):
+    """
+    Posições dos k menores e dos k maiores valores, já ordenadas.
+    Uma única seleção parcial (np.argpartition com os dois cortes) separa as duas pontas;
+    só os 2k elementos selecionados são ordenados.
+    """
+    
+    n = len( values )
+    if n <= 2 * k:
+        ordem = np.argsort( values, kind='stable' )
+        return ordem[:k], ordem[::-1][:k]
+    
+    particao = np.argpartition( values, ( k - 1, n - k ) )
+    menores, maiores = particao[:k], particao[n - k:]
+    
+    return menores[np.argsort( values[menores], kind='stable' )], maiores[np.argsort( -values[maiores], kind='stable' )]
+
+def top_bottom_k( df1, group, key, value, k=10, min_count=1 ):
+    """
+    Esta função tem a responsabilidade de ranquear as chaves de cada grupo pela média de um valor.
+    Critérios:
+    1. Média e quantidade de linhas por (grupo, chave) em um único groupby
+    2. Remoção das chaves com menos de min_count linhas
+    3. Em cada grupo, os k menores e os k maiores por seleção parcial (sem ordenar tudo)
+    Input: - df1: dataframe com as linhas
+           - group: coluna dos grupos (ex.: City)
+           - key: coluna ranqueada (ex.: Delivery_person_ID)
+           - value: coluna da média (ex.: Time_taken(min))
+           - k: quantidade por ponta e por grupo
+           - min_count: quantidade mínima de linhas por chave
+    Output: (bottom, top): dataframes com group, key, value (média) e count;
+            bottom tem as menores médias (crescente) e top as maiores (decrescente)
+    """
+    
+    stats = ( df1.groupby( [group, key], observed=True )[value]
+                 .agg( ['mean', 'size'] )
+                 .rename( columns={'mean': value, 'size': 'count'} ) )
+    stats = stats.loc[stats['count'] >= min_count, :].reset_index()
+    
+    medias = stats[value].to_numpy()
+    menores, maiores = [], []
+    for _, posicoes in sorted( stats.groupby( group, observed=True ).indices.items() ):
+        baixo, alto = _ends( medias[posicoes], k )
+        menores.append( posicoes[baixo] )
+        maiores.append( posicoes[alto] )
+    
+    vazio = np.array( [], dtype='int64' )
+    bottom = stats.take( np.concatenate( menores or [vazio] ) ).reset_index( drop=True )
+    top = stats.take( np.concatenate( maiores or [vazio] ) ).reset_index( drop=True )
+    
+    return bottom, top
@@ -0,0 +1,173 @@
+# =========================================
+# Imports
+# =========================================
+import inspect
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import pandas as pd
+
+from utils.profiling import profiled
+
+# Seleções guardadas por processo (todas as páginas e sessões juntas)
+RESULT_CACHE_SIZE = int( os.environ.get( 'CURRY_RESULT_CACHE', '64' ) )
+
+# =========================================
+# Funções
+# =========================================
+
+class ResultCache:
+    """
+    Resultados das páginas (figuras, tabelas e métricas) por seleção da barra lateral.
+    É compartilhado pelas sessões do servidor e pelas threads do aquecimento (utils.warmup),
+    então não depende do contexto de um rerun como o st.cache_data.
+    Uma seleção que já está sendo calculada em outra thread não é calculada de novo:
+    quem chega depois espera o mesmo resultado.
+    Quando a versão dos dados muda (novo csv ou lote aplicado), os resultados das versões
+    anteriores saem do cache de uma vez.
+    """
+
+    def __init__( self, max_entries=RESULT_CACHE_SIZE ):
+        self.max_entries = max_entries
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._data = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def __len__( self ):
+        return len( self._data )
+
+    def __contains__( self, key ):
+        return key in self._data
+
+    def get_or_compute( self, key, compute, version=None ):
+        """
+        Esta função tem a responsabilidade de devolver o resultado da chave, calculando só quando falta.
+        Critérios:
+        1. Chaves usadas há mais tempo saem primeiro quando o cache passa de max_entries (LRU)
+        2. Um cálculo com erro não fica no cache (a próxima chamada tenta de novo)
+        3. Uma versão nova dos dados remove os resultados das outras versões
+        4. Acertos, faltas, remoções por tamanho e por versão são contados (stats)
+        Input: - key: chave da seleção (selection_key)
+               - compute: função sem argumentos que calcula o resultado
+               - version: versão dos dados do resultado (None = não confere)
+        Output: resultado
+        """
+
+        with self._lock:
+            if version is not None and version != self.version:
+                self._invalidate( version )
+            if key in self._data:
+                self.hits += 1
+                self._data.move_to_end( key )
+                return self._data[key][1]
+            self.misses += 1
+            future = self._pending.get( key )
+            dono = future is None
+            if dono:
+                future = self._pending[key] = Future()
+
+        if not dono:
+            return future.result()
+
+        try:
+            resultado = compute()
+        except BaseException as erro:
+            with self._lock:
+                del self._pending[key]
+            future.set_exception( erro )
+            raise
+
+        with self._lock:
+            # Um cálculo que terminou depois da troca de versão não entra no cache
+            if version is None or version == self.version:
+                self._data[key] = ( version, resultado )
+            while len( self._data ) > self.max_entries:
+                self._data.popitem( last=False )
+                self.evictions += 1
+            del self._pending[key]
+        future.set_result( resultado )
+
+        return resultado
+
+    def _invalidate( self, version ):
+        """Remove os resultados de outras versões dos dados (chamada com o lock)."""
+
+        antigas = [key for key, ( versao, _ ) in self._data.items() if versao is not None and versao != version]
+        for key in antigas:
+            del self._data[key]
+        self.invalidations += len( antigas )
+        self.version = version
+
+    def stats( self ):
+        """
+        Esta função tem a responsabilidade de resumir o uso do cache.
+        Output: dict com entries, max_entries, hits, misses, hit_rate, evictions e invalidations
+        """
+
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {'entries': len( self._data ), 'max_entries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': round( self.hits / consultas, 3 ) if consultas else None,
+                    'evictions': self.evictions, 'invalidations': self.invalidations}
+
+    def clear( self ):
+        with self._lock:
+            self._data.clear()
+
+RESULTS = ResultCache()
+
+def normalize_options( options ):
+    """Opções de um multiselect sem ordem e sem repetição (None continua None: sem filtro)."""
+
+    return None if options is None else tuple( sorted( set( options ) ) )
+
+def selection_key( view, version, date_limit, traffic_options, weather_options=None, **params ):
+    """
+    Esta função tem a responsabilidade de montar a assinatura normalizada de uma seleção de uma página.
+    Critérios:
+    1. A ordem em que as opções foram marcadas nos multiselects não muda a chave
+    2. A data vira texto ISO, então datetime, date e Timestamp do mesmo instante dão a mesma chave
+    Input: - view: nome da página
+           - version: versão dos dados (cache_version do store ou do banco)
+           - date_limit, traffic_options, weather_options: filtros da barra lateral
+           - params: outros controles da página que mudam o resultado
+    Output: tupla
+    """
+
+    return ( view, version, pd.Timestamp( date_limit ).isoformat(), normalize_options( traffic_options ),
+             normalize_options( weather_options ), tuple( sorted( params.items() ) ) )
+
+@profiled()
+def cached_results( view, page_results, source, date_limit, traffic_options, weather_options=None, **params ):
+    """
+    Esta função tem a responsabilidade de devolver os resultados de uma página para a seleção, pelo cache do processo.
+    Input: - view: nome da página
+           - page_results: função da página ou da seção (utils.visao_*)
+           - source: store em memória ou banco (SqlBackend)
+           - date_limit, traffic_options, weather_options: filtros da barra lateral
+           - params: outros controles da página repassados ao page_results
+    Output: dict com os resultados da página
+    """
+
+    # Controles no valor padrão do page_results ficam fora da chave: mesma entrada do aquecimento
+    padroes = inspect.signature( page_results ).parameters
+    params = {nome: valor for nome, valor in params.items() if padroes[nome].default != valor}
+
+    version = source.cache_version
+    key = selection_key( view, version, date_limit, traffic_options, weather_options, **params )
+
+    # O cálculo recebe as opções normalizadas: o resultado guardado não depende da ordem da primeira sessão
+    traffic_options = list( normalize_options( traffic_options ) )
+    weather_options = normalize_options( weather_options )
+    weather_options = None if weather_options is None else list( weather_options )
+
+    return RESULTS.get_or_compute(
+        key, lambda: page_results( source, date_limit, traffic_options, weather_options, **params ), version=version )
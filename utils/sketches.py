@@ -0,0 +1,572 @@
+# =========================================
+# Imports
+# =========================================
+import os
+
+import numpy as np
+import pandas as pd
+
+# Células dos sketches de entregadores distintos: uma por dia e filtro da barra lateral
+SKETCH_DIMS = ['Order_Date', 'City', 'Road_traffic_density', 'Weatherconditions']
+
+# Precisões aceitas nos sketches das células: os registros ocupados são guardados em uint16
+MIN_SKETCH_PRECISION = 4
+MAX_SKETCH_PRECISION = 16
+
+# Precisão dos sketches das células (2**p registros; cada célula guarda só os registros ocupados)
+SKETCH_PRECISION = int( os.environ.get( 'CURRY_SKETCH_PRECISION', '11' ) )
+if not MIN_SKETCH_PRECISION <= SKETCH_PRECISION <= MAX_SKETCH_PRECISION:
+    raise ValueError( 'CURRY_SKETCH_PRECISION={} inválida: use de {} a {}'.format(
+                      SKETCH_PRECISION, MIN_SKETCH_PRECISION, MAX_SKETCH_PRECISION ) )
+
+# Contagem de distintos nas páginas: 'approx' (sketches) ou 'exact' (nunique nas linhas)
+DISTINCT_MODE = os.environ.get( 'CURRY_DISTINCT', 'approx' )
+
+# Células dos sketches de quantis do tempo de entrega: as dos distintos e o festival
+QUANTILE_DIMS = SKETCH_DIMS + ['Festival']
+
+# Erro relativo máximo de cada quantil (DDSketch): 1% do valor exato
+QUANTILE_ACCURACY = float( os.environ.get( 'CURRY_QUANTILE_ACCURACY', '0.01' ) )
+
+# Faixa de valores representada pelos buckets (minutos); valores fora dela ficam nas pontas
+QUANTILE_RANGE = ( 1.0, 24 * 60.0 )
+
+# Percentis das páginas
+PERCENTILES = {'p50': 0.5, 'p90': 0.9, 'p99': 0.99}
+
+# 2**-rank para cada rank possível de um registro (0 a 65)
+POWERS = np.ldexp( 1.0, -np.arange( 66 ) )
+
+# =========================================
+# Funções
+# =========================================
+
+def hash_values( values ):
+    """
+    Esta função tem a responsabilidade de gerar hashes de 64 bits estáveis entre processos.
+    Usa o pd.util.hash_array (siphash com chave fixa), então sketches de processos
+    diferentes podem ser combinados.
+    Colunas categóricas têm só as categorias calculadas (o hash vem do valor, não do código).
+    Input: values: array ou Series de valores
+    Output: array uint64
+    """
+    
+    if isinstance( getattr( values, 'dtype', None ), pd.CategoricalDtype ):
+        codes = np.asarray( values.cat.codes )
+        return pd.util.hash_array( np.asarray( values.cat.categories, dtype=object ) )[codes]
+    
+    return pd.util.hash_array( np.asarray( values, dtype=object ) )
+
+def _leading_zeros( x ):
+    """Quantidade de zeros à esquerda de cada uint64 (64 quando x == 0), sem passar por float."""
+    
+    x = x.copy()
+    n = np.zeros( len( x ), dtype='uint8' )
+    for shift in ( 32, 16, 8, 4, 2, 1 ):
+        sem_bits = x < np.uint64( 1 << ( 64 - shift ) )
+        n[sem_bits] += shift
+        x[sem_bits] <<= np.uint64( shift )
+    n[x == 0] += 1
+    
+    return n
+
+def hll_positions( values, p ):
+    """
+    Esta função tem a responsabilidade de calcular o registro e o rank HyperLogLog de cada valor.
+    Input: - values: valores a contar
+           - p: precisão (2**p registros)
+    Output: (índices dos registros, ranks uint8)
+    """
+    
+    h = hash_values( values )
+    idx = ( h >> np.uint64( 64 - p ) ).astype( 'int64' )
+    resto = h << np.uint64( p )
+    rank = np.minimum( _leading_zeros( resto ) + 1, 64 - p + 1 ).astype( 'uint8' )
+    
+    return idx, rank
+
+def hll_estimate( registers ):
+    """
+    Esta função tem a responsabilidade de estimar a quantidade de distintos a partir dos registros.
+    Usa a correção de contagem linear para cardinalidades pequenas.
+    Input: registers: array uint8 com 2**p registros
+    Output: estimativa (float)
+    """
+    
+    m = len( registers )
+    alpha = 0.7213 / ( 1 + 1.079 / m )
+    estimativa = alpha * m * m / np.dot( np.bincount( registers, minlength=len( POWERS ) ), POWERS )
+    
+    zeros = np.count_nonzero( registers == 0 )
+    if estimativa <= 2.5 * m and zeros > 0:
+        estimativa = m * np.log( m / zeros )
+    
+    return float( estimativa )
+
+class HyperLogLog:
+    """
+    Contagem aproximada de valores distintos em memória fixa (2**p bytes).
+    Erro padrão relativo de ~1.04 / sqrt(2**p): 1.6% com p=12.
+    Dois sketches com o mesmo p são combinados com o máximo registro a registro.
+    """
+    
+    def __init__( self, p=12 ):
+        self.p = p
+        self.registers = np.zeros( 1 << p, dtype='uint8' )
+    
+    def add( self, values ):
+        idx, rank = hll_positions( values, self.p )
+        np.maximum.at( self.registers, idx, rank )
+        
+        return self
+    
+    def merge( self, other ):
+        np.maximum( self.registers, other.registers, out=self.registers )
+        
+        return self
+    
+    def count( self ):
+        return hll_estimate( self.registers )
+
+def cell_codes( df1, dims ):
+    """
+    Esta função tem a responsabilidade de numerar a célula de cada linha do dataset.
+    Cada dimensão é fatorada (pd.factorize) e os códigos são combinados em um inteiro por linha,
+    sem o groupby de várias colunas (que monta índices intermediários do tamanho do dataset).
+    Valores nulos formam uma célula, como no groupby com dropna=False.
+    Input: - df1: df com as dimensões
+           - dims: colunas das células
+    Output: (array com a célula de cada linha, df com as dimensões de cada célula)
+    """
+    
+    combinado = np.zeros( len( df1 ), dtype='int64' )
+    fatores = []
+    for col in dims:
+        codigos, valores = pd.factorize( df1[col] )
+        combinado = combinado * ( len( valores ) + 1 ) + ( codigos + 1 )
+        fatores.append( ( col, valores ) )
+    
+    unicos, celulas = np.unique( combinado, return_inverse=True )
+    
+    keys = {}
+    for col, valores in reversed( fatores ):
+        unicos, codigos = np.divmod( unicos, len( valores ) + 1 )
+        keys[col] = valores.take( codigos - 1, allow_fill=True )
+    
+    return celulas, pd.DataFrame( {col: keys[col] for col in dims} )
+
+class CellIndex:
+    """
+    Dimensões das células em arrays do numpy, montadas uma vez por sketch: datas e códigos das categorias.
+    Os filtros da barra lateral viram comparações e consultas a tabelas nos arrays, sem o custo fixo
+    das operações do pandas a cada seleção. Mesmas regras do filter_cube; colunas ausentes nas células
+    (ex.: células sem data) não filtram.
+    """
+    
+    def __init__( self, keys ):
+        self.size = len( keys )
+        self.dates = keys['Order_Date'].to_numpy() if 'Order_Date' in keys else None
+        self.columns = {}
+        for col in ( 'Road_traffic_density', 'Weatherconditions' ):
+            if col not in keys:
+                continue
+            if isinstance( keys[col].dtype, pd.CategoricalDtype ):
+                categorias = {valor: codigo for codigo, valor in enumerate( keys[col].cat.categories )}
+                self.columns[col] = ( np.asarray( keys[col].cat.codes ), categorias )
+            else:
+                self.columns[col] = ( np.asarray( keys[col] ), None )
+    
+    def isin( self, col, options ):
+        """Células com o valor de col entre as opções (categorias: tabela por código, com -1 = nulo fora)."""
+        
+        valores, categorias = self.columns[col]
+        if categorias is None:
+            return np.isin( valores, list( options ) )
+        
+        tabela = np.zeros( len( categorias ) + 1, dtype=bool )
+        tabela[[categorias[opcao] for opcao in options if opcao in categorias]] = True
+        
+        return tabela[valores]
+    
+    def mask( self, date_limit, traffic_options, weather_options=None ):
+        """
+        Esta função tem a responsabilidade de aplicar os filtros da barra lateral nas células.
+        Input: - date_limit: data limite (exclusiva)
+               - traffic_options: densidades de trânsito selecionadas
+               - weather_options: condições de clima selecionadas (None = sem filtro)
+        Output: array booleano
+        """
+        
+        linhas_selecionadas = np.ones( self.size, dtype=bool )
+        if self.dates is not None:
+            linhas_selecionadas &= self.dates < np.datetime64( pd.Timestamp( date_limit ) )
+        if 'Road_traffic_density' in self.columns:
+            linhas_selecionadas &= self.isin( 'Road_traffic_density', traffic_options )
+        if weather_options is not None and 'Weatherconditions' in self.columns:
+            linhas_selecionadas &= self.isin( 'Weatherconditions', weather_options )
+        
+        return linhas_selecionadas
+
+def error_bound( p=SKETCH_PRECISION ):
+    """Erro padrão relativo do HyperLogLog com 2**p registros (1.04 / sqrt(2**p))."""
+    
+    return 1.04 / np.sqrt( 1 << p )
+
+class SketchCube:
+    """
+    Um HyperLogLog de entregadores por célula (SKETCH_DIMS), guardado de forma esparsa: só os
+    registros ocupados de cada célula, como entradas (célula, rank) ordenadas por registro.
+    Uma célula tem poucos entregadores, então ocupa poucas entradas em vez de 2**p bytes: a memória
+    acompanha a quantidade de pares célula x entregador, no máximo uma entrada por linha do dataset.
+    Os entregadores distintos de qualquer seleção da barra lateral saem do máximo, registro a registro,
+    das entradas das células selecionadas (um np.maximum.reduceat por registro ocupado).
+    Erro padrão relativo de error_bound( p ) (2.3% com p=11); com poucos distintos em relação
+    aos registros, a correção de contagem linear deixa o erro bem menor.
+    Uma seleção (select) não copia as entradas: guarda só a máscara das células.
+    """
+    
+    def __init__( self, keys, cells, ranks, registers, starts, p, mask=None, index=None ):
+        self.keys = keys
+        self.cells = cells
+        self.ranks = ranks
+        self.registers = registers
+        self.starts = starts
+        self.p = p
+        self.mask = np.ones( len( keys ), dtype=bool ) if mask is None else mask
+        self.index = index or CellIndex( keys )
+    
+    @classmethod
+    def from_entries( cls, keys, cells, registers, ranks, p ):
+        """
+        Esta função tem a responsabilidade de montar os sketches a partir de pares (célula, registro, rank).
+        Critérios:
+        1. Cada par célula x registro fica uma vez, com o maior rank
+        2. As entradas são ordenadas por registro: cada registro ocupado é uma faixa contínua (starts)
+        Input: - keys: df com as dimensões de cada célula
+               - cells, registers, ranks: arrays com a célula, o registro e o rank de cada valor
+               - p: precisão (MIN_SKETCH_PRECISION a MAX_SKETCH_PRECISION)
+        Output: SketchCube
+        """
+        
+        if not MIN_SKETCH_PRECISION <= p <= MAX_SKETCH_PRECISION:
+            raise ValueError( 'Precisão {} inválida: use de {} a {}'.format( p, MIN_SKETCH_PRECISION, MAX_SKETCH_PRECISION ) )
+        
+        # Uma chave int64 por valor (registro, célula, rank): ordenar a chave ordena pelos três
+        chaves = ( ( np.asarray( registers, dtype='int64' ) << 40 ) | ( np.asarray( cells, dtype='int64' ) << 8 )
+                   | np.asarray( ranks, dtype='int64' ) )
+        chaves = np.unique( chaves )
+        
+        ultimos = np.ones( len( chaves ), dtype=bool )
+        ultimos[:-1] = ( chaves[1:] >> 8 ) != ( chaves[:-1] >> 8 )
+        chaves = chaves[ultimos]
+        registers = chaves >> 40
+        cells = ( chaves >> 8 ) & ( ( 1 << 32 ) - 1 )
+        ranks = chaves & 0xFF
+        
+        ocupados, starts = np.unique( registers, return_index=True )
+        
+        # Células em intp: a consulta indexa a máscara por entrada, e índices de outro tipo são convertidos a cada consulta
+        return cls( keys, cells.astype( np.intp ), ranks.astype( 'uint8' ), ocupados.astype( 'uint16' ), starts, p )
+    
+    @classmethod
+    def build( cls, df1, column='Delivery_person_ID', p=SKETCH_PRECISION ):
+        """
+        Esta função tem a responsabilidade de montar os sketches de cada célula do dataset.
+        Input: - df1 limpo
+               - column: coluna dos valores distintos
+               - p: precisão
+        Output: SketchCube
+        """
+        
+        celulas, keys = cell_codes( df1, SKETCH_DIMS )
+        idx, rank = hll_positions( df1[column], p )
+        
+        return cls.from_entries( keys, celulas, idx, rank, p )
+    
+    @property
+    def nbytes( self ):
+        return self.cells.nbytes + self.ranks.nbytes + self.registers.nbytes + self.starts.nbytes
+    
+    def entry_registers( self ):
+        """Registro de cada entrada (as faixas de starts expandidas)."""
+        
+        return np.repeat( self.registers, np.diff( np.append( self.starts, len( self.ranks ) ) ) )
+    
+    def merge( self, other ):
+        """
+        Esta função tem a responsabilidade de juntar dois SketchCubes (ex.: atual + lote novo).
+        Células iguais ficam com o máximo dos registros.
+        Input: other: SketchCube com a mesma precisão
+        Output: SketchCube novo
+        """
+        
+        keys = pd.concat( [self.keys, other.keys], ignore_index=True )
+        grupos = keys.groupby( SKETCH_DIMS, observed=True, dropna=False, sort=False )
+        celulas = grupos.ngroup().to_numpy()
+        
+        n = len( self.keys )
+        cells = np.concatenate( [celulas[:n][self.cells], celulas[n:][other.cells]] )
+        registers = np.concatenate( [self.entry_registers(), other.entry_registers()] )
+        ranks = np.concatenate( [self.ranks, other.ranks] )
+        
+        return SketchCube.from_entries( grupos.size().reset_index().loc[:, SKETCH_DIMS], cells, registers, ranks, self.p )
+    
+    def select( self, date_limit, traffic_options, weather_options=None ):
+        """
+        Esta função tem a responsabilidade de aplicar os filtros da barra lateral nas células (CellIndex).
+        Input: - date_limit: data limite (exclusiva)
+               - traffic_options: densidades de trânsito selecionadas
+               - weather_options: condições de clima selecionadas (None = sem filtro)
+        Output: SketchCube com as células selecionadas (mesmas entradas, outra máscara)
+        """
+        
+        linhas_selecionadas = self.index.mask( date_limit, traffic_options, weather_options )
+        
+        return SketchCube( self.keys, self.cells, self.ranks, self.registers, self.starts, self.p,
+                           self.mask & linhas_selecionadas, self.index )
+    
+    def _merged( self, mask ):
+        """Registros densos das células da máscara juntados (máximo por registro), sem cópia das entradas selecionadas."""
+        
+        registers = np.zeros( 1 << self.p, dtype='uint8' )
+        if len( self.ranks ):
+            registers[self.registers] = np.maximum.reduceat( self.ranks * mask[self.cells], self.starts )
+        
+        return registers
+    
+    def count( self ):
+        """Distintos estimados nas células selecionadas."""
+        
+        if not self.mask.any():
+            return 0.0
+        
+        return hll_estimate( self._merged( self.mask ) )
+    
+    def count_by( self, by ):
+        """
+        Esta função tem a responsabilidade de estimar os distintos por grupo das células selecionadas.
+        Input: by: Series (alinhada com keys) com o grupo de cada célula
+        Output: Series com a estimativa por grupo
+        """
+        
+        by = np.asarray( by )
+        grupos = np.unique( by[self.mask] )
+        
+        return pd.Series( {grupo: hll_estimate( self._merged( self.mask & ( by == grupo ) ) ) for grupo in grupos},
+                          dtype='float64' )
+
+class QuantileMapping:
+    """
+    Buckets logarítmicos do DDSketch: o bucket k guarda os valores em (gamma**(k-1), gamma**k],
+    com gamma = (1 + a) / (1 - a). O valor devolvido por bucket fica a no máximo a (erro relativo)
+    de qualquer valor do bucket. Os buckets são fixos (QUANTILE_RANGE), então sketches com a mesma
+    precisão são somados bucket a bucket.
+    """
+    
+    def __init__( self, accuracy=QUANTILE_ACCURACY, value_range=QUANTILE_RANGE ):
+        self.accuracy = accuracy
+        self.gamma = ( 1 + accuracy ) / ( 1 - accuracy )
+        self.offset = int( np.ceil( np.log( value_range[0] ) / np.log( self.gamma ) ) )
+        self.n_buckets = int( np.ceil( np.log( value_range[1] ) / np.log( self.gamma ) ) ) - self.offset + 1
+    
+    def bucket( self, values ):
+        """Bucket de cada valor (valores fora da faixa ficam no primeiro ou no último)."""
+        
+        chaves = np.ceil( np.log( np.asarray( values, dtype='float64' ) ) / np.log( self.gamma ) ) - self.offset
+        
+        return np.clip( np.nan_to_num( chaves, nan=0, neginf=0 ), 0, self.n_buckets - 1 ).astype( 'int64' )
+    
+    def value( self, buckets ):
+        """Valor representativo de cada bucket (a média harmônica das pontas, com erro relativo <= accuracy)."""
+        
+        return 2 * self.gamma ** ( np.asarray( buckets ) + self.offset ) / ( self.gamma + 1 )
+
+def quantiles_from_counts( counts, quantiles, mapping ):
+    """
+    Esta função tem a responsabilidade de ler quantis de um histograma de buckets.
+    O quantil q é o valor do bucket que contém a posição q * (n - 1) dos valores ordenados.
+    Input: - counts: contagem por bucket
+           - quantiles: lista de quantis entre 0 e 1
+           - mapping: QuantileMapping dos buckets
+    Output: array com um valor por quantil (nan sem valores)
+    """
+    
+    acumulado = np.cumsum( counts )
+    if len( acumulado ) == 0 or acumulado[-1] == 0:
+        return np.full( len( quantiles ), np.nan )
+    
+    posicoes = np.asarray( quantiles ) * ( acumulado[-1] - 1 )
+    
+    return mapping.value( np.searchsorted( acumulado, posicoes, side='right' ) )
+
+class QuantileCube:
+    """
+    Um sketch de quantis (DDSketch) do tempo de entrega por célula (QUANTILE_DIMS), guardado de forma
+    esparsa: só os buckets logarítmicos (QuantileMapping) ocupados de cada célula, como entradas
+    (célula, contagem) ordenadas por bucket. O tempo é em minutos inteiros, então cada célula ocupa
+    poucos buckets dos ~380 da faixa: a memória acompanha os pares célula x tempo, não células x buckets.
+    Os percentis de qualquer seleção da barra lateral saem da soma das células selecionadas (uma soma
+    mascarada por bucket ocupado), sem ordenar as linhas, e cada percentil fica a no máximo
+    QUANTILE_ACCURACY (relativo) do exato.
+    Uma seleção (select) não copia as entradas: guarda só a máscara das células.
+    """
+    
+    def __init__( self, keys, cells, counts, buckets, starts, mapping, mask=None, index=None ):
+        self.keys = keys
+        self.cells = cells
+        self.counts = counts
+        self.buckets = buckets
+        self.starts = starts
+        self.mapping = mapping
+        self.mask = np.ones( len( keys ), dtype=bool ) if mask is None else mask
+        self.index = index or CellIndex( keys )
+    
+    @classmethod
+    def from_entries( cls, keys, cells, buckets, counts, mapping ):
+        """
+        Esta função tem a responsabilidade de montar os sketches a partir de trios (célula, bucket, contagem).
+        Critérios:
+        1. Trios da mesma célula e do mesmo bucket são somados em uma entrada
+        2. As entradas são ordenadas por bucket: cada bucket ocupado é uma faixa contínua (starts)
+        Input: - keys: df com as dimensões de cada célula
+               - cells, buckets, counts: arrays com a célula, o bucket e a contagem de cada trio
+               - mapping: QuantileMapping dos buckets
+        Output: QuantileCube
+        """
+        
+        # Uma chave int64 por trio (bucket, célula): ordenar a chave ordena pelos dois
+        chaves = ( np.asarray( buckets, dtype='int64' ) << 32 ) | np.asarray( cells, dtype='int64' )
+        chaves, posicoes = np.unique( chaves, return_inverse=True )
+        counts = np.bincount( posicoes, weights=counts, minlength=len( chaves ) ).astype( 'uint32' )
+        
+        ocupados, starts = np.unique( chaves >> 32, return_index=True )
+        
+        # Células em intp: a consulta indexa a máscara por entrada, e índices de outro tipo são convertidos a cada consulta
+        return cls( keys, ( chaves & ( ( 1 << 32 ) - 1 ) ).astype( np.intp ), counts, ocupados.astype( 'int16' ),
+                    starts, mapping )
+    
+    @classmethod
+    def from_counts( cls, df_counts, dims, value_col, count_col, mapping=None ):
+        """
+        Esta função tem a responsabilidade de montar os sketches a partir de valores já contados.
+        Input: - df_counts: df com as dimensões, o valor e a quantidade de linhas com o valor
+               - dims: dimensões das células
+               - value_col, count_col: colunas do valor e da quantidade
+               - mapping: QuantileMapping (None = padrão)
+        Output: QuantileCube
+        """
+        
+        mapping = mapping or QuantileMapping()
+        celulas, keys = cell_codes( df_counts, dims )
+        
+        return cls.from_entries( keys, celulas, mapping.bucket( df_counts[value_col] ),
+                                 df_counts[count_col].to_numpy( dtype='float64' ), mapping )
+    
+    @classmethod
+    def build( cls, df1, column='Time_taken(min)', dims=QUANTILE_DIMS, mapping=None ):
+        """
+        Esta função tem a responsabilidade de montar os sketches de cada célula do dataset.
+        Cada linha com valor é um trio (célula, bucket, 1); from_entries soma os iguais.
+        Input: - df1 limpo
+               - column: coluna dos valores
+               - dims: dimensões das células
+               - mapping: QuantileMapping (None = padrão)
+        Output: QuantileCube
+        """
+        
+        mapping = mapping or QuantileMapping()
+        validos = df1[column].notna()
+        df_aux = df1 if validos.all() else df1.loc[validos, dims + [column]]
+        celulas, keys = cell_codes( df_aux, dims )
+        
+        return cls.from_entries( keys, celulas, mapping.bucket( df_aux[column] ), np.ones( len( df_aux ) ), mapping )
+    
+    @property
+    def nbytes( self ):
+        return self.cells.nbytes + self.counts.nbytes + self.buckets.nbytes + self.starts.nbytes
+    
+    def entry_buckets( self ):
+        """Bucket de cada entrada (as faixas de starts expandidas)."""
+        
+        return np.repeat( self.buckets, np.diff( np.append( self.starts, len( self.counts ) ) ) )
+    
+    def merge( self, other ):
+        """
+        Esta função tem a responsabilidade de juntar dois QuantileCubes (ex.: atual + lote novo).
+        Células iguais têm as contagens somadas.
+        Input: other: QuantileCube com as mesmas dimensões e o mesmo QuantileMapping
+        Output: QuantileCube novo
+        """
+        
+        keys = pd.concat( [self.keys, other.keys], ignore_index=True )
+        grupos = keys.groupby( list( keys.columns ), observed=True, dropna=False, sort=False )
+        celulas = grupos.ngroup().to_numpy()
+        
+        n = len( self.keys )
+        cells = np.concatenate( [celulas[:n][self.cells], celulas[n:][other.cells]] )
+        buckets = np.concatenate( [self.entry_buckets(), other.entry_buckets()] )
+        counts = np.concatenate( [self.counts, other.counts] ).astype( 'float64' )
+        
+        return QuantileCube.from_entries( grupos.size().reset_index().loc[:, list( keys.columns )], cells, buckets,
+                                          counts, self.mapping )
+    
+    def select( self, date_limit, traffic_options, weather_options=None ):
+        """
+        Esta função tem a responsabilidade de aplicar os filtros da barra lateral nas células (CellIndex).
+        Output: QuantileCube com as células selecionadas (mesmas entradas, outra máscara)
+        """
+        
+        linhas_selecionadas = self.index.mask( date_limit, traffic_options, weather_options )
+        
+        return QuantileCube( self.keys, self.cells, self.counts, self.buckets, self.starts, self.mapping,
+                             self.mask & linhas_selecionadas, self.index )
+    
+    def histogram( self, mask=None ):
+        """Contagem por bucket das células da máscara (None = células selecionadas), sem cópia das entradas selecionadas."""
+        
+        mask = self.mask if mask is None else mask
+        
+        # Soma mascarada faixa a faixa (poucos buckets ocupados): sem array de contagens mascaradas do tamanho das entradas
+        selecionadas = mask[self.cells]
+        fins = np.append( self.starts[1:], len( self.counts ) )
+        histograma = np.zeros( self.mapping.n_buckets, dtype='int64' )
+        histograma[self.buckets] = [self.counts[inicio:fim].sum( where=selecionadas[inicio:fim], dtype='int64' )
+                                    for inicio, fim in zip( self.starts.tolist(), fins.tolist() )]
+        
+        return histograma
+    
+    def quantiles( self, quantiles=tuple( PERCENTILES.values() ) ):
+        """Quantis das células selecionadas."""
+        
+        return quantiles_from_counts( self.histogram(), quantiles, self.mapping )
+    
+    def quantiles_by( self, col, percentiles=PERCENTILES ):
+        """
+        Esta função tem a responsabilidade de calcular os percentis por valor de uma dimensão.
+        Input: - col: dimensão das células (ex.: City)
+               - percentiles: dict nome -> quantil
+        Output: df com col, orders e uma coluna por percentil
+        """
+        
+        valores = np.asarray( self.keys[col] )
+        linhas = []
+        for valor in pd.unique( valores[self.mask] ):
+            histograma = self.histogram( self.mask & ( valores == valor ) )
+            resultado = quantiles_from_counts( histograma, list( percentiles.values() ), self.mapping )
+            linhas.append( {col: valor, 'orders': int( histograma.sum() ), **dict( zip( percentiles, resultado ) )} )
+        
+        df_aux = pd.DataFrame( linhas, columns=[col, 'orders'] + list( percentiles ) )
+        
+        return df_aux.sort_values( col, ignore_index=True )
+    
+    def distribution( self ):
+        """
+        Esta função tem a responsabilidade de devolver a distribuição das células selecionadas.
+        Output: df com value (valor do bucket) e orders, só os buckets com pedidos
+        """
+        
+        histograma = self.histogram()
+        buckets = np.flatnonzero( histograma )
+        
+        return pd.DataFrame( {'value': self.mapping.value( buckets ), 'orders': histograma[buckets]} )
+
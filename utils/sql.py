@@ -0,0 +1,486 @@
+# =========================================
+# Imports
+# =========================================
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+from utils.cube import CUBE_DIMS, CUBE_VALUES
+from utils.data import DATASET_PATH, DATE_COLUMN, UNUSED_COLUMNS, read_dataset
+from utils.geo import MAX_CELLS
+from utils.profiling import profiled
+from utils.sketches import QUANTILE_DIMS, QuantileCube
+from utils.store import BATCH_DIR, file_sha256, read_appended
+
+logger = logging.getLogger( __name__ )
+
+# Backend das páginas: 'memory' (store em memória, o padrão) ou 'sqlite'
+BACKEND = os.environ.get( 'CURRY_BACKEND', 'memory' )
+
+SQLITE_PATH = 'dataset/train.sqlite'
+TABLE = 'orders'
+
+# Lotes inseridos no banco (sync_database), com os mesmos campos do checkpoint do store
+BATCHES_TABLE = '''CREATE TABLE IF NOT EXISTS batches (sha256 TEXT PRIMARY KEY, file TEXT, rows INTEGER,
+                                                       bytes INTEGER, appended_to TEXT, applied_at TEXT)'''
+
+# Lotes já conferidos neste processo: (banco, nome, tamanho, data) -> sha256
+_seen_batches = {}
+_batches_lock = threading.Lock()
+
+# Colunas indexadas: filtros da barra lateral, cidade e entregador
+INDEX_COLUMNS = ['Order_Date', 'City', 'Road_traffic_density', 'Weatherconditions', 'Delivery_person_ID']
+
+# =========================================
+# Funções
+# =========================================
+
+def _quote( col ):
+    """Nome de coluna entre aspas (Time_taken(min) tem parênteses)."""
+
+    return '"{}"'.format( col )
+
+def day_limit( date_limit ):
+    """Data limite (exclusiva) como texto 'YYYY-MM-DD', arredondada para cima (mesmo corte do FilterIndex)."""
+
+    return pd.Timestamp( date_limit ).ceil( 'D' ).strftime( '%Y-%m-%d' )
+
+def table_rows( df1 ):
+    """Linhas do dataset limpo no formato da tabela: sem UNUSED_COLUMNS e com Order_Date como 'YYYY-MM-DD'."""
+
+    df_aux = df1.drop( columns=UNUSED_COLUMNS, errors='ignore' )
+    df_aux[DATE_COLUMN] = df_aux[DATE_COLUMN].dt.strftime( '%Y-%m-%d' )
+
+    return df_aux
+
+def build_database( df1, path=SQLITE_PATH, source=None ):
+    """
+    Esta função tem a responsabilidade de gravar o dataset limpo em um banco sqlite3 com índices.
+    Critérios:
+    1. Só as colunas usadas pelas páginas (sem UNUSED_COLUMNS); Order_Date como texto 'YYYY-MM-DD'
+    2. Um índice por coluna de INDEX_COLUMNS e estatísticas do planejador (ANALYZE)
+    3. O csv de origem e o seu mtime ficam na tabela meta
+    4. O banco é gravado em um arquivo temporário e trocado de uma vez no final
+    Input: - df1: dataset limpo (read_dataset)
+           - path: arquivo do banco
+           - source: csv de origem (opcional)
+    Output: path
+    """
+
+    tmp = path + '.tmp'
+    if os.path.exists( tmp ):
+        os.remove( tmp )
+
+    conexao = sqlite3.connect( tmp )
+    try:
+        table_rows( df1 ).to_sql( TABLE, conexao, index=False, chunksize=100_000 )
+        for col in INDEX_COLUMNS:
+            conexao.execute( 'CREATE INDEX idx_{0} ON {1} ({2})'.format( col.lower(), TABLE, _quote( col ) ) )
+        conexao.execute( 'CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)' )
+        conexao.execute( BATCHES_TABLE )
+        if source is not None:
+            conexao.executemany( 'INSERT INTO meta VALUES (?, ?)',
+                                 [( 'source', os.path.abspath( source ) ),
+                                  ( 'mtime', str( os.stat( source ).st_mtime_ns ) )] )
+        conexao.execute( 'ANALYZE' )
+        conexao.commit()
+    finally:
+        conexao.close()
+
+    os.replace( tmp, path )
+
+    return path
+
+def sync_database( path=SQLITE_PATH, batch_dir=BATCH_DIR ):
+    """
+    Esta função tem a responsabilidade de inserir no banco os lotes novos da pasta de lotes.
+    Critérios (as mesmas regras do DeliveryStore.sync):
+    1. Arquivos já conferidos no processo (mesmo nome, tamanho e data) não são relidos
+    2. Lotes são identificados pelo conteúdo (sha256), registrado na tabela batches do banco: cada
+       lote entra uma vez, mesmo com vários processos e depois de reiniciar o dashboard
+    3. Um lote já inserido que recebeu linhas no final tem só as linhas novas inseridas; qualquer
+       outra alteração é recusada (aviso no log)
+    4. As linhas de um lote e o seu registro entram na mesma transação
+    Input: - path: arquivo do banco
+           - batch_dir: pasta com os lotes (*.csv)
+    Output: quantidade de lotes inseridos nesta chamada
+    """
+
+    if not os.path.isdir( batch_dir ):
+        return 0
+
+    path = os.path.abspath( path )
+    novos = []
+    for entrada in sorted( os.scandir( batch_dir ), key=lambda e: e.name ):
+        if not entrada.name.endswith( '.csv' ) or not entrada.is_file():
+            continue
+        stat = entrada.stat()
+        chave = ( path, entrada.name, stat.st_size, stat.st_mtime_ns )
+        if chave not in _seen_batches:
+            novos.append( ( chave, entrada.path ) )
+
+    if not novos:
+        return 0
+
+    inseridos = 0
+    with _batches_lock:
+        conexao = sqlite3.connect( path, timeout=30, isolation_level=None )
+        try:
+            conexao.execute( BATCHES_TABLE )
+            colunas = [linha[1] for linha in conexao.execute( 'PRAGMA table_info({})'.format( TABLE ) )]
+            insert = 'INSERT INTO {0} ({1}) VALUES ({2})'.format(
+                     TABLE, ', '.join( _quote( col ) for col in colunas ), ', '.join( '?' * len( colunas ) ) )
+            for chave, arquivo in novos:
+                if chave in _seen_batches:
+                    continue
+                sha = file_sha256( arquivo )
+
+                # BEGIN IMMEDIATE: outro processo não insere o mesmo lote entre a consulta e o insert
+                conexao.execute( 'BEGIN IMMEDIATE' )
+                try:
+                    if conexao.execute( 'SELECT 1 FROM batches WHERE sha256 = ?', ( sha, ) ).fetchone():
+                        conexao.execute( 'ROLLBACK' )
+                        _seen_batches[chave] = sha
+                        continue
+                    anterior = conexao.execute( 'SELECT sha256, bytes FROM batches WHERE file = ? ORDER BY rowid DESC LIMIT 1',
+                                                ( chave[1], ) ).fetchone()
+                    if anterior is None:
+                        df_lote = read_dataset( arquivo )
+                    else:
+                        df_lote = read_appended( arquivo, {'sha256': anterior[0], 'bytes': anterior[1]} )
+                        if df_lote is None:
+                            conexao.execute( 'ROLLBACK' )
+                            _seen_batches[chave] = sha
+                            logger.warning( 'Lote %s recusado: o lote já foi inserido no banco e foi alterado '
+                                            '(não só linhas novas no final); salve as linhas novas em outro arquivo', arquivo )
+                            continue
+
+                    df_aux = table_rows( df_lote ).reindex( columns=colunas ).astype( object )
+                    conexao.executemany( insert, df_aux.where( df_aux.notna(), None ).itertuples( index=False, name=None ) )
+                    conexao.execute( 'INSERT INTO batches VALUES (?, ?, ?, ?, ?, ?)',
+                                     ( sha, chave[1], len( df_lote ), chave[2], anterior[0] if anterior else None,
+                                       datetime.now().isoformat( timespec='seconds' ) ) )
+                    conexao.execute( 'COMMIT' )
+                except BaseException:
+                    conexao.execute( 'ROLLBACK' )
+                    raise
+                _seen_batches[chave] = sha
+                inseridos += 1
+        finally:
+            conexao.close()
+
+    return inseridos
+
+def is_current( source, path=SQLITE_PATH ):
+    """
+    Esta função tem a responsabilidade de conferir se o banco foi gerado a partir da versão atual do csv.
+    Input: - source: csv de origem
+           - path: arquivo do banco
+    Output: True quando o csv e o mtime registrados são os atuais
+    """
+
+    if not os.path.exists( path ):
+        return False
+
+    conexao = sqlite3.connect( 'file:{}?mode=ro'.format( path ), uri=True )
+    try:
+        meta = dict( conexao.execute( 'SELECT key, value FROM meta' ).fetchall() )
+    finally:
+        conexao.close()
+
+    return ( meta.get( 'source' ) == os.path.abspath( source )
+             and meta.get( 'mtime' ) == str( os.stat( source ).st_mtime_ns ) )
+
+class SqlBackend:
+    """
+    Consultas das páginas em SQL sobre o banco sqlite3 (somente leitura).
+    Cada consulta devolve só o resultado agregado; o dataset fica no disco e é
+    compartilhado por todos os processos do dashboard.
+    Cada thread (rerun do Streamlit) usa a sua própria conexão.
+    """
+
+    def __init__( self, path=SQLITE_PATH ):
+        self.path = os.path.abspath( path )
+        self.version = os.stat( self.path ).st_mtime_ns
+        self._local = threading.local()
+
+    @property
+    def cache_version( self ):
+        """Versão dos dados para chaves de cache: o mtime do banco."""
+
+        return ( 'sqlite', self.version )
+
+    def _connection( self ):
+        conexao = getattr( self._local, 'conexao', None )
+        if conexao is None:
+            conexao = sqlite3.connect( 'file:{}?mode=ro'.format( self.path ), uri=True )
+            self._local.conexao = conexao
+
+        return conexao
+
+    def query( self, sql, params=() ):
+        """Executa uma consulta e devolve um dataframe."""
+
+        return pd.read_sql_query( sql, self._connection(), params=params )
+
+    def where( self, date_limit, traffic_options, weather_options=None ):
+        """
+        Esta função tem a responsabilidade de montar o WHERE dos filtros da barra lateral.
+        Input: - date_limit: data limite (exclusiva)
+               - traffic_options: densidades de trânsito selecionadas
+               - weather_options: condições de clima selecionadas (None = sem filtro)
+        Output: (cláusula, parâmetros)
+        """
+
+        condicoes = ['Order_Date < ?']
+        params = [day_limit( date_limit )]
+        for col, opcoes in ( ( 'Road_traffic_density', traffic_options ), ( 'Weatherconditions', weather_options ) ):
+            if opcoes is None:
+                continue
+            condicoes.append( '{} IN ({})'.format( col, ', '.join( '?' * len( opcoes ) ) ) if opcoes else '0' )
+            params.extend( opcoes )
+
+        return ' AND '.join( condicoes ), params
+
+    def select( self, date_limit, traffic_options, weather_options=None ):
+        """
+        Esta função tem a responsabilidade de aplicar os filtros da barra lateral (mesmo papel do DeliveryStore.select).
+        Input: - date_limit, traffic_options, weather_options: filtros da barra lateral
+        Output: (filtro, df_cube): filtro (cláusula, parâmetros) para as outras consultas e o cubo filtrado,
+                calculado no banco, no formato do build_cube
+        """
+
+        filtro = self.where( date_limit, traffic_options, weather_options )
+
+        return filtro, self.cube( filtro )
+
+    @profiled( 'sql.cube' )
+    def cube( self, filtro ):
+        """
+        Esta função tem a responsabilidade de montar o cubo filtrado em SQL.
+        O banco devolve n, soma e m2 de cada célula. O m2 é calculado em duas passagens, como no build_cube:
+        a média da célula (janela AVG OVER PARTITION BY) e depois a soma dos quadrados dos desvios, sem a
+        subtração soma dos quadrados - média * soma, que perde precisão com valores grandes e variância pequena.
+        Input: filtro: (cláusula, parâmetros) do where
+        Output: df no formato do build_cube (funciona com rollup e multi_rollup)
+        """
+
+        clausula, params = filtro
+        medias = []
+        somas = []
+        for n, value in enumerate( CUBE_VALUES ):
+            medias.append( '{0} AS v{1}, AVG({0}) OVER celula AS a{1}'.format( _quote( value ), n ) )
+            somas.append( 'COUNT(v{0}) AS n{0}, TOTAL(v{0}) AS s{0}, TOTAL((v{0} - a{0}) * (v{0} - a{0})) AS q{0}'.format( n ) )
+        dims = ', '.join( CUBE_DIMS )
+        sql = '''SELECT {0}, COUNT(*) AS orders, {1}
+                 FROM (SELECT {0}, {2} FROM {3} WHERE {4} WINDOW celula AS (PARTITION BY {0}))
+                 GROUP BY {0}'''.format( dims, ', '.join( somas ), ', '.join( medias ), TABLE, clausula )
+        df_aux = self.query( sql, params )
+
+        df_cube = df_aux.loc[:, CUBE_DIMS + ['orders']]
+        df_cube[DATE_COLUMN] = pd.to_datetime( df_cube[DATE_COLUMN] )
+        for n, value in enumerate( CUBE_VALUES ):
+            contagem = df_aux['n{}'.format( n )].astype( 'float64' )
+            media = ( df_aux['s{}'.format( n )] / contagem.where( contagem > 0 ) ).fillna( 0 )
+            m2 = df_aux['q{}'.format( n )]
+            df_cube[value + '_n'] = contagem
+            df_cube[value + '_mean'] = media
+            df_cube[value + '_m2'] = m2
+
+        return df_cube
+
+    @profiled( 'sql.week_share' )
+    def week_share( self, filtro ):
+        """
+        Esta função tem a responsabilidade de contar pedidos e entregadores únicos por semana (order_share_by_week).
+        A semana segue o utils.downsample.week_start: o domingo em que ela começa.
+        Input: filtro: (cláusula, parâmetros) do where
+        Output: df com week_of_year, ID e Delivery_person_ID
+        """
+
+        clausula, params = filtro
+        sql = '''SELECT date(Order_Date, '-' || strftime('%w', Order_Date) || ' days') AS week_of_year,
+                        COUNT(*) AS ID, COUNT(DISTINCT Delivery_person_ID) AS Delivery_person_ID
+                 FROM {0} WHERE {1} GROUP BY week_of_year ORDER BY week_of_year'''.format( TABLE, clausula )
+
+        df_aux = self.query( sql, params )
+        df_aux['week_of_year'] = pd.to_datetime( df_aux['week_of_year'] )
+
+        return df_aux
+
+    @profiled( 'sql.locations' )
+    def locations( self, filtro ):
+        """
+        Esta função tem a responsabilidade de calcular a mediana do local de entrega por cidade e tráfego (country_maps).
+        A mediana usa a posição de cada linha no grupo (média das duas do meio quando o grupo é par).
+        Input: filtro: (cláusula, parâmetros) do where
+        Output: df com City, Road_traffic_density e as medianas de latitude e longitude
+        """
+
+        clausula, params = filtro
+        medianas = []
+        for col in ['Delivery_location_latitude', 'Delivery_location_longitude']:
+            sql = '''WITH r AS (SELECT City, Road_traffic_density, {0} AS valor,
+                                       ROW_NUMBER() OVER (PARTITION BY City, Road_traffic_density ORDER BY {0}) AS rn,
+                                       COUNT(*) OVER (PARTITION BY City, Road_traffic_density) AS cnt
+                                FROM {1} WHERE {2})
+                     SELECT City, Road_traffic_density, AVG(valor) AS {0} FROM r
+                     WHERE rn IN ((cnt + 1) / 2, (cnt + 2) / 2)
+                     GROUP BY City, Road_traffic_density ORDER BY City, Road_traffic_density'''.format( col, TABLE, clausula )
+            medianas.append( self.query( sql, params ) )
+
+        return pd.merge( medianas[0], medianas[1], on=['City', 'Road_traffic_density'] )
+
+    @profiled( 'sql.density_bins' )
+    def density_bins( self, filtro, cell_size, max_cells=MAX_CELLS ):
+        """
+        Esta função tem a responsabilidade de contar os pedidos por célula da grade no banco (bin_locations).
+        Input: - filtro: (cláusula, parâmetros) do where
+               - cell_size: tamanho da célula em graus
+               - max_cells: quantidade máxima de células (as com mais pedidos)
+        Output: df com lat e lon do centro da célula e orders
+        """
+
+        clausula, params = filtro
+        sql = '''SELECT CAST((Delivery_location_latitude + 90) / ? AS INTEGER) AS linha,
+                        CAST((Delivery_location_longitude + 180) / ? AS INTEGER) AS coluna,
+                        COUNT(*) AS orders
+                 FROM {0} WHERE {1} GROUP BY linha, coluna ORDER BY orders DESC LIMIT ?'''.format( TABLE, clausula )
+        df_aux = self.query( sql, [cell_size, cell_size] + params + [max_cells] )
+
+        return pd.DataFrame( {'lat': ( df_aux['linha'] + 0.5 ) * cell_size - 90,
+                              'lon': ( df_aux['coluna'] + 0.5 ) * cell_size - 180,
+                              'orders': df_aux['orders']} )
+
+    @profiled( 'sql.overall_metrics' )
+    def overall_metrics( self, filtro ):
+        """
+        Esta função tem a responsabilidade de calcular as métricas gerais dos entregadores.
+        Input: filtro: (cláusula, parâmetros) do where
+        Output: dict com maior_idade, menor_idade, melhor_veic e pior_veic
+        """
+
+        clausula, params = filtro
+        sql = '''SELECT MAX(Delivery_person_Age) AS maior_idade, MIN(Delivery_person_Age) AS menor_idade,
+                        MAX(Vehicle_condition) AS melhor_veic, MIN(Vehicle_condition) AS pior_veic
+                 FROM {0} WHERE {1}'''.format( TABLE, clausula )
+
+        return self.query( sql, params ).iloc[0].to_dict()
+
+    @profiled( 'sql.avg_rating_per_deliver' )
+    def avg_rating_per_deliver( self, filtro ):
+        """
+        Esta função tem a responsabilidade de calcular a nota média de cada entregador.
+        Input: filtro: (cláusula, parâmetros) do where
+        Output: df com Delivery_person_ID e Delivery_person_Ratings
+        """
+
+        clausula, params = filtro
+        sql = '''SELECT Delivery_person_ID, AVG(Delivery_person_Ratings) AS Delivery_person_Ratings
+                 FROM {0} WHERE {1} GROUP BY Delivery_person_ID ORDER BY Delivery_person_ID'''.format( TABLE, clausula )
+
+        return self.query( sql, params )
+
+    @profiled( 'sql.faster_deliver' )
+    def faster_deliver( self, filtro, k=10, min_deliveries=1 ):
+        """
+        Esta função tem a responsabilidade de ranquear os entregadores de cada cidade pelo tempo médio (faster_deliver).
+        Input: - filtro: (cláusula, parâmetros) do where
+               - k: quantidade de entregadores por cidade
+               - min_deliveries: quantidade mínima de entregas do entregador
+        Output: (df_rapidos, df_lentos) com City, Delivery_person_ID, Time_taken(min) e count
+        """
+
+        clausula, params = filtro
+        sql = '''WITH s AS (SELECT City, Delivery_person_ID, AVG("Time_taken(min)") AS tempo, COUNT(*) AS count
+                            FROM {0} WHERE {1} GROUP BY City, Delivery_person_ID HAVING COUNT(*) >= ?),
+                      r AS (SELECT *, ROW_NUMBER() OVER (PARTITION BY City ORDER BY tempo, Delivery_person_ID) AS rapido,
+                                      ROW_NUMBER() OVER (PARTITION BY City ORDER BY tempo DESC, Delivery_person_ID) AS lento
+                            FROM s)
+                 SELECT City, Delivery_person_ID, tempo AS "Time_taken(min)", count, rapido, lento
+                 FROM r WHERE rapido <= ? OR lento <= ?'''.format( TABLE, clausula )
+        df_aux = self.query( sql, params + [min_deliveries, k, k] )
+
+        colunas = ['City', 'Delivery_person_ID', 'Time_taken(min)', 'count']
+        df_rapidos = ( df_aux.loc[df_aux['rapido'] <= k, :].sort_values( ['City', 'rapido'] )
+                             .loc[:, colunas].reset_index( drop=True ) )
+        df_lentos = ( df_aux.loc[df_aux['lento'] <= k, :].sort_values( ['City', 'lento'] )
+                            .loc[:, colunas].reset_index( drop=True ) )
+
+        return df_rapidos, df_lentos
+
+    @profiled( 'sql.time_quantiles' )
+    def time_quantiles( self, filtro ):
+        """
+        Esta função tem a responsabilidade de montar os sketches de quantis do tempo de entrega da seleção.
+        O banco só conta os tempos iguais por cidade, trânsito, clima e festival (o tempo é em minutos
+        inteiros); os percentis saem dos sketches, como no store.
+        Input: filtro: (cláusula, parâmetros) do where
+        Output: QuantileCube
+        """
+
+        clausula, params = filtro
+        dims = [col for col in QUANTILE_DIMS if col != 'Order_Date']
+        sql = '''SELECT {0}, "Time_taken(min)" AS valor, COUNT(*) AS n FROM {1}
+                 WHERE {2} AND "Time_taken(min)" IS NOT NULL GROUP BY {0}, valor'''.format(
+              ', '.join( _quote( col ) for col in dims ), TABLE, clausula )
+
+        return QuantileCube.from_counts( self.query( sql, params ), dims, 'valor', 'n' )
+
+    @profiled( 'sql.total_deliver' )
+    def total_deliver( self, filtro ):
+        """
+        Esta função tem a responsabilidade de contar os entregadores únicos da seleção.
+        Input: filtro: (cláusula, parâmetros) do where
+        Output: int
+        """
+
+        clausula, params = filtro
+        sql = 'SELECT COUNT(DISTINCT Delivery_person_ID) FROM {0} WHERE {1}'.format( TABLE, clausula )
+
+        return int( self._connection().execute( sql, params ).fetchone()[0] )
+
+@st.cache_resource( max_entries=2 )
+def _load_backend( path, mtime ):
+    """
+    Esta função tem a responsabilidade de abrir o backend uma única vez por versão do banco.
+    Input: - path: caminho absoluto do banco
+           - mtime: data de modificação do arquivo (chave do cache)
+    Output: SqlBackend
+    """
+
+    return SqlBackend( path )
+
+def load_backend( source=DATASET_PATH, path=SQLITE_PATH, batch_dir=BATCH_DIR ):
+    """
+    Esta função tem a responsabilidade de retornar o backend SQL quando ele está ligado e atualizado.
+    Com CURRY_BACKEND=sqlite e um banco gerado a partir da versão atual do csv, as páginas consultam o banco;
+    caso contrário (ou com o banco desatualizado), as páginas usam o store em memória.
+    Os lotes novos de batch_dir são inseridos no banco antes (sync_database), como o store faz em memória.
+    Input: - source: csv de origem
+           - path: arquivo do banco
+           - batch_dir: pasta com os lotes de pedidos novos
+    Output: SqlBackend ou None
+    """
+
+    if BACKEND != 'sqlite' or not is_current( source, path ):
+        return None
+
+    path = os.path.abspath( path )
+    sync_database( path, batch_dir )
+
+    return _load_backend( path, os.stat( path ).st_mtime_ns )
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Grava o csv limpo em um banco sqlite3 com índices.' )
+    parser.add_argument( 'path', nargs='?', default=DATASET_PATH )
+    parser.add_argument( '--out', default=SQLITE_PATH )
+    args = parser.parse_args()
+
+    print( build_database( read_dataset( args.path ), args.out, source=args.path ) )
@@ -0,0 +1,369 @@
+# =========================================
+# Imports
+# =========================================
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import streamlit as st
+
+from utils.columnar import HISTORY_DAYS, PARQUET_DIR, load_columnar, recent_history
+from utils.cube import build_cube, filter_cube, merge_cubes
+from utils.data import DATASET_PATH, compact_dataset, concat_compact, memory_report, read_dataset
+from utils.filters import FilterIndex, prepare_for_filters
+from utils.parallel import INGEST_WORKERS, read_dataset_parallel
+from utils.profiling import profiled
+from utils.sketches import QuantileCube, SketchCube
+
+logger = logging.getLogger( __name__ )
+
+# Pasta onde chegam os lotes novos de pedidos (mesmo formato do train.csv)
+BATCH_DIR = 'dataset/batches'
+
+# Checkpoint com o conteúdo (sha256) de cada lote já aplicado
+CHECKPOINT_FILE = '.checkpoint.json'
+
+# Stores do processo, um por versão do train.csv (as duas mais recentes). Fica fora do
+# st.cache_resource para ser compartilhado também com threads sem rerun (aquecimento).
+MAX_STORES = 2
+_stores = OrderedDict()
+_stores_lock = threading.Lock()
+
+# =========================================
+# Funções
+# =========================================
+
+def file_sha256( path, size=None ):
+    """
+    Esta função tem a responsabilidade de calcular o hash do conteúdo de um arquivo.
+    Input: - path
+           - size: bytes iniciais considerados (None = arquivo inteiro)
+    Output: sha256 em hexadecimal
+    """
+    
+    sha = hashlib.sha256()
+    restante = float( 'inf' ) if size is None else size
+    with open( path, 'rb' ) as arquivo:
+        while restante > 0:
+            bloco = arquivo.read( int( min( 1 << 20, restante ) ) )
+            if not bloco:
+                break
+            sha.update( bloco )
+            restante -= len( bloco )
+    
+    return sha.hexdigest()
+
+def read_appended( path, previous ):
+    """
+    Esta função tem a responsabilidade de ler só as linhas acrescentadas a um lote já aplicado.
+    Critérios:
+    1. O começo do arquivo tem que ser idêntico ao conteúdo aplicado antes (mesmo sha256 nos mesmos bytes)
+       e terminar em uma quebra de linha
+    2. As linhas depois desses bytes são lidas com o cabeçalho do arquivo
+    Input: - path: lote alterado
+           - previous: registro do checkpoint do conteúdo aplicado antes (sha256 e bytes)
+    Output: df1 limpo das linhas novas, ou None quando o arquivo não é o anterior com linhas no final
+    """
+    
+    tamanho = previous.get( 'bytes' )
+    if tamanho is None or os.path.getsize( path ) < tamanho or file_sha256( path, tamanho ) != previous['sha256']:
+        return None
+    
+    with open( path, 'rb' ) as arquivo:
+        cabecalho = arquivo.readline()
+        arquivo.seek( tamanho - 1 )
+        if arquivo.read( 1 ) != b'\n':
+            return None
+        resto = arquivo.read()
+    
+    return read_dataset( io.BytesIO( cabecalho + resto ) )
+
+class DeliveryStore:
+    """
+    Dataset limpo e agregados derivados, compartilhados por todas as sessões do processo.
+    Lotes novos são limpos e somados ao dataset e ao cubo sem reler o train.csv.
+    O dataset fica compacto (categorias e tipos menores) e ordenado por Order_Date, com o
+    FilterIndex dos filtros da barra lateral.
+    Os entregadores distintos ficam em sketches HyperLogLog por célula (SketchCube) e os
+    percentis do tempo de entrega em sketches de quantis por célula (QuantileCube).
+    O estado (df, cube, index, sketches, quantis) é sempre trocado de uma vez; as páginas leem pelo
+    snapshot(), pelo select(), pelo select_sketches() ou pelo select_quantiles().
+    Com batch_dir, o checkpoint da pasta de lotes é lido na criação (read_checkpoint).
+    """
+    
+    def __init__( self, df1, base_path, base_mtime, batch_dir=None ):
+        self.base = {'path': base_path, 'mtime': base_mtime}
+        self.version = 0
+        self.applied = {}
+        self.rejected = {}
+        df1 = prepare_for_filters( compact_dataset( df1 ) )
+        self._state = ( df1, build_cube( df1 ), FilterIndex( df1 ), SketchCube.build( df1 ), QuantileCube.build( df1 ) )
+        self._seen = {}
+        self._lock = threading.Lock()
+        if batch_dir is not None:
+            self.read_checkpoint( batch_dir )
+    
+    def base_identity( self ):
+        """
+        Esta função tem a responsabilidade de identificar o train.csv pelo conteúdo (sha256), não pela data:
+        copiar o arquivo, tocá-lo ou publicá-lo de novo não muda a identidade.
+        O hash é calculado uma vez por store.
+        Output: dict com path e sha256 (None quando o csv não pode ser lido)
+        """
+        
+        if 'sha256' not in self.base:
+            try:
+                self.base['sha256'] = file_sha256( self.base['path'] )
+            except OSError:
+                self.base['sha256'] = None
+        
+        return {'path': self.base['path'], 'sha256': self.base['sha256']}
+    
+    def read_checkpoint( self, batch_dir ):
+        """
+        Esta função tem a responsabilidade de retomar o checkpoint dos lotes de uma execução anterior.
+        Critérios:
+        1. O store começa só com o train.csv: os lotes do checkpoint estavam na memória do processo anterior
+           e são sempre aplicados de novo pelo sync (nenhum lote é considerado incorporado ao csv)
+        2. O train.csv é identificado pelo conteúdo (base_identity); quando o conteúdo mudou desde o
+           checkpoint, um aviso no log lembra que os lotes são aplicados de novo sobre o csv novo
+           (lotes já incorporados ao csv devem sair da pasta de lotes)
+        Input: batch_dir: pasta dos lotes
+        """
+        
+        path = os.path.join( batch_dir, CHECKPOINT_FILE )
+        try:
+            with open( path, encoding='utf-8' ) as arquivo:
+                checkpoint = json.load( arquivo )
+        except FileNotFoundError:
+            return
+        except ( OSError, ValueError ) as erro:
+            logger.warning( 'Checkpoint %s ignorado: %s', path, erro )
+            return
+        
+        lotes = len( checkpoint.get( 'batches', [] ) )
+        anterior = checkpoint.get( 'base', {} ).get( 'sha256' )
+        if lotes and anterior != self.base_identity()['sha256']:
+            logger.warning( 'O conteúdo do train.csv mudou desde o checkpoint (%s): os %d lotes registrados são '
+                            'aplicados de novo; lotes já incorporados ao csv devem sair de %s',
+                            checkpoint.get( 'base' ), lotes, batch_dir )
+    
+    def last_applied( self, name ):
+        """Registro do último conteúdo aplicado de um lote (pelo nome do arquivo), ou None."""
+        
+        registros = [dict( info, sha256=sha ) for sha, info in self.applied.items() if info['file'] == name]
+        
+        return registros[-1] if registros else None
+    
+    @property
+    def df( self ):
+        return self._state[0]
+    
+    @property
+    def cube( self ):
+        return self._state[1]
+    
+    @property
+    def cache_version( self ):
+        """Versão dos dados para chaves de cache: csv base (mtime) e lotes aplicados."""
+        
+        return ( self.base['mtime'], self.version )
+    
+    def snapshot( self ):
+        """
+        Esta função tem a responsabilidade de retornar o dataset e o cubo da mesma versão.
+        Output: (df1, df_cube), ambos somente leitura
+        """
+        
+        return self._state[:2]
+    
+    @profiled( 'store.select' )
+    def select( self, date_limit, traffic_options, weather_options=None ):
+        """
+        Esta função tem a responsabilidade de aplicar os filtros da barra lateral no dataset e no cubo.
+        Input: - date_limit: data limite (exclusiva)
+               - traffic_options: densidades de trânsito selecionadas
+               - weather_options: condições de clima selecionadas (None = sem filtro)
+        Output: (df1, df_cube) filtrados. Quando só a data restringe, df1 é uma fatia
+                do dataset compartilhado (sem cópia) e não deve ser alterado.
+        """
+        
+        df1, df_cube, index = self._state[:3]
+        linhas = index.select( date_limit, traffic_options, weather_options )
+        df1 = df1.iloc[linhas] if isinstance( linhas, slice ) else df1.take( linhas )
+        
+        return df1, filter_cube( df_cube, date_limit, traffic_options, weather_options )
+    
+    def select_sketches( self, date_limit, traffic_options, weather_options=None ):
+        """
+        Esta função tem a responsabilidade de aplicar os filtros da barra lateral nos sketches de entregadores.
+        Input: - date_limit, traffic_options, weather_options: filtros da barra lateral
+        Output: SketchCube com as células selecionadas
+        """
+        
+        return self._state[3].select( date_limit, traffic_options, weather_options )
+    
+    def select_quantiles( self, date_limit, traffic_options, weather_options=None ):
+        """
+        Esta função tem a responsabilidade de aplicar os filtros da barra lateral nos sketches de quantis.
+        Input: - date_limit, traffic_options, weather_options: filtros da barra lateral
+        Output: QuantileCube com as células selecionadas
+        """
+        
+        return self._state[4].select( date_limit, traffic_options, weather_options )
+    
+    def memory_report( self ):
+        """
+        Esta função tem a responsabilidade de mostrar a memória do dataset compartilhado, por coluna.
+        Output: df com coluna, tipo, MB e % do total
+        """
+        
+        return memory_report( self.df )
+    
+    def sync( self, batch_dir=BATCH_DIR ):
+        """
+        Esta função tem a responsabilidade de aplicar os lotes novos da pasta de lotes.
+        Critérios:
+        1. Arquivos já vistos (mesmo nome, tamanho e data) não são relidos
+        2. Arquivos novos são identificados pelo conteúdo (sha256): um lote copiado
+           com outro nome ou salvo de novo sem mudanças não é aplicado duas vezes
+        3. Cada lote novo é limpo com o read_dataset e somado ao dataset e ao cubo
+        4. Um lote já aplicado que mudou só é aceito se recebeu linhas no final: só elas são aplicadas
+           (read_appended). Qualquer outra alteração é recusada (rejected e aviso no log), sem aplicar nada
+        5. O checkpoint da pasta é regravado com os lotes aplicados
+        Input: batch_dir: pasta com os lotes (*.csv)
+        Output: quantidade de lotes aplicados nesta chamada
+        """
+        
+        if not os.path.isdir( batch_dir ):
+            return 0
+        
+        novos = []
+        for entrada in sorted( os.scandir( batch_dir ), key=lambda e: e.name ):
+            if not entrada.name.endswith( '.csv' ) or not entrada.is_file():
+                continue
+            stat = entrada.stat()
+            chave = ( entrada.name, stat.st_size, stat.st_mtime_ns )
+            if chave not in self._seen:
+                novos.append( ( chave, entrada.path ) )
+        
+        if not novos:
+            return 0
+        
+        with self._lock:
+            aplicados = 0
+            recusados = dict( self.rejected )
+            df1, df_cube, _, sketches, quantis = self._state
+            for chave, path in novos:
+                if chave in self._seen:
+                    continue
+                sha = file_sha256( path )
+                self._seen[chave] = sha
+                if sha in self.applied:
+                    self.rejected.pop( chave[0], None )
+                    continue
+                
+                anterior = self.last_applied( chave[0] )
+                if anterior is None:
+                    df_lote = read_dataset( path )
+                else:
+                    df_lote = read_appended( path, anterior )
+                    if df_lote is None:
+                        self.rejected[chave[0]] = ( 'o lote já foi aplicado e foi alterado (não só linhas novas no final); '
+                                                    'salve as linhas novas em outro arquivo' )
+                        logger.warning( 'Lote %s recusado: %s', path, self.rejected[chave[0]] )
+                        continue
+                self.rejected.pop( chave[0], None )
+                
+                df_lote = compact_dataset( df_lote )
+                df1 = concat_compact( df1, df_lote )
+                df_cube = merge_cubes( df_cube, build_cube( df_lote ) )
+                sketches = sketches.merge( SketchCube.build( df_lote, p=sketches.p ) )
+                quantis = quantis.merge( QuantileCube.build( df_lote, mapping=quantis.mapping ) )
+                self.applied[sha] = {'file': chave[0], 'rows': len( df_lote ), 'bytes': chave[1],
+                                     'applied_at': datetime.now().isoformat( timespec='seconds' )}
+                if anterior is not None:
+                    self.applied[sha]['appended_to'] = anterior['sha256']
+                aplicados += 1
+            
+            if aplicados:
+                df1 = prepare_for_filters( df1 )
+                self._state = ( df1, df_cube, FilterIndex( df1 ), sketches, quantis )
+                self.version += 1
+            if aplicados or self.rejected != recusados:
+                self.write_checkpoint( batch_dir )
+        
+        return aplicados
+    
+    def write_checkpoint( self, batch_dir ):
+        """
+        Esta função tem a responsabilidade de gravar o checkpoint dos lotes aplicados.
+        A gravação é atômica (arquivo temporário + os.replace).
+        Input: batch_dir: pasta dos lotes
+        """
+        
+        checkpoint = {'base': self.base_identity(),
+                      'batches': [dict( sha256=sha, **info ) for sha, info in self.applied.items()],
+                      'rejected': [{'file': nome, 'reason': motivo} for nome, motivo in self.rejected.items()]}
+        
+        path = os.path.join( batch_dir, CHECKPOINT_FILE )
+        with open( path + '.tmp', 'w', encoding='utf-8' ) as arquivo:
+            json.dump( checkpoint, arquivo, indent=2 )
+        os.replace( path + '.tmp', path )
+
+def _load_store( path, mtime, batch_dir=BATCH_DIR ):
+    """
+    Esta função tem a responsabilidade de criar o store uma única vez por versão do train.csv.
+    Quando o csv já foi convertido para Parquet (utils.columnar), lê as partições em vez do csv.
+    Com CURRY_HISTORY_DAYS, o store guarda só a janela de histórico (das partições, só os dias da janela são lidos).
+    Sessões e threads que pedem o store durante a carga esperam a mesma carga terminar.
+    Input: - path: caminho absoluto do csv
+           - mtime: data de modificação do arquivo (chave do cache)
+           - batch_dir: pasta dos lotes (checkpoint lido na criação do store)
+    Output: DeliveryStore
+    """
+    
+    with _stores_lock:
+        store = _stores.get( ( path, mtime ) )
+        if store is None:
+            df1 = load_columnar( path, PARQUET_DIR, HISTORY_DAYS )
+            if df1 is None:
+                df1 = recent_history( read_dataset_parallel( path, workers=INGEST_WORKERS ), HISTORY_DAYS )
+            store = DeliveryStore( df1, path, mtime, batch_dir )
+            _stores[( path, mtime )] = store
+            while len( _stores ) > MAX_STORES:
+                _stores.popitem( last=False )
+    
+    return store
+
+@profiled()
+def load_store( path=DATASET_PATH, batch_dir=BATCH_DIR, spinner=True ):
+    """
+    Esta função tem a responsabilidade de retornar o store do processo com os lotes novos já aplicados.
+    Trocar o train.csv recria o store; lotes novos na pasta batch_dir são aplicados incrementalmente.
+    Input: - path: caminho do csv base
+           - batch_dir: pasta com os lotes de pedidos novos
+           - spinner: mostra o aviso de carga na página (False fora de um rerun)
+    Output: DeliveryStore
+    """
+    
+    path = os.path.abspath( path )
+    mtime = os.stat( path ).st_mtime_ns
+    
+    if spinner and ( path, mtime ) not in _stores:
+        with st.spinner( 'Agregando dados...' ):
+            store = _load_store( path, mtime, batch_dir )
+    else:
+        store = _load_store( path, mtime, batch_dir )
+    store.sync( batch_dir )
+    
+    if spinner:
+        for nome, motivo in store.rejected.items():
+            st.warning( 'Lote {} não aplicado: {}'.format( nome, motivo ) )
+    
+    return store
@@ -0,0 +1,269 @@
+# =========================================
+# Imports
+# =========================================
+import argparse
+import os
+import sys
+
+# Pico de memória pelo getrusage: só existe em sistemas POSIX (no Windows, psutil opcional)
+try:
+    import resource
+except ImportError:
+    resource = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+import pandas as pd
+
+from utils.cube import build_cube, merge_cubes, rollup
+from utils.data import add_derived_columns, clean_typed, read_options
+from utils.downsample import week_start
+from utils.sketches import HyperLogLog
+
+# Linhas lidas para estimar a memória de cada linha
+SAMPLE_ROWS = 20_000
+
+# Cópias de um bloco vivas ao mesmo tempo durante leitura + limpeza + agregação
+WORKING_COPIES = 4
+
+MIN_CHUNK_ROWS = 5_000
+
+# Estatísticas por entregador somadas entre blocos
+COURIER_KEYS = ['City', 'Delivery_person_ID']
+
+# =========================================
+# Funções
+# =========================================
+
+def peak_rss_mb():
+    """
+    Esta função tem a responsabilidade de medir o pico de memória residente do processo (MB).
+    Critérios:
+    1. Em sistemas POSIX, o ru_maxrss do getrusage (KB no Linux, bytes no macOS)
+    2. Sem o módulo resource (Windows), o pico do psutil quando instalado
+    Output: float ou None (memória indisponível)
+    """
+    
+    if resource is not None:
+        pico = resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss
+        return pico / 1024 ** 2 if sys.platform == 'darwin' else pico / 1024
+    
+    if psutil is not None:
+        memoria = psutil.Process().memory_info()
+        return getattr( memoria, 'peak_wset', memoria.rss ) / 1024 ** 2
+    
+    return None
+
+def chunk_rows_for_budget( path, memory_budget_mb ):
+    """
+    Esta função tem a responsabilidade de escolher o tamanho do bloco para um orçamento de memória.
+    Critérios:
+    1. Lê uma amostra com o esquema e mede a memória por linha já limpa
+    2. Reserva a memória já usada pelo processo e WORKING_COPIES cópias do bloco
+    Input: - path: csv
+           - memory_budget_mb: pico de RSS desejado (MB)
+    Output: linhas por bloco
+    """
+    
+    amostra = add_derived_columns( clean_typed( pd.read_csv( path, nrows=SAMPLE_ROWS, **read_options() ) ) )
+    bytes_por_linha = amostra.memory_usage( deep=True ).sum() / max( len( amostra ), 1 )
+    
+    livre = ( memory_budget_mb - ( peak_rss_mb() or 0.0 ) ) * 1024 ** 2
+    
+    return max( MIN_CHUNK_ROWS, int( livre / ( bytes_por_linha * WORKING_COPIES ) ) )
+
+def read_chunks( path, chunk_rows ):
+    """
+    Esta função tem a responsabilidade de ler e limpar o csv bloco a bloco.
+    Input: - path: csv
+           - chunk_rows: linhas por bloco
+    Output: gerador de blocos limpos (mesmo resultado do read_dataset, em partes)
+    """
+    
+    with pd.read_csv( path, chunksize=chunk_rows, **read_options() ) as leitor:
+        for bloco in leitor:
+            yield add_derived_columns( clean_typed( bloco ) )
+
+def courier_stats( df1 ):
+    """
+    Esta função tem a responsabilidade de resumir os pedidos por entregador em estatísticas somáveis.
+    Input: df1 limpo (um bloco)
+    Output: df indexado por COURIER_KEYS
+    """
+    
+    df_aux = df1.assign( time_sumsq=df1['Time_taken(min)'] ** 2 )
+    grupos = df_aux.groupby( COURIER_KEYS, observed=True )
+    
+    return grupos.agg( orders=( 'Time_taken(min)', 'size' ),
+                       time_sum=( 'Time_taken(min)', 'sum' ),
+                       time_sumsq=( 'time_sumsq', 'sum' ),
+                       ratings_n=( 'Delivery_person_Ratings', 'count' ),
+                       ratings_sum=( 'Delivery_person_Ratings', 'sum' ),
+                       age_min=( 'Delivery_person_Age', 'min' ),
+                       age_max=( 'Delivery_person_Age', 'max' ),
+                       vehicle_min=( 'Vehicle_condition', 'min' ),
+                       vehicle_max=( 'Vehicle_condition', 'max' ) )
+
+def merge_courier_stats( df_a, df_b ):
+    """
+    Esta função tem a responsabilidade de juntar as estatísticas por entregador de dois blocos.
+    Somas são somadas; mínimos e máximos são combinados.
+    """
+    
+    regras = {col: 'sum' for col in df_a.columns}
+    regras.update( age_min='min', vehicle_min='min', age_max='max', vehicle_max='max' )
+    
+    return pd.concat( [df_a, df_b] ).groupby( level=COURIER_KEYS ).agg( regras )
+
+class PartialAggregates:
+    """
+    Agregados parciais que podem ser combinados entre blocos (ou entre processos):
+    - cube: o mesmo cubo das páginas (quantidade, média e m2 por célula)
+    - couriers: estatísticas por (City, Delivery_person_ID)
+    - weekly_couriers / couriers_hll: entregadores distintos por semana e no total (HyperLogLog)
+    """
+    
+    def __init__( self ):
+        self.rows = 0
+        self.cube = None
+        self.couriers = None
+        self.weekly_couriers = {}
+        self.couriers_hll = HyperLogLog()
+    
+    def update( self, df1 ):
+        """Soma um bloco limpo aos agregados."""
+        
+        self.rows += len( df1 )
+        df_cube = build_cube( df1 )
+        df_couriers = courier_stats( df1 )
+        self.cube = df_cube if self.cube is None else merge_cubes( self.cube, df_cube )
+        self.couriers = df_couriers if self.couriers is None else merge_courier_stats( self.couriers, df_couriers )
+        
+        semanas = week_start( df1['Order_Date'] )
+        for semana, ids in df1['Delivery_person_ID'].groupby( semanas ):
+            self.weekly_couriers.setdefault( semana, HyperLogLog() ).add( ids.to_numpy() )
+        self.couriers_hll.add( df1['Delivery_person_ID'].to_numpy() )
+        
+        return self
+    
+    def merge( self, other ):
+        """Combina com os agregados de outra parte do arquivo."""
+        
+        if other.cube is None:
+            return self
+        if self.cube is None:
+            self.cube, self.couriers = other.cube, other.couriers
+        else:
+            self.cube = merge_cubes( self.cube, other.cube )
+            self.couriers = merge_courier_stats( self.couriers, other.couriers )
+        
+        self.rows += other.rows
+        for semana, sketch in other.weekly_couriers.items():
+            self.weekly_couriers.setdefault( semana, HyperLogLog() ).merge( sketch )
+        self.couriers_hll.merge( other.couriers_hll )
+        
+        return self
+
+def stream_aggregates( path, memory_budget_mb=512, chunk_rows=None ):
+    """
+    Esta função tem a responsabilidade de montar os agregados de um csv maior que a memória.
+    Input: - path: csv no formato do train.csv
+           - memory_budget_mb: pico de RSS desejado (usado quando chunk_rows não é informado)
+           - chunk_rows: linhas por bloco (opcional)
+    Output: PartialAggregates
+    """
+    
+    if chunk_rows is None:
+        chunk_rows = chunk_rows_for_budget( path, memory_budget_mb )
+    
+    agregados = PartialAggregates()
+    for bloco in read_chunks( path, chunk_rows ):
+        agregados.update( bloco )
+    
+    return agregados
+
+# =========================================
+# Visões a partir dos agregados
+# =========================================
+
+def company_view( agregados ):
+    """
+    Esta função tem a responsabilidade de montar as tabelas da Visão Empresa a partir dos agregados.
+    Output: dict de dataframes
+    """
+    
+    df_cube = agregados.cube
+    by_week = rollup( df_cube, ['Order_Date'] )
+    by_week['week_of_year'] = week_start( by_week['Order_Date'] )
+    by_week = by_week.groupby( 'week_of_year' )['orders'].sum().reset_index()
+    by_week['couriers'] = by_week['week_of_year'].map( lambda semana: agregados.weekly_couriers[semana].count() )
+    by_week['order_by_deliver'] = by_week['orders'] / by_week['couriers']
+    
+    return {'orders_by_day': rollup( df_cube, ['Order_Date'] ),
+            'orders_by_traffic': rollup( df_cube, ['Road_traffic_density'] ),
+            'orders_by_city_traffic': rollup( df_cube, ['City', 'Road_traffic_density'] ),
+            'orders_by_week': by_week}
+
+def courier_view( agregados, k=10 ):
+    """
+    Esta função tem a responsabilidade de montar as tabelas da Visão Entregadores a partir dos agregados.
+    Output: dict de dataframes
+    """
+    
+    df_couriers = agregados.couriers.reset_index()
+    df_couriers['time_mean'] = df_couriers['time_sum'] / df_couriers['orders']
+    df_couriers['ratings_mean'] = df_couriers['ratings_sum'] / df_couriers['ratings_n']
+    
+    ranking = df_couriers.sort_values( ['City', 'time_mean'] ).loc[:, COURIER_KEYS + ['time_mean']]
+    
+    return {'overall': pd.DataFrame( [{'age_max': df_couriers['age_max'].max(), 'age_min': df_couriers['age_min'].min(),
+                                       'vehicle_max': df_couriers['vehicle_max'].max(), 'vehicle_min': df_couriers['vehicle_min'].min()}] ),
+            'ratings_by_courier': df_couriers.loc[:, ['Delivery_person_ID', 'ratings_mean']],
+            'ratings_by_traffic': rollup( agregados.cube, ['Road_traffic_density'], 'Delivery_person_Ratings' ),
+            'ratings_by_weather': rollup( agregados.cube, ['Weatherconditions'], 'Delivery_person_Ratings' ),
+            'fastest': ranking.groupby( 'City' ).head( k ),
+            'slowest': ranking.iloc[::-1].groupby( 'City' ).head( k )}
+
+def restaurant_view( agregados ):
+    """
+    Esta função tem a responsabilidade de montar as tabelas da Visão Restaurantes a partir dos agregados.
+    Output: dict de dataframes
+    """
+    
+    df_cube = agregados.cube
+    df_distance = rollup( df_cube, ['City'], 'Distance' )
+    
+    return {'overall': pd.DataFrame( [{'couriers': agregados.couriers_hll.count(),
+                                       'avg_distance': df_distance['sum'].sum() / df_distance['orders'].sum()}] ),
+            'time_by_festival': rollup( df_cube, ['Festival'], 'Time_taken(min)' ),
+            'time_by_city': rollup( df_cube, ['City'], 'Time_taken(min)' ),
+            'time_by_city_order': rollup( df_cube, ['City', 'Type_of_order'], 'Time_taken(min)' ),
+            'time_by_city_traffic': rollup( df_cube, ['City', 'Road_traffic_density'], 'Time_taken(min)' ),
+            'distance_by_city': df_distance}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Monta as visões a partir de um csv lido em blocos.' )
+    parser.add_argument( 'path' )
+    parser.add_argument( '--budget-mb', type=int, default=512 )
+    parser.add_argument( '--chunk-rows', type=int, default=None )
+    parser.add_argument( '--out', default=None, help='pasta para salvar as tabelas em csv' )
+    args = parser.parse_args()
+    
+    agregados = stream_aggregates( args.path, args.budget_mb, args.chunk_rows )
+    visoes = {'empresa': company_view( agregados ),
+              'entregadores': courier_view( agregados ),
+              'restaurantes': restaurant_view( agregados )}
+    
+    for visao, tabelas in visoes.items():
+        for nome, tabela in tabelas.items():
+            if args.out:
+                os.makedirs( os.path.join( args.out, visao ), exist_ok=True )
+                tabela.to_csv( os.path.join( args.out, visao, nome + '.csv' ), index=False )
+            else:
+                print( '== {} / {} ==\n{}\n'.format( visao, nome, tabela.head().to_string() ) )
+    
+    pico = peak_rss_mb()
+    print( 'linhas: {} | pico de RSS: {} (orçamento {} MB)'.format(
+           agregados.rows, 'indisponível' if pico is None else '{:.0f} MB'.format( pico ), args.budget_mb ) )
@@ -0,0 +1,346 @@
+# =========================================
+# Imports
+# =========================================
+import pandas as pd
+import plotly.express as px
+import folium
+from folium.plugins import HeatMap
+
+from utils.cube import fallback, rollup
+from utils.downsample import downsample_line, resample_counts, week_start
+from utils.geo import GRID_LEVELS, bin_locations
+from utils.profiling import profiled
+from utils.sketches import DISTINCT_MODE
+from utils.sql import SqlBackend
+
+# =========================================
+# Funções
+# =========================================
+
+@profiled()
+def order_metric( df_cube, full_resolution=False ):
+    """Esta função tem a responsabilidade de criar gráfico de barras
+    # Critérios do gráfico:
+    # 1. Contar os pedidos por Data do Pedido
+    # 2. Períodos longos passam para semana ou mês, dentro do orçamento de pontos (utils.downsample)
+    # Input: df_cube (cubo filtrado) e full_resolution (True = um ponto por dia)
+    # Output: Figura do gráfico
+    """
+    
+    # Agrupamento das células do cubo por data
+    df_aux = rollup( df_cube, ['Order_Date'] ).rename( columns={'orders': 'ID'} )
+    df_aux, resolucao = resample_counts( df_aux, 'Order_Date', 'ID', full_resolution=full_resolution )
+
+    # Desenhar o gráfico de barras
+    fig = px.bar(df_aux, x='Order_Date', y='ID')
+    if resolucao != 'dia':
+        fig.update_layout( xaxis_title='Order_Date (por {})'.format( resolucao ) )
+
+    return fig
+
+@profiled()
+def traffic_order_share ( df_cube ): 
+    """
+    Esta função tem a responsabilidade de criar gráfico de pizza
+    Critérios do gráfico:
+    1. Contar os pedidos por Densidade do Tráfico
+    Input: df_cube (cubo filtrado)
+    Output: Figura do gráfico
+    """
+    
+    # Agrupamento das células do cubo
+    df_aux = rollup( df_cube, ['Road_traffic_density'] ).rename( columns={'orders': 'ID'} )
+    
+    # Transformando em %
+    df_aux['entregas_perc'] = df_aux['ID'] / df_aux['ID'].sum()
+    
+    # Desenhar o gráfico de pizza
+    fig = px.pie(df_aux, values='entregas_perc', names='Road_traffic_density')
+
+    return fig
+
+@profiled()
+def traffic_order_city( df_cube ): 
+    """
+    Esta função tem a responsabilidade de criar gráfico de pizza
+    Critérios do gráfico:
+    1. Contar os pedidos por Densidade do Tráfico e Cidade
+    Input: df_cube (cubo filtrado)
+    Output: Figura do gráfico
+    """
+    
+    #Agrupamento das células do cubo
+    df_aux = rollup( df_cube, ['City', 'Road_traffic_density'] ).rename( columns={'orders': 'ID'} )
+    
+    # Desenhar o gráfico de bolhas
+    fig = px.scatter(df_aux, x='City', y='Road_traffic_density', size='ID', color='City')
+
+    return fig
+
+@profiled()
+def order_by_week( df_cube, full_resolution=False ):
+    """
+    Esta função tem a responsabilidade de criar gráfico de linha
+    Critérios do gráfico:
+    1. Consolidar os pedidos por dia no cubo
+    2. Criar a coluna da semana (domingo em que começa, utils.downsample.week_start) e somar os pedidos por semana
+    3. Acima do orçamento de pontos, a linha é reduzida com o LTTB (utils.downsample)
+    Input: df_cube (cubo filtrado) e full_resolution (True = todos os pontos)
+    Output: Figura do gráfico
+    """
+    
+    # Pedidos por dia e coluna de semana
+    df_aux = rollup( df_cube, ['Order_Date'] )
+    df_aux['week_of_year'] = week_start( df_aux['Order_Date'] )
+    
+    # Agrupar por semana
+    df_aux = ( df_aux.loc[:, ['orders', 'week_of_year']]
+                     .groupby('week_of_year')
+                     .sum()
+                     .reset_index()
+                     .rename( columns={'orders': 'ID'} ) )
+    df_aux = downsample_line( df_aux, 'week_of_year', 'ID', full_resolution=full_resolution )
+    
+    # Desenhar o gráfico de linhas 
+    fig = px.line(df_aux, x='week_of_year', y='ID')
+
+    return fig
+
+@profiled()
+def order_share_by_week( df1, full_resolution=False ): 
+    """
+    Esta função tem a responsabilidade de criar gráfico de linha
+    Critérios do gráfico:
+    1. df1 conta pedidos e entregadores únicos por semana (week_start)
+    2. Entregadores únicos não cabem no cubo: a consulta usa as linhas brutas
+    Input: df1 e full_resolution (True = todos os pontos)
+    Output: Figura do gráfico
+    """
+    
+    df1 = fallback( df1, 'order_share_by_week' )
+    week_of_year = week_start( df1['Order_Date'] ).rename('week_of_year')
+    
+    # Agrupamento por linhas - Pedidos por Semana
+    df_aux1 = ( df1.groupby(week_of_year)
+                   .size()
+                   .rename('ID')
+                   .reset_index() )
+    
+    # Agrupamento por linhas e colunas - Entregador por Semana
+    df_aux2 = ( df1.loc[:, ['Delivery_person_ID']]
+                   .groupby(week_of_year)
+                   .nunique()
+                   .reset_index() )
+    
+    # Juntar 2 df
+    df_aux = pd.merge(df_aux1, df_aux2, how='inner')
+    
+    return order_share_figure( df_aux, full_resolution )
+
+@profiled()
+def week_share_sketches( df_cube, sketches ):
+    """
+    Esta função tem a responsabilidade de contar pedidos e entregadores distintos por semana sem as linhas brutas.
+    Critérios:
+    1. Pedidos por semana: soma das células do cubo
+    2. Entregadores distintos por semana: junção dos sketches HyperLogLog das células da semana
+       (estimativa, erro padrão de utils.sketches.error_bound)
+    Input: - df_cube: cubo filtrado
+           - sketches: SketchCube filtrado (store.select_sketches)
+    Output: df com week_of_year, ID e Delivery_person_ID, como o order_share_by_week
+    """
+    
+    df_aux = rollup( df_cube, ['Order_Date'] )
+    df_aux = ( df_aux.groupby( week_start( df_aux['Order_Date'] ).rename('week_of_year') )['orders']
+                     .sum()
+                     .rename('ID')
+                     .reset_index() )
+    
+    distintos = sketches.count_by( week_start( sketches.keys['Order_Date'] ) ).round()
+    df_aux['Delivery_person_ID'] = df_aux['week_of_year'].map( distintos )
+    
+    return df_aux
+
+def order_share_figure( df_aux, full_resolution=False ):
+    """
+    Esta função tem a responsabilidade de desenhar as entregas por entregador em cada semana.
+    Acima do orçamento de pontos, a linha é reduzida com o LTTB (utils.downsample).
+    Input: - df_aux com week_of_year, ID (pedidos) e Delivery_person_ID (entregadores únicos)
+           - full_resolution: True = todos os pontos
+    Output: Figura do gráfico
+    """
+    
+    # Crio outra coluna com quantas entregas ('ID') tenho por entregador ('Delivery_person_ID')
+    df_aux['order_by_deliver'] = df_aux['ID'] / df_aux['Delivery_person_ID'] 
+    df_aux = downsample_line( df_aux, 'week_of_year', 'order_by_deliver', full_resolution=full_resolution )
+    
+    # Desenhar gráfico de linhas
+    fig = px.line(df_aux, x='week_of_year', y='order_by_deliver')
+
+    return fig
+
+@profiled()
+def country_maps( df1 ):
+    """
+    Esta função tem a responsabilidade de criar o mapa
+    Critérios do gráfico:
+    1. Selecionr colunas relevantes (mediana: consulta nas linhas brutas)
+    2. Roda um for colocando um marker referente a latitude e longitude de cada linha
+    Input: df1
+    Output: Mapa (folium.Map)
+    """
+    
+    return locations_map( median_locations( df1 ) )
+
+def median_locations( df1 ):
+    """
+    Esta função tem a responsabilidade de calcular a mediana dos locais de entrega por cidade e tráfego.
+    Input: df1
+    Output: df com City, Road_traffic_density e as medianas de latitude e longitude
+    """
+    
+    df1 = fallback( df1, 'country_maps' )
+    cols = ['City', 'Road_traffic_density', 'Delivery_location_latitude', 'Delivery_location_longitude']
+    df_aux = ( df1.loc[:, cols]
+                  .groupby(['City', 'Road_traffic_density'], observed=True)
+                  .median()
+                  .reset_index() )
+    
+    return df_aux
+
+def locations_map( df_aux ):
+    """
+    Esta função tem a responsabilidade de desenhar um marcador por cidade e tráfego.
+    Input: df_aux com City, Road_traffic_density e as medianas de latitude e longitude
+    Output: Mapa (folium.Map)
+    """
+    
+    # Cria o mapa mundial
+    map = folium.Map()
+    
+    # Coloca os pontos de latitude/longitude no mapa
+    for index, location_info in df_aux.iterrows():
+        folium.Marker( [location_info['Delivery_location_latitude'],
+                        location_info['Delivery_location_longitude']],
+                        popup=location_info[['City', 'Road_traffic_density']] ).add_to(map)
+    
+    return map
+
+@profiled()
+def density_map( df_bins ):
+    """
+    Esta função tem a responsabilidade de criar o mapa de densidade das entregas
+    Critérios do gráfico:
+    1. Uma camada de calor com um ponto por célula da grade, com peso igual à quantidade de pedidos
+    2. A quantidade de células é limitada (MAX_CELLS), então o mapa não cresce com os pedidos
+    Input: df_bins: células da grade
+    Output: Mapa (folium.Map)
+    """
+    
+    map = folium.Map()
+    
+    if len( df_bins ) > 0:
+        HeatMap( df_bins.loc[:, ['lat', 'lon', 'orders']].to_numpy().tolist() ).add_to(map)
+        map.fit_bounds( [[df_bins['lat'].min(), df_bins['lon'].min()], 
+                         [df_bins['lat'].max(), df_bins['lon'].max()]] )
+    
+    return map
+
+@profiled()
+def map_html( map ):
+    """
+    Esta função tem a responsabilidade de gerar o HTML do mapa uma única vez.
+    É o mesmo HTML que o folium_static monta a cada rerun; guardado no cache de resultados,
+    a página só envia o texto pronto (components.html).
+    Input: map: folium.Map
+    Output: str com o HTML
+    """
+    
+    return folium.Figure().add_child( map ).render()
+
+@profiled()
+def density_results( source, date_limit, traffic_options, weather_options=None, level=6 ):
+    """
+    Esta função tem a responsabilidade de montar o mapa de densidade de uma seleção.
+    Critérios:
+    1. Seleciona as linhas com os filtros da barra lateral
+    2. Conta os pedidos por célula da grade do nível de zoom escolhido (no banco, em SQL)
+    Input: - source: store em memória ou banco (SqlBackend)
+           - date_limit, traffic_options: filtros da barra lateral
+           - weather_options: não usado (a página não filtra por clima)
+           - level: nível de zoom (chave de GRID_LEVELS)
+    Output: str com o HTML do mapa
+    """
+    
+    if isinstance( source, SqlBackend ):
+        df_bins = source.density_bins( source.where( date_limit, list( traffic_options ) ), GRID_LEVELS[level] )
+    else:
+        df1, _ = source.select( date_limit, list( traffic_options ) )
+        df_bins = bin_locations( df1['Delivery_location_latitude'], df1['Delivery_location_longitude'], GRID_LEVELS[level] )
+    
+    return map_html( density_map( df_bins ) )
+
+@profiled()
+def managerial_results( source, date_limit, traffic_options, weather_options=None, full_resolution=False ):
+    """
+    Esta função tem a responsabilidade de calcular a seção Visão Gerencial para uma seleção.
+    Input: - source: store em memória ou banco (SqlBackend)
+           - date_limit, traffic_options: filtros da barra lateral
+           - weather_options: não usado (a página não filtra por clima)
+           - full_resolution: pedidos por dia sem reduzir ao orçamento de pontos
+    Output: dict com as figuras da seção
+    """
+    
+    _, df_cube = source.select( date_limit, list( traffic_options ) )
+    
+    return {'order_metric': order_metric( df_cube, full_resolution ),
+            'traffic_order_share': traffic_order_share( df_cube ),
+            'traffic_order_city': traffic_order_city( df_cube )}
+
+@profiled()
+def tactical_results( source, date_limit, traffic_options, weather_options=None, full_resolution=False ):
+    """
+    Esta função tem a responsabilidade de calcular a seção Visão Tática (séries semanais) para uma seleção.
+    Input: - source: store em memória ou banco (SqlBackend)
+           - date_limit, traffic_options: filtros da barra lateral
+           - weather_options: não usado (a página não filtra por clima)
+           - full_resolution: linhas sem reduzir ao orçamento de pontos
+    Output: dict com as figuras da seção
+    """
+    
+    df1, df_cube = source.select( date_limit, list( traffic_options ) )
+    
+    if isinstance( source, SqlBackend ):
+        order_share = order_share_figure( source.week_share( df1 ), full_resolution )
+    elif DISTINCT_MODE == 'exact':
+        order_share = order_share_by_week( df1, full_resolution )
+    else:
+        sketches = source.select_sketches( date_limit, list( traffic_options ) )
+        order_share = order_share_figure( week_share_sketches( df_cube, sketches ), full_resolution )
+    
+    return {'order_by_week': order_by_week( df_cube, full_resolution ),
+            'order_share_by_week': order_share}
+
+@profiled()
+def geographic_results( source, date_limit, traffic_options, weather_options=None ):
+    """
+    Esta função tem a responsabilidade de calcular o mapa por cidade e tráfego da seção Visão Geográfica.
+    O mapa de densidade depende do zoom e tem a sua própria entrada no cache (density_results).
+    Input: - source: store em memória ou banco (SqlBackend)
+           - date_limit, traffic_options: filtros da barra lateral
+           - weather_options: não usado (a página não filtra por clima)
+    Output: dict com o HTML do mapa
+    """
+    
+    if isinstance( source, SqlBackend ):
+        df_aux = source.locations( source.where( date_limit, list( traffic_options ) ) )
+    else:
+        df1, _ = source.select( date_limit, list( traffic_options ) )
+        df_aux = median_locations( df1 )
+    
+    return {'locations_map': map_html( locations_map( df_aux ) )}
+
+# Seções da página: cada uma é calculada só quando está aberta, com a sua entrada no cache de resultados
+SECTIONS = {'Visão Gerencial': ( 'visao_empresa.gerencial', managerial_results ),
+            'Visão Tática': ( 'visao_empresa.tatica', tactical_results ),
+            'Visão Geográfica': ( 'visao_empresa.geografica', geographic_results )}
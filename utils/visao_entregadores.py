@@ -0,0 +1,128 @@
+# =========================================
+# Imports
+# =========================================
+from utils.cube import multi_rollup
+from utils.ranking import top_bottom_k
+from utils.profiling import profiled
+from utils.sql import SqlBackend
+
+# Agrupamentos das notas (tráfego e clima), calculados em uma única agregação
+RATING_GROUPINGS = {'Road_traffic_density': ['Road_traffic_density'], 
+                    'Weatherconditions': ['Weatherconditions']}
+
+# =========================================
+# Funções
+# =========================================
+
+@profiled()
+def rating_by_traffic_weather ( stats, col ):
+    """
+    Esta função tem a responsabilidade de retornar um dataframe contendo a média e desvio padrão das notas dos entregadores.
+    Critérios:
+    1. Média e desvio padrão de notas por tráfego
+    2. Média e desvio padrão de notas por condições climáticas
+    Input: stats (multi_rollup das notas por tráfego e por clima) e coluna (por tráfico ou por clima)
+    Output: df com os resultados
+    """
+        
+    df_avg_std_per_traffic_weather = ( stats[col].loc[:, [col, 'Delivery_person_Ratings_mean', 'Delivery_person_Ratings_std']]
+                                                 .rename( columns={'Delivery_person_Ratings_mean': 'mean', 
+                                                                   'Delivery_person_Ratings_std': 'std'} ) )
+    return df_avg_std_per_traffic_weather
+
+@profiled()
+def faster_deliver ( df1, k=10, min_deliveries=1 ):
+    """
+    Esta função tem a responsabilidade de retornar os k entregadores mais rápidos e mais lentos por cidade.
+    Critérios:
+    1. Tempo médio de entrega por cidade e entregador
+    2. Só entram entregadores com pelo menos min_deliveries entregas
+    3. As duas pontas de cada cidade saem da mesma passada (utils.ranking.top_bottom_k)
+    Input: - df1: dataframe com os dados a serem calculados 
+           - k: quantidade de entregadores por cidade
+           - min_deliveries: quantidade mínima de entregas do entregador
+    Output: - (df_rapidos, df_lentos): dataframes com os resultados calculados
+    """   
+    
+    df_rapidos, df_lentos = top_bottom_k( df1, 'City', 'Delivery_person_ID', 'Time_taken(min)', 
+                                          k=k, min_count=min_deliveries )
+    
+    return df_rapidos, df_lentos
+
+@profiled()
+def overall_metrics( df1 ):
+    """
+    Esta função tem a responsabilidade de calcular as métricas gerais dos entregadores.
+    Input: df1
+    Output: dict com maior_idade, menor_idade, melhor_veic e pior_veic (as mesmas chaves do banco)
+    """
+    
+    return {'maior_idade': df1.loc[:, 'Delivery_person_Age'].max(),
+            'menor_idade': df1.loc[:, 'Delivery_person_Age'].min(),
+            'melhor_veic': df1['Vehicle_condition'].max(),
+            'pior_veic': df1['Vehicle_condition'].min()}
+
+@profiled()
+def avg_rating_per_deliver( df1 ):
+    """
+    Esta função tem a responsabilidade de calcular a avaliação média de cada entregador.
+    Input: df1
+    Output: df com Delivery_person_ID e Delivery_person_Ratings
+    """
+    
+    df_avg_rating_per_deliver = ( df1.loc[:, ['Delivery_person_Ratings', 'Delivery_person_ID']]
+                                     .groupby(['Delivery_person_ID'], observed=True)
+                                     .mean()
+                                     .reset_index() )
+    
+    return df_avg_rating_per_deliver
+
+@profiled()
+def faster_results( source, date_limit, traffic_options, weather_options=None, min_deliveries=1 ):
+    """
+    Esta função tem a responsabilidade de calcular só o ranking de velocidade de uma seleção
+    (usado quando o mínimo de entregas sai do padrão).
+    Input: - source: store em memória ou banco (SqlBackend)
+           - date_limit, traffic_options, weather_options: filtros da barra lateral
+           - min_deliveries: mínimo de entregas por entregador
+    Output: (df_rapidos, df_lentos)
+    """
+    
+    if isinstance( source, SqlBackend ):
+        return source.faster_deliver( source.where( date_limit, list( traffic_options ), weather_options ), 
+                                      k=10, min_deliveries=min_deliveries )
+    
+    df1, _ = source.select( date_limit, list( traffic_options ), weather_options )
+    
+    return faster_deliver( df1, k=10, min_deliveries=min_deliveries )
+
+@profiled()
+def page_results( source, date_limit, traffic_options, weather_options=None ):
+    """
+    Esta função tem a responsabilidade de calcular tudo o que a Visão Entregadores mostra para uma seleção.
+    O ranking de velocidade sai com o mínimo de entregas padrão (1).
+    Input: - source: store em memória ou banco (SqlBackend)
+           - date_limit, traffic_options, weather_options: filtros da barra lateral
+    Output: dict com as métricas, as tabelas de avaliação e o ranking de velocidade
+    """
+    
+    df1, df_cube = source.select( date_limit, list( traffic_options ), weather_options )
+    db = source if isinstance( source, SqlBackend ) else None
+    
+    # Notas por tráfego e por clima em uma única agregação
+    stats = multi_rollup( df_cube, RATING_GROUPINGS, ['Delivery_person_Ratings'] )
+    
+    if db is None:
+        resultados = {'overall': overall_metrics( df1 ),
+                      'avg_rating_per_deliver': avg_rating_per_deliver( df1 ),
+                      'faster_deliver': faster_deliver( df1, k=10 )}
+    else:
+        # No banco, as quatro métricas saem de uma única consulta
+        resultados = {'overall': db.overall_metrics( df1 ),
+                      'avg_rating_per_deliver': db.avg_rating_per_deliver( df1 ),
+                      'faster_deliver': db.faster_deliver( df1, k=10 )}
+    
+    resultados['rating_by_traffic'] = rating_by_traffic_weather( stats, 'Road_traffic_density' )
+    resultados['rating_by_weather'] = rating_by_traffic_weather( stats, 'Weatherconditions' )
+    
+    return resultados
@@ -0,0 +1,184 @@
+# =========================================
+# Imports
+# =========================================
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+
+from utils.cube import fallback, multi_rollup
+from utils.profiling import profiled
+from utils.sketches import DISTINCT_MODE, PERCENTILES, error_bound
+from utils.sql import SqlBackend
+
+# Agrupamentos usados pelos widgets da página: calculados juntos, em uma passada no cubo
+PAGE_GROUPINGS = {
+    'festival': ['Festival'],
+    'city': ['City'],
+    'city_order': ['City', 'Type_of_order'],
+    'city_traffic': ['City', 'Road_traffic_density'],
+}
+
+# Dimensões da tabela de percentis do tempo de entrega
+PERCENTILE_GROUPINGS = ['City', 'Road_traffic_density', 'Weatherconditions', 'Festival']
+
+# =========================================
+# Funções
+# =========================================
+
+def time_columns( df_aux ):
+    """Renomeia as estatísticas do tempo de entrega para Time_mean e Time_std."""
+    
+    return df_aux.rename( columns={'Time_taken(min)_mean': 'Time_mean', 'Time_taken(min)_std': 'Time_std'} )
+
+@profiled()
+def distance( stats, op ):  
+    """
+    Esta função tem a responsabilidade de calcular a distância média de entregas.
+    A coluna Distance é calculada uma única vez na carga do dataset (utils.geo.haversine_np)
+    e resumida nas células do cubo.
+    Input: - stats: estatísticas da página (multi_rollup)
+    Output: - Média da distância
+    """
+    
+    df_aux = stats['city']
+    
+    if op == 'avg':
+        avg_distance = np.round(df_aux['Distance_sum'].sum() / df_aux['Distance_n'].sum(), 2)
+        return avg_distance
+
+    elif op == 'fig': 
+        fig = go.Figure( data=[ go.Pie( labels= df_aux['City'], values=df_aux['Distance_sum'], pull=[0, 0.1, 0])])
+        return fig
+
+@profiled()
+def festival_avg_std( stats, festival, col ):
+    """
+    Esta função tem a responsabilidade de calcular a média e o desvio padrão do tempo de entrega, em Festival e Não Festival.
+    Input: - stats: estatísticas da página (multi_rollup)
+           - festival: condiciona para entregas que ocorreram:
+                       'Yes': entregas que ocorreram durante festival
+                       'No': entregas que ocorream fora do festival 
+           - col: define a coluna de operação a ser selecionada:
+                  'Time_mean' = coluna com o cáculo do tempo médio
+                  'Time_std' = coluna com o cáculo do tempo desvio padrão
+    Output: valor da métrica (None quando a seleção não tem entregas nessa condição, como o st.metric espera)
+    """
+    
+    df_avg_std_time_festival = time_columns( stats['festival'] )
+    df_avg_std_time_festival = np.round( df_avg_std_time_festival.loc[df_avg_std_time_festival['Festival'] == festival, col], 2)
+
+    return df_avg_std_time_festival.iloc[0] if len( df_avg_std_time_festival ) else None
+
+
+@profiled()
+def bar_time_city( stats ):  
+    df_avg_std_time_per_city = time_columns( stats['city'] )
+        
+    fig = go.Figure()
+    fig.add_trace (go.Bar (name='Control',
+                              x= df_avg_std_time_per_city['City'],
+                              y= df_avg_std_time_per_city ['Time_std'],
+                              error_y=dict(type='data', array=df_avg_std_time_per_city['Time_std'])))
+    fig.update_layout(barmode='group')
+
+    return fig
+
+@profiled()
+def avg_std_time_city( stats ):
+    df_avg_std_time_per_city_order = ( time_columns( stats['city_order'] )
+                                          .loc[:, ['City', 'Type_of_order', 'Time_mean', 'Time_std']] )
+    
+    return df_avg_std_time_per_city_order
+
+
+@profiled()
+def avg_std_time_per_city_traf ( stats ):
+    df_avg_std_time_per_city_traf = time_columns( stats['city_traffic'] )
+    # O sunburst agrupa o caminho sem observed=True: com categorias, as combinações sem pedidos
+    # entrariam com peso zero
+    df_avg_std_time_per_city_traf[['City', 'Road_traffic_density']] = (
+        df_avg_std_time_per_city_traf[['City', 'Road_traffic_density']].astype( str ) )
+    
+    fig = px.sunburst( df_avg_std_time_per_city_traf, path=['City', 'Road_traffic_density'], values='Time_mean', 
+                       color='Time_std', color_continuous_scale='rdbu', 
+                       color_continuous_midpoint=np.average(df_avg_std_time_per_city_traf['Time_std']) )
+
+    return fig
+
+@profiled()
+def time_percentiles( quantis ):
+    """
+    Esta função tem a responsabilidade de calcular os percentis do tempo de entrega da seleção.
+    Critérios:
+    1. p50, p90 e p99 de toda a seleção
+    2. Os mesmos percentis por cidade, trânsito, clima e festival
+    Os percentis saem dos sketches de quantis das células (utils.sketches.QuantileCube), sem ordenar as linhas.
+    Input: quantis: QuantileCube filtrado
+    Output: (dict percentil -> minutos, dict dimensão -> df)
+    """
+    
+    geral = dict( zip( PERCENTILES, np.round( quantis.quantiles(), 1 ) ) )
+    por_dimensao = {col: quantis.quantiles_by( col ).round( 1 ) for col in PERCENTILE_GROUPINGS}
+    
+    return geral, por_dimensao
+
+@profiled()
+def time_distribution( quantis ):
+    """
+    Esta função tem a responsabilidade de criar o gráfico da distribuição do tempo de entrega.
+    Cada barra é um bucket do sketch de quantis (largura relativa de QUANTILE_ACCURACY).
+    Input: quantis: QuantileCube filtrado
+    Output: Figura do gráfico
+    """
+    
+    df_aux = quantis.distribution()
+    fig = px.bar( df_aux, x='value', y='orders', labels={'value': 'Tempo de entrega (min)', 'orders': 'Pedidos'} )
+    
+    return fig
+
+@profiled()
+def page_results( source, date_limit, traffic_options, weather_options=None ):
+    """
+    Esta função tem a responsabilidade de calcular tudo o que a Visão Restaurantes mostra para uma seleção.
+    Input: - source: store em memória ou banco (SqlBackend)
+           - date_limit, traffic_options, weather_options: filtros da barra lateral
+    Output: dict com as métricas, os gráficos e a tabela da página
+    """
+    
+    df1, df_cube = source.select( date_limit, list( traffic_options ), weather_options )
+    
+    # Estatísticas de todos os widgets em uma única agregação
+    stats = multi_rollup( df_cube, PAGE_GROUPINGS, ['Time_taken(min)', 'Distance'] )
+    
+    # Entregadores distintos: exatos no banco e no modo exato; no store, pela junção dos sketches das células
+    erro = None
+    if isinstance( source, SqlBackend ):
+        total_deliver = source.total_deliver( df1 )
+    elif DISTINCT_MODE == 'exact':
+        total_deliver = fallback( df1, 'total_deliver' )['Delivery_person_ID'].nunique()
+    else:
+        sketches = source.select_sketches( date_limit, list( traffic_options ), weather_options )
+        total_deliver = int( round( sketches.count() ) )
+        erro = error_bound( sketches.p )
+    
+    # Percentis do tempo de entrega: sketches de quantis das células (no banco, montados da contagem dos tempos)
+    if isinstance( source, SqlBackend ):
+        quantis = source.time_quantiles( df1 )
+    else:
+        quantis = source.select_quantiles( date_limit, list( traffic_options ), weather_options )
+    percentis, percentis_por_dimensao = time_percentiles( quantis )
+    
+    return {'total_deliver': total_deliver,
+            'total_deliver_error': erro,
+            'avg_distance': distance( stats, 'avg' ),
+            'festival_time_mean': festival_avg_std( stats, 'Yes', 'Time_mean' ),
+            'festival_time_std': festival_avg_std( stats, 'Yes', 'Time_std' ),
+            'no_festival_time_mean': festival_avg_std( stats, 'No', 'Time_mean' ),
+            'no_festival_time_std': festival_avg_std( stats, 'No', 'Time_std' ),
+            'bar_time_city': bar_time_city( stats ),
+            'avg_std_time_city': avg_std_time_city( stats ),
+            'distance_fig': distance( stats, 'fig' ),
+            'avg_std_time_per_city_traf': avg_std_time_per_city_traf( stats ),
+            'time_percentiles': percentis,
+            'time_percentiles_by': percentis_por_dimensao,
+            'time_distribution': time_distribution( quantis )}
@@ -0,0 +1,222 @@
+# =========================================
+# Imports
+# =========================================
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from utils import visao_empresa, visao_entregadores, visao_restaurantes
+from utils.data import DATASET_PATH
+from utils.results import cached_results
+from utils.sql import load_backend
+from utils.store import BATCH_DIR, load_store
+
+logger = logging.getLogger( __name__ )
+
+# Aquecimento ligado por padrão (CURRY_WARMUP=0 desliga)
+WARMUP = os.environ.get( 'CURRY_WARMUP', '1' ) != '0'
+
+# Threads do aquecimento
+WARMUP_WORKERS = int( os.environ.get( 'CURRY_WARMUP_WORKERS', '2' ) )
+
+# Seleções comuns, além da padrão: lista JSON de {"date": "2022-03-01", "traffic": [...], "weather": [...]}
+WARMUP_FILE = os.environ.get( 'CURRY_WARMUP_FILE' )
+
+# Valores iniciais da barra lateral das páginas
+DEFAULT_DATE = datetime( 2022, 4, 13 )
+TRAFFIC_OPTIONS = ['Low', 'Medium', 'High', 'Jam']
+WEATHER_OPTIONS = ['conditions Cloudy', 'conditions Fog', 'conditions Sandstorms',
+                   'conditions Stormy', 'conditions Sunny', 'conditions Windy']
+
+# Páginas (e seções da Visão Empresa) aquecidas e a função de resultados de cada uma
+VIEWS = {**dict( visao_empresa.SECTIONS.values() ),
+         'visao_entregadores': visao_entregadores.page_results,
+         'visao_restaurantes': visao_restaurantes.page_results}
+
+# Aquecimento do processo (um só, iniciado pela primeira sessão)
+_progress = None
+_progress_lock = threading.Lock()
+
+# =========================================
+# Funções
+# =========================================
+
+class WarmupProgress:
+    """Andamento do aquecimento: seleções calculadas, com erro e o tempo de cada uma."""
+
+    def __init__( self, total ):
+        self.total = total
+        self.done = 0
+        self.errors = []
+        self.timings = []
+        self.started = time.perf_counter()
+        self.finished = None
+        self._lock = threading.Lock()
+
+    @property
+    def running( self ):
+        return self.finished is None
+
+    @property
+    def fraction( self ):
+        return ( self.done + len( self.errors ) ) / self.total if self.total else 1.0
+
+    def add( self, view, selection, segundos, erro=None ):
+        with self._lock:
+            if erro is None:
+                self.done += 1
+                self.timings.append( {'view': view, 'date': str( selection['date'] ), 'seconds': round( segundos, 3 )} )
+            else:
+                self.errors.append( '{} {}: {!r}'.format( view, selection['date'], erro ) )
+            andamento = self.done + len( self.errors )
+            if andamento == self.total:
+                self.finished = time.perf_counter()
+
+        logger.info( 'Aquecimento %d/%d: %s %s (%.2fs)', andamento, self.total, view, selection['date'], segundos )
+
+    def summary( self ):
+        fim = self.finished or time.perf_counter()
+        return {'total': self.total, 'done': self.done, 'errors': len( self.errors ),
+                'seconds': round( fim - self.started, 2 )}
+
+def read_selections( path=WARMUP_FILE, include_default=True ):
+    """
+    Esta função tem a responsabilidade de montar as seleções aquecidas.
+    Critérios:
+    1. A primeira é a dos valores iniciais da barra lateral (data padrão, todo o trânsito e todo o clima)
+    2. As outras vêm do arquivo JSON (opcional); trânsito e clima ausentes = todas as opções
+    3. Seleções repetidas entram uma vez
+    Input: - path: arquivo JSON com as seleções comuns (None = só a padrão)
+           - include_default: False deixa só as seleções do arquivo
+    Output: lista de dicts com date, traffic e weather
+    """
+
+    selecoes = [{'date': DEFAULT_DATE, 'traffic': TRAFFIC_OPTIONS, 'weather': WEATHER_OPTIONS}] if include_default else []
+    if path:
+        with open( path, encoding='utf-8' ) as arquivo:
+            for item in json.load( arquivo ):
+                selecoes.append( {'date': pd.Timestamp( item['date'] ).to_pydatetime(),
+                                  'traffic': item.get( 'traffic', TRAFFIC_OPTIONS ),
+                                  'weather': item.get( 'weather', WEATHER_OPTIONS )} )
+
+    unicas = []
+    for selecao in selecoes:
+        if selecao not in unicas:
+            unicas.append( selecao )
+
+    return unicas
+
+def view_weather( view, weather_options ):
+    """Clima repassado à página: a Visão Empresa não filtra por clima (None, como na página)."""
+
+    return None if view.startswith( 'visao_empresa' ) else weather_options
+
+def warm_selection( source, view, selection, progress ):
+    """
+    Esta função tem a responsabilidade de calcular uma seleção de uma página no cache de resultados.
+    A Visão Empresa não filtra por clima: a seleção entra sem o clima, como na página.
+    Input: - source: store em memória ou banco
+           - view: nome da página (VIEWS)
+           - selection: dict com date, traffic e weather
+           - progress: WarmupProgress
+    """
+
+    weather = view_weather( view, selection['weather'] )
+    inicio = time.perf_counter()
+    try:
+        cached_results( view, VIEWS[view], source, selection['date'], selection['traffic'], weather )
+    except Exception as erro:
+        logger.exception( 'Aquecimento de %s falhou', view )
+        progress.add( view, selection, time.perf_counter() - inicio, erro )
+    else:
+        progress.add( view, selection, time.perf_counter() - inicio )
+
+def run_warmup( path=DATASET_PATH, batch_dir=BATCH_DIR, selections=None, workers=WARMUP_WORKERS,
+                db=None, progress=None ):
+    """
+    Esta função tem a responsabilidade de aquecer o dataset e os resultados das páginas.
+    Critérios:
+    1. O store é carregado uma vez (o que o primeiro visitante pagaria); com o banco, nada é carregado
+    2. Cada par seleção x página é calculado em uma thread do pool
+    Input: - path, batch_dir: csv base e pasta de lotes
+           - selections: seleções (None = read_selections())
+           - workers: threads do pool
+           - db: banco já aberto (load_backend), ou None para o store em memória
+           - progress: WarmupProgress a atualizar (None = cria um)
+    Output: WarmupProgress
+    """
+
+    selections = read_selections() if selections is None else selections
+    progress = progress or WarmupProgress( len( selections ) * len( VIEWS ) )
+
+    try:
+        source = db or load_store( path, batch_dir, spinner=False )
+    except Exception as erro:
+        logger.exception( 'Aquecimento: o dataset não carregou' )
+        for selection in selections:
+            for view in VIEWS:
+                progress.add( view, selection, 0.0, erro )
+        return progress
+
+    with ThreadPoolExecutor( max_workers=workers, thread_name_prefix='warmup' ) as pool:
+        for selection in selections:
+            for view in VIEWS:
+                pool.submit( warm_selection, source, view, selection, progress )
+
+    logger.info( 'Aquecimento concluído: %s', progress.summary() )
+
+    return progress
+
+def start_warmup( path=DATASET_PATH, batch_dir=BATCH_DIR ):
+    """
+    Esta função tem a responsabilidade de iniciar o aquecimento em segundo plano, uma vez por processo.
+    É chamada no início de cada página: a primeira sessão depois do deploy dispara o aquecimento
+    e as seguintes só consultam o andamento. O banco é aberto aqui, na thread do rerun (st.cache_resource).
+    Input: - path, batch_dir: csv base e pasta de lotes
+    Output: WarmupProgress, ou None com o aquecimento desligado
+    """
+
+    global _progress
+
+    if not WARMUP:
+        return None
+
+    with _progress_lock:
+        if _progress is None:
+            try:
+                selections = read_selections()
+            except ( OSError, ValueError, KeyError ) as erro:
+                logger.error( 'Arquivo de aquecimento inválido (%r): só a seleção padrão', erro )
+                selections = read_selections( None )
+            _progress = WarmupProgress( len( selections ) * len( VIEWS ) )
+            db = load_backend( path, batch_dir=batch_dir )
+            threading.Thread( target=run_warmup, name='warmup', daemon=True,
+                              kwargs={'path': path, 'batch_dir': batch_dir, 'selections': selections,
+                                      'db': db, 'progress': _progress} ).start()
+
+    return _progress
+
+def warmup_progress():
+    """Andamento do aquecimento do processo (None quando ainda não começou)."""
+
+    return _progress
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Mede o aquecimento das páginas (carga do dataset e seleções comuns).' )
+    parser.add_argument( 'path', nargs='?', default=DATASET_PATH )
+    parser.add_argument( '--selections', default=WARMUP_FILE, help='JSON com as seleções comuns' )
+    parser.add_argument( '--workers', type=int, default=WARMUP_WORKERS )
+    args = parser.parse_args()
+
+    logging.basicConfig( level=logging.INFO, format='%(asctime)s %(message)s', stream=sys.stderr )
+    progress = run_warmup( args.path, selections=read_selections( args.selections ), workers=args.workers,
+                           db=load_backend( args.path ) )
+    print( json.dumps( {**progress.summary(), 'timings': progress.timings, 'errors_detail': progress.errors}, indent=2 ) )